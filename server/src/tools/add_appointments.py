@@ -1,114 +1,46 @@
 #!/usr/bin/env python3
-import os
 import sys
-import pymongo
+from collections import Counter
 from datetime import datetime, timedelta
-from bson import ObjectId
-from dotenv import load_dotenv
-import re
 import random
 
-# Check for .env file and create if it doesn't exist
-env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env')
-if not os.path.exists(env_path):
-    print(f"Warning: .env file not found at {env_path}")
-    mongo_uri = input("Please enter your MongoDB connection string: ")
-    with open(env_path, 'w') as f:
-        f.write(f"MONGODB_URI={mongo_uri}\n")
-    print(f"Created .env file at {env_path}")
+from healthbridge_tools import bulk_insert, get_db, load_ids, observe, report_result, resolve_admin_id
+from healthbridge_tools.scheduling import DURATION_SLOTS, DoctorSchedule, preload_schedule, slot_to_time
+from healthbridge_tools.cli import apply_seed, build_parser, confirm, json_summary, prompt_int, writer_options
+from healthbridge_tools.repro import anchored_now
 
-# Load environment variables from .env file
-load_dotenv(env_path)
-
-# Get MongoDB URI from environment variable
-mongo_uri = os.getenv('MONGODB_URI')
-if not mongo_uri:
-    print("Error: MONGODB_URI environment variable not found.")
-    mongo_uri = input("Please enter your MongoDB connection string: ")
-    with open(env_path, 'a') as f:
-        f.write(f"MONGODB_URI={mongo_uri}\n")
-    print(f"Updated .env file with MongoDB URI")
-
-# Extract database name from URI or use default
-db_name = "test"
-uri_db_match = re.search(r'/([^/\?]+)(\?|$)', mongo_uri)
-if uri_db_match:
-    db_name = uri_db_match.group(1)
-
-# Setup MongoDB connection
-try:
-    client = pymongo.MongoClient(mongo_uri)
-    
-    # Use database from URI or default
-    db = client[db_name]
-    users_collection = db.users
-    appointments_collection = db.appointments
-    print(f"Connected to MongoDB database '{db_name}' successfully!")
-except Exception as e:
-    print(f"Error connecting to MongoDB: {e}")
-    sys.exit(1)
-
-# We need to find an admin user to set as createdBy
-try:
-    admin_user = users_collection.find_one({"role": "admin"})
-    if not admin_user:
-        print("No admin user found. Looking for any user...")
-        any_user = users_collection.find_one({})
-        if not any_user:
-            print("No users found in the database.")
-            create_user = input("Would you like to create a placeholder admin user? (y/n): ")
-            if create_user.lower() == 'y':
-                admin_id = ObjectId()
-                admin_user = {
-                    "_id": admin_id,
-                    "email": "admin@healthbridge.com",
-                    "password": "placeholder",  # This would be hashed in a real scenario
-                    "firstName": "Admin",
-                    "lastName": "User",
-                    "role": "admin",
-                    "createdAt": datetime.now(),
-                    "updatedAt": datetime.now()
-                }
-                users_collection.insert_one(admin_user)
-                print(f"Created placeholder admin user with ID: {admin_id}")
-            else:
-                print("Cannot proceed without a user. Exiting.")
-                sys.exit(1)
+def load_doctors(users_collection, batch_size=None):
+    """Get the _id of every doctor as a compact IdArray"""
+    try:
+        doctors = load_ids(users_collection, {"role": "doctor"}, batch_size)
+        doctor_count = len(doctors)
+        if doctor_count == 0:
+            print("No doctors found in the database. Cannot create appointments.")
+            sys.exit(1)
         else:
-            admin_id = any_user["_id"]
-            print(f"Using user ID: {admin_id} as creator")
-    else:
-        admin_id = admin_user["_id"]
-        print(f"Using admin user ID: {admin_id} as creator")
-except Exception as e:
-    print(f"Error finding or creating admin user: {e}")
-    sys.exit(1)
-
-# Get all doctors
-try:
-    doctors = list(users_collection.find({"role": "doctor"}))
-    doctor_count = len(doctors)
-    if doctor_count == 0:
-        print("No doctors found in the database. Cannot create appointments.")
+            print(f"Found {doctor_count} doctors in the database.")
+    except Exception as e:
+        print(f"Error finding doctors: {e}")
         sys.exit(1)
-    else:
-        print(f"Found {doctor_count} doctors in the database.")
-except Exception as e:
-    print(f"Error finding doctors: {e}")
-    sys.exit(1)
+    return doctors
 
-# Get all patients
-try:
-    patients = list(users_collection.find({"role": "patient"}))
-    patient_count = len(patients)
-    if patient_count == 0:
-        print("No patients found in the database. Cannot create appointments.")
+def load_patients(users_collection, batch_size=None):
+    """Get the _id of every patient as a compact IdArray"""
+    try:
+        patients = load_ids(users_collection, {"role": "patient"}, batch_size)
+        patient_count = len(patients)
+        if patient_count == 0:
+            print("No patients found in the database. Cannot create appointments.")
+            sys.exit(1)
+        else:
+            print(f"Found {patient_count} patients in the database.")
+    except Exception as e:
+        print(f"Error finding patients: {e}")
         sys.exit(1)
-    else:
-        print(f"Found {patient_count} patients in the database.")
-except Exception as e:
-    print(f"Error finding patients: {e}")
-    sys.exit(1)
+    return patients
+
+# Random doctor/date picks to try before scanning for a free slot
+MAX_RANDOM_ATTEMPTS = 20
 
 # List of appointment reasons
 appointment_reasons = [
@@ -143,34 +75,15 @@ appointment_statuses = [
     "rescheduled"
 ]
 
-# Generate a time slot (hours and minutes)
-def generate_time_slot():
-    # Business hours: 8 AM to 5 PM
-    hour = random.randint(8, 16)  # 8 AM to 4 PM (the appointment will last 1 hour)
-    # Only use quarter-hour intervals
-    minute = random.choice([0, 15, 30, 45])
-    
-    start_time = f"{hour:02d}:{minute:02d}"
-    
-    # End time is 30, 45, or 60 minutes after start time
-    duration_minutes = random.choice([30, 45, 60])
-    
-    end_hour = hour
-    end_minute = minute + duration_minutes
-    
-    if end_minute >= 60:
-        end_hour += end_minute // 60
-        end_minute = end_minute % 60
-    
-    end_time = f"{end_hour:02d}:{end_minute:02d}"
-    
-    return start_time, end_time
+# Generate an appointment length in 15-minute slots (30, 45 or 60 minutes)
+def generate_duration_slots():
+    return random.choice(DURATION_SLOTS)
 
 # Generate a random date within the current year
 def generate_date():
-    current_year = datetime.now().year
-    current_month = datetime.now().month
-    current_day = datetime.now().day
+    current_year = anchored_now().year
+    current_month = anchored_now().month
+    current_day = anchored_now().day
     
     # Determine if the appointment is in the past or future
     is_past = random.random() < 0.4  # 40% chance for past appointments
@@ -225,7 +138,7 @@ def generate_date():
 
 # Generate appropriate status based on date
 def generate_status(appointment_date):
-    current_date = datetime.now()
+    current_date = anchored_now()
     
     if appointment_date < current_date:
         # Past appointments are most likely completed, but can be cancelled
@@ -263,51 +176,44 @@ def generate_notes(status):
         return None
 
 # Generate appointment data
-def generate_appointments(num_appointments):
-    appointments = []
-    
-    # Create a queue of doctor-time pairs to avoid double booking
-    doctor_appointments = {}
+def find_free_booking(schedule, doctors):
+    """Find any doctor and day this year with room for one more appointment"""
+    current_year = anchored_now().year
+    days = [datetime(current_year, 1, 1) + timedelta(days=offset)
+            for offset in range((datetime(current_year + 1, 1, 1) - datetime(current_year, 1, 1)).days)]
+    random.shuffle(days)
+    for appointment_date in days:
+        for index in random.sample(range(len(doctors)), len(doctors)):
+            doctor_id = doctors[index]
+            booking = schedule.allocate(doctor_id, appointment_date, generate_duration_slots())
+            if booking:
+                return doctor_id, appointment_date, booking
+    raise ValueError("Every doctor is fully booked for the year; cannot create more appointments.")
+
+def generate_appointments(num_appointments, doctors, patients, admin_id, schedule=None):
+    """Yield exactly num_appointments overlap-free appointment documents"""
+    # Doctors' booked slots, so no two appointments for a doctor ever overlap
+    if schedule is None:
+        schedule = DoctorSchedule()
     
     for _ in range(num_appointments):
-        # Select random doctor and patient
-        doctor = random.choice(doctors)
-        patient = random.choice(patients)
-        
-        # Generate appointment date
-        appointment_date = generate_date()
-        date_str = appointment_date.strftime("%Y-%m-%d")
+        # Select random patient, doctor and date, retrying other doctors and dates if the day is full
+        patient_id = random.choice(patients)
+        booking = None
+        for _ in range(MAX_RANDOM_ATTEMPTS):
+            doctor_id = random.choice(doctors)
+            appointment_date = generate_date()
+            booking = schedule.allocate(doctor_id, appointment_date, generate_duration_slots())
+            if booking:
+                break
         
-        # Check if doctor is already booked at that time
-        doctor_id_str = str(doctor["_id"])
-        if doctor_id_str not in doctor_appointments:
-            doctor_appointments[doctor_id_str] = {}
+        if booking is None:
+            # The schedule is nearly full; scan for any doctor and day with room left
+            doctor_id, appointment_date, booking = find_free_booking(schedule, doctors)
         
-        # Try to find an unbooked time for this doctor on this day
-        max_attempts = 5
-        attempt = 0
-        time_found = False
-        
-        while attempt < max_attempts and not time_found:
-            # Generate time slot
-            start_time, end_time = generate_time_slot()
-            
-            # Check if this time slot is already booked
-            if date_str not in doctor_appointments[doctor_id_str]:
-                doctor_appointments[doctor_id_str][date_str] = []
-                time_found = True
-            elif start_time not in doctor_appointments[doctor_id_str][date_str]:
-                time_found = True
-            
-            if time_found:
-                # Add this time to the booked list
-                doctor_appointments[doctor_id_str][date_str].append(start_time)
-            
-            attempt += 1
-        
-        if not time_found:
-            # If we couldn't find a time slot after max attempts, skip this appointment
-            continue
+        start_slot, length = booking
+        start_time = slot_to_time(start_slot)
+        end_time = slot_to_time(start_slot + length)
         
         # Generate status based on date
         status = generate_status(appointment_date)
@@ -328,8 +234,8 @@ def generate_appointments(num_appointments):
         
         # Create appointment object
         appointment = {
-            "patient": patient["_id"],
-            "doctor": doctor["_id"],
+            "patient": patient_id,
+            "doctor": doctor_id,
             "date": appointment_date,
             "startTime": start_time,
             "endTime": end_time,
@@ -337,8 +243,8 @@ def generate_appointments(num_appointments):
             "reason": reason,
             "isVirtual": is_virtual,
             "createdBy": admin_id,
-            "createdAt": datetime.now() - timedelta(days=random.randint(1, 30)),  # Created 1-30 days ago
-            "updatedAt": datetime.now() - timedelta(days=random.randint(0, 7))    # Updated 0-7 days ago
+            "createdAt": anchored_now() - timedelta(days=random.randint(1, 30)),  # Created 1-30 days ago
+            "updatedAt": anchored_now() - timedelta(days=random.randint(0, 7))    # Updated 0-7 days ago
         }
         
         # Add optional fields if they exist
@@ -348,57 +254,92 @@ def generate_appointments(num_appointments):
         if meeting_link:
             appointment["meetingLink"] = meeting_link
             
-        appointments.append(appointment)
-    
-    return appointments
+        yield appointment
 
-# Check for existing appointments
-try:
-    existing_count = appointments_collection.count_documents({})
-    if existing_count > 0:
-        confirm = input(f"Found {existing_count} existing appointments. Add more? (y/n): ")
-        if confirm.lower() != 'y':
-            print("Operation cancelled by user.")
-            sys.exit(0)
-except Exception as e:
-    print(f"Error checking existing appointments: {e}")
-
-# Ask how many appointments to create
-try:
-    num_appointments = int(input("How many appointments would you like to create? (recommended: 100-200): ") or "150")
-except ValueError:
-    print("Invalid input. Defaulting to 150 appointments.")
-    num_appointments = 150
-
-# Generate and insert appointments
-appointments = generate_appointments(num_appointments)
-
-try:
-    result = appointments_collection.insert_many(appointments)
-    print(f"Successfully added {len(result.inserted_ids)} appointments to the database.")
+def run(args, summary):
+    """Add sample appointments between existing doctors and patients"""
+    db = get_db()
+    users_collection = db.users
+    appointments_collection = db.appointments
+    admin_id = resolve_admin_id(db, assume_yes=args.yes, dry_run=args.dry_run)
+    doctors = load_doctors(users_collection, args.cursor_batch_size)
+    patients = load_patients(users_collection, args.cursor_batch_size)
     
-    # Count appointments by status
-    status_counts = {}
-    for appointment in appointments:
-        status = appointment["status"]
-        if status in status_counts:
-            status_counts[status] += 1
-        else:
-            status_counts[status] = 1
+    # Check for existing appointments
+    try:
+        existing_count = appointments_collection.count_documents({})
+        if existing_count > 0:
+            if not confirm(args, f"Found {existing_count} existing appointments. Add more? (y/n): "):
+                print("Operation cancelled by user.")
+                return
+    except Exception as e:
+        print(f"Error checking existing appointments: {e}")
+    
+    # Ask how many appointments to create unless --count was given
+    num_appointments = args.count
+    if num_appointments is None:
+        num_appointments = prompt_int(args, "How many appointments would you like to create? (recommended: 100-200): ", 150)
+    summary["count"] = num_appointments
+    
+    # Generate and insert appointments, tallying the distribution as they stream past
+    status_counts = Counter()
+    virtual_count = 0
     
-    print("\nAppointment Status Distribution:")
-    for status, count in status_counts.items():
-        print(f"  {status.capitalize()}: {count} ({count/len(appointments)*100:.1f}%)")
+    def tally(appointment):
+        nonlocal virtual_count
+        status_counts[appointment["status"]] += 1
+        virtual_count += appointment["isVirtual"]
     
-    # Count virtual vs in-person
-    virtual_count = sum(1 for a in appointments if a["isVirtual"])
-    in_person_count = len(appointments) - virtual_count
+    # Block slots that are already booked this year so new appointments never overlap them
+    schedule = DoctorSchedule()
+    current_year = anchored_now().year
+    preloaded = preload_schedule(
+        schedule, appointments_collection,
+        datetime(current_year, 1, 1), datetime(current_year, 12, 31, 23, 59, 59), args.cursor_batch_size
+    )
+    if preloaded:
+        print(f"Loaded {preloaded} existing bookings into the doctors' schedules.")
     
-    print(f"\nVirtual appointments: {virtual_count} ({virtual_count/len(appointments)*100:.1f}%)")
-    print(f"In-person appointments: {in_person_count} ({in_person_count/len(appointments)*100:.1f}%)")
+    appointments = generate_appointments(num_appointments, doctors, patients, admin_id, schedule)
     
-except Exception as e:
-    print(f"Error adding appointments: {e}")
-    sys.exit(1)
+    try:
+        stats = bulk_insert(appointments_collection, observe(appointments, tally), **writer_options(args))
+        summary.update(stats.as_dict())
+        summary["statusCounts"] = dict(status_counts)
+        summary["virtualCount"] = virtual_count
+        report_result(stats, "appointments")
+        
+        total = sum(status_counts.values())
+        if total == 0:
+            print("No appointments were generated.")
+            return
+        
+        print("\nAppointment Status Distribution:")
+        for status, count in status_counts.items():
+            print(f"  {status.capitalize()}: {count} ({count/total*100:.1f}%)")
+        
+        # Count virtual vs in-person
+        in_person_count = total - virtual_count
+        
+        print(f"\nVirtual appointments: {virtual_count} ({virtual_count/total*100:.1f}%)")
+        print(f"In-person appointments: {in_person_count} ({in_person_count/total*100:.1f}%)")
+        
+    except Exception as e:
+        print(f"Error adding appointments: {e}")
+        sys.exit(1)
+    
+    print("\nDone!") 
+
+def main(argv=None):
+    """Parse command-line options and run the seeder"""
+    parser = build_parser(
+        "add_appointments.py", "Add sample appointments between existing doctors and patients.",
+        count_help="number of appointments to create (prompted for if omitted, 150 with --yes)"
+    )
+    args = parser.parse_args(argv)
+    apply_seed(args, "add_appointments")
+    with json_summary(args, "add_appointments") as summary:
+        run(args, summary)
 
-print("\nDone!") 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
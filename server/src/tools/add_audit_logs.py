@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+import sys
+from collections import Counter
+from datetime import timedelta
+import random
+
+import numpy as np
+
+from healthbridge_tools import bulk_insert, get_db, load_ids, observe, report_result, resolve_admin_id
+from healthbridge_tools.cli import apply_seed, build_parser, confirm, json_summary, writer_options
+from healthbridge_tools.columnar import make_rng
+from healthbridge_tools.repro import anchored_now, object_id_at
+
+# Audit actions from auditLog.model.ts and their share of all events
+audit_actions = [
+    "login_success",
+    "logout",
+    "login_failed",
+    "user_updated",
+    "password_updated",
+    "user_created",
+    "user_status_updated",
+    "doctor_rating_updated",
+    "role_updated",
+    "user_deleted"
+]
+action_weights = [0.55, 0.20, 0.08, 0.06, 0.03, 0.03, 0.02, 0.015, 0.01, 0.005]
+
+# Actions only admins perform
+admin_actions = {"user_created", "user_status_updated", "role_updated", "user_deleted"}
+
+# Share of each day's events per hour (UTC): quiet nights, busy office hours
+hour_weights = [1, 1, 1, 1, 1, 2, 4, 7, 9, 10, 10, 9, 8, 9, 10, 9, 8, 6, 4, 3, 2, 2, 1, 1]
+
+# Weekend days see about half the traffic of a weekday
+weekend_factor = 0.5
+
+roles = ["patient", "doctor", "nurse"]
+
+locations = ["New York, NY", "Istanbul, Turkey", "Chicago, IL", "Ankara, Turkey", "Houston, TX", "Izmir, Turkey"]
+
+user_agents = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_2) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
+    "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0"
+]
+
+def load_actors(users_collection, batch_size=None):
+    """Get the _id of every user, plus the admins and doctors among them"""
+    try:
+        users = load_ids(users_collection, {}, batch_size)
+        if len(users) == 0:
+            print("No users found in the database. Cannot create audit logs.")
+            sys.exit(1)
+        admins = load_ids(users_collection, {"role": "admin"}, batch_size)
+        doctors = load_ids(users_collection, {"role": "doctor"}, batch_size)
+        print(f"Found {len(users)} users ({len(admins)} admins, {len(doctors)} doctors) to attribute events to.")
+    except Exception as e:
+        print(f"Error finding users: {e}")
+        sys.exit(1)
+    return users, admins, doctors
+
+def spread_over_days(count, days, rng):
+    """Split count events over the days full days before today, weekends quieter
+    
+    Returns (day start, events) pairs, oldest day first.
+    """
+    today = anchored_now().replace(hour=0, minute=0, second=0, microsecond=0)
+    starts = [today - timedelta(days=offset) for offset in range(days, 0, -1)]
+    weights = np.array([weekend_factor if start.weekday() >= 5 else 1.0 for start in starts])
+    counts = rng.multinomial(count, weights / weights.sum())
+    return list(zip(starts, counts.tolist()))
+
+def generate_times(day_start, count, rng):
+    """Return count sorted event times within one day, following hour_weights"""
+    hours = rng.choice(24, count, p=np.asarray(hour_weights) / sum(hour_weights))
+    seconds = np.sort(hours * 3600 + rng.uniform(0, 3600, count))
+    return [day_start + timedelta(seconds=value) for value in seconds.tolist()]
+
+# Generate a random client IP address
+def generate_ip():
+    return f"{random.randint(1, 223)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}"
+
+def generate_event(created_at, users, admins, doctors, admin_id):
+    """Build one audit log entry the way logAuditEvent records it"""
+    action = random.choices(audit_actions, weights=action_weights, k=1)[0]
+    user_id = random.choice(users)
+    actor = random.choice(admins) if admins else admin_id
+    event = {"action": action}
+    
+    if action in admin_actions:
+        event["performedBy"] = actor
+        event["performedOn"] = user_id
+        if action == "user_created":
+            event["newValue"] = {"role": random.choice(roles)}
+            event["details"] = "Admin created a new user"
+        elif action == "user_status_updated":
+            active = random.random() < 0.5
+            event["previousValue"] = {"active": not active}
+            event["newValue"] = {"active": active}
+            event["details"] = f"Admin {'activated' if active else 'deactivated'} user"
+        elif action == "role_updated":
+            previous_role, role = random.sample(roles, 2)
+            event["previousValue"] = {"role": previous_role}
+            event["newValue"] = {"role": role}
+            event["details"] = f"Admin updated user role from {previous_role} to {role}"
+        else:
+            event["details"] = "Admin deleted user"
+    elif action == "doctor_rating_updated":
+        rating = round(random.uniform(3.0, 5.0), 1)
+        event["performedBy"] = user_id
+        event["performedOn"] = random.choice(doctors) if doctors else random.choice(users)
+        event["previousValue"] = {"rating": round(min(5.0, max(1.0, rating + random.uniform(-0.3, 0.3))), 1)}
+        event["newValue"] = {"rating": rating}
+        event["details"] = "Patient rated doctor"
+    elif action == "user_updated":
+        # Most profile changes are made by the users themselves
+        event["performedBy"] = user_id if random.random() < 0.7 else actor
+        event["performedOn"] = user_id
+        previous_location, location = random.sample(locations, 2)
+        event["previousValue"] = {"location": previous_location}
+        event["newValue"] = {"location": location}
+        event["details"] = "User profile updated"
+    elif action == "password_updated":
+        event["performedBy"] = user_id
+        event["performedOn"] = user_id
+        event["details"] = "User changed password"
+    elif action == "login_failed":
+        event["performedBy"] = user_id
+        event["details"] = "Invalid password"
+    elif action == "logout":
+        event["performedBy"] = user_id
+        event["details"] = "User logged out"
+    else:
+        event["performedBy"] = user_id
+        event["details"] = "User logged in"
+    
+    event["ip"] = generate_ip()
+    event["userAgent"] = random.choice(user_agents)
+    # Like the server's, the _id is taken when the event is logged, so _id order is createdAt order
+    event["_id"] = object_id_at(created_at)
+    event["createdAt"] = created_at
+    event["updatedAt"] = created_at
+    return event
+
+def generate_audit_logs(count, days, users, admins, doctors, admin_id, rng):
+    """Yield count audit log entries over the last days days in createdAt order"""
+    for day_start, day_count in spread_over_days(count, days, rng):
+        for created_at in generate_times(day_start, day_count, rng):
+            yield generate_event(created_at, users, admins, doctors, admin_id)
+
+def run(args, summary):
+    """Add a history of audit events for existing users"""
+    db = get_db()
+    users_collection = db.users
+    audit_logs_collection = db.auditlogs
+    admin_id = resolve_admin_id(db, assume_yes=args.yes, dry_run=args.dry_run)
+    users, admins, doctors = load_actors(users_collection, args.cursor_batch_size)
+    
+    # Check for existing audit logs
+    try:
+        existing_count = audit_logs_collection.estimated_document_count()
+        if existing_count > 0:
+            if not confirm(args, f"Found about {existing_count} existing audit log entries. Add more? (y/n): "):
+                print("Operation cancelled by user.")
+                return
+    except Exception as e:
+        print(f"Error checking existing audit logs: {e}")
+    
+    # --count wins over --per-day
+    num_events = args.count if args.count is not None else args.per_day * args.days
+    summary["count"] = num_events
+    summary["days"] = args.days
+    print(f"Generating {num_events} audit events over {args.days} days "
+          f"(about {num_events / args.days:.0f} per day)...")
+    
+    # Generate and insert audit logs, tallying actions as they stream past
+    action_counts = Counter()
+    
+    def tally(event):
+        action_counts[event["action"]] += 1
+    
+    events = generate_audit_logs(num_events, args.days, users, admins, doctors, admin_id, make_rng(args.seed))
+    
+    try:
+        stats = bulk_insert(audit_logs_collection, observe(events, tally), **writer_options(args))
+        summary.update(stats.as_dict())
+        summary["actionCounts"] = dict(action_counts)
+        report_result(stats, "audit log entries")
+        
+        total = sum(action_counts.values())
+        if total == 0:
+            print("No audit log entries were generated.")
+            return
+        
+        print("\nAudit Action Distribution:")
+        for action, count in action_counts.most_common():
+            print(f"  {action}: {count} ({count/total*100:.1f}%)")
+    
+    except Exception as e:
+        print(f"Error adding audit logs: {e}")
+        sys.exit(1)
+    
+    print("\nDone!")
+
+def main(argv=None):
+    """Parse command-line options and run the seeder"""
+    parser = build_parser(
+        "add_audit_logs.py", "Add months of audit log events for existing users.",
+        count_help="total number of events to create (default: --per-day times --days)"
+    )
+    parser.add_argument("--per-day", type=int, default=1000,
+                        help="average events per day; weekend days get half as many as weekdays (default: 1000)")
+    parser.add_argument("--days", type=int, default=90, help="days of history to generate (default: 90)")
+    args = parser.parse_args(argv)
+    if args.days < 1:
+        parser.error("--days must be at least 1")
+    apply_seed(args, "add_audit_logs")
+    with json_summary(args, "add_audit_logs") as summary:
+        run(args, summary)
+
+if __name__ == "__main__":
+    main()
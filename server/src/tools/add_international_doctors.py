@@ -1,87 +1,17 @@
 #!/usr/bin/env python3
-import os
 import sys
-import pymongo
-from datetime import datetime, timedelta
-from bson import ObjectId
-from dotenv import load_dotenv
-import re
+from datetime import datetime
 import random
 
-# Check for .env file and create if it doesn't exist
-env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env')
-if not os.path.exists(env_path):
-    print(f"Warning: .env file not found at {env_path}")
-    mongo_uri = input("Please enter your MongoDB connection string: ")
-    with open(env_path, 'w') as f:
-        f.write(f"MONGODB_URI={mongo_uri}\n")
-    print(f"Created .env file at {env_path}")
-
-# Load environment variables from .env file
-load_dotenv(env_path)
-
-# Get MongoDB URI from environment variable
-mongo_uri = os.getenv('MONGODB_URI')
-if not mongo_uri:
-    print("Error: MONGODB_URI environment variable not found.")
-    mongo_uri = input("Please enter your MongoDB connection string: ")
-    with open(env_path, 'a') as f:
-        f.write(f"MONGODB_URI={mongo_uri}\n")
-    print(f"Updated .env file with MongoDB URI")
-
-# Extract database name from URI or use default
-db_name = "test"
-uri_db_match = re.search(r'/([^/\?]+)(\?|$)', mongo_uri)
-if uri_db_match:
-    db_name = uri_db_match.group(1)
-
-# Setup MongoDB connection
-try:
-    client = pymongo.MongoClient(mongo_uri)
-    
-    # Use database from URI or default
-    db = client[db_name]
-    users_collection = db.users
-    print(f"Connected to MongoDB database '{db_name}' successfully!")
-except Exception as e:
-    print(f"Error connecting to MongoDB: {e}")
-    sys.exit(1)
-
-# We need to find an admin user to set as createdBy
-try:
-    admin_user = users_collection.find_one({"role": "admin"})
-    if not admin_user:
-        print("No admin user found. Looking for any user...")
-        any_user = users_collection.find_one({})
-        if not any_user:
-            print("No users found in the database.")
-            create_user = input("Would you like to create a placeholder admin user? (y/n): ")
-            if create_user.lower() == 'y':
-                admin_id = ObjectId()
-                admin_user = {
-                    "_id": admin_id,
-                    "email": "admin@healthbridge.com",
-                    "password": "placeholder",  # This would be hashed in a real scenario
-                    "firstName": "Admin",
-                    "lastName": "User",
-                    "role": "admin",
-                    "createdAt": datetime.now(),
-                    "updatedAt": datetime.now()
-                }
-                users_collection.insert_one(admin_user)
-                print(f"Created placeholder admin user with ID: {admin_id}")
-            else:
-                print("Cannot proceed without a user. Exiting.")
-                sys.exit(1)
-        else:
-            admin_id = any_user["_id"]
-            print(f"Using user ID: {admin_id} as creator")
-    else:
-        admin_id = admin_user["_id"]
-        print(f"Using admin user ID: {admin_id} as creator")
-except Exception as e:
-    print(f"Error finding or creating admin user: {e}")
-    sys.exit(1)
+import numpy as np
+
+from healthbridge_tools import bulk_insert, get_db, keep_first, report_result, resolve_admin_id
+from healthbridge_tools.cli import apply_seed, build_parser, confirm, hasher_options, json_summary, writer_options
+from healthbridge_tools.passwords import PasswordHasher
+from healthbridge_tools.repro import anchored_now
+from healthbridge_tools.columnar import encode_raw, generate_columnar, make_rng, objects
+from healthbridge_tools.shards import partition_keys, run_sharded
+from healthbridge_tools.unique import UserKeys
 
 # Middle Eastern doctor data
 # Turkish names
@@ -220,27 +150,103 @@ hospitals = {
     ]
 }
 
+# International phone codes
+country_codes = {
+    "Turkey": "+90",
+    "UAE": "+971",
+    "Saudi Arabia": "+966",
+    "Egypt": "+20",
+    "Lebanon": "+961",
+    "Jordan": "+962",
+    "Iraq": "+964",
+    "Iran": "+98",
+    "Qatar": "+974",
+    "Kuwait": "+965"
+}
+
+# Gulf states share phone, address and fee formats
+gulf_countries = ["UAE", "Saudi Arabia", "Qatar", "Kuwait"]
+
+# Address parts by country
+street_types = {
+    "Turkey": ["Caddesi", "Sokak", "Bulvarı", "Mahallesi"],
+    "UAE": ["Street", "Road", "Avenue"],
+    "Saudi Arabia": ["Street", "Road", "Way"],
+    "Egypt": ["Street", "Avenue", "Square"],
+    "Lebanon": ["Street", "Avenue", "Boulevard"],
+    "Jordan": ["Street", "Road", "Avenue"],
+    "Iraq": ["Street", "Road", "Square"],
+    "Iran": ["Street", "Avenue", "Boulevard"],
+    "Qatar": ["Street", "Road", "Zone"],
+    "Kuwait": ["Street", "Road", "Block"]
+}
+default_street_types = ["Street", "Road", "Avenue"]
+
+turkish_street_names = [
+    "Atatürk", "Cumhuriyet", "İstiklal", "Millet", "Bağdat", "Istiklal", 
+    "İnönü", "Vatan", "Gazi", "Fatih", "Fevzi Çakmak", "Kızılay"
+]
+arabic_street_names = [
+    "Al Wahda", "Al Salam", "Al Quds", "Al Nahda", "Al Jazeera", "Al Noor",
+    "Mohammed", "Sultan Qaboos", "King Abdullah", "Sheikh Zayed", "Hamdan"
+]
+
+turkish_districts = ["Beyoğlu", "Kadıköy", "Şişli", "Beşiktaş", "Üsküdar", "Bahçelievler", "Bağcılar", "Bakırköy", "Fatih", "Gaziosmanpaşa"]
+gulf_districts = ["Al Nahyan", "Al Bateen", "Al Manhal", "Al Mushrif", "Al Khalidiya", "Al Danah", "Al Markaziyah"]
+
+# Email parts
+email_domains = ["gmail.com", "yahoo.com", "outlook.com", "hotmail.com", "icloud.com", "doctor.com", "medmail.com"]
+email_separators = ["", ".", "_"]
+email_prefixes = ["dr", "doctor", "med", "doc"]
+
+# Department based on specialty
+departments = {
+    "Family Medicine": "Family Medicine",
+    "Internal Medicine": "Internal Medicine",
+    "Pediatrics": "Pediatrics",
+    "General Surgery": "Surgery",
+    "Obstetrics and Gynecology": "OB/GYN",
+    "Cardiology": "Cardiology",
+    "Orthopedics": "Orthopedics",
+    "Dermatology": "Dermatology",
+    "Neurology": "Neurology",
+    "Psychiatry": "Psychiatry",
+    "Ophthalmology": "Ophthalmology",
+    "Oncology": "Oncology",
+    "Endocrinology": "Endocrinology",
+    "Gastroenterology": "Gastroenterology",
+    "Nephrology": "Nephrology",
+    "Urology": "Urology",
+    "Pulmonology": "Pulmonology",
+    "Rheumatology": "Rheumatology",
+    "Hematology": "Hematology",
+    "Infectious Disease": "Infectious Disease",
+    "Allergy and Immunology": "Allergy and Immunology",
+    "Nuclear Medicine": "Nuclear Medicine",
+    "Plastic Surgery": "Surgery",
+    "Vascular Surgery": "Surgery",
+    "Neonatology": "Pediatrics",
+    "Geriatrics": "Geriatrics"
+}
+
+# Profile details
+bio_templates = [
+    "Board-certified {specialty} specialist with {years} years of experience. Currently practicing at {hospital} in {city}, {country}.",
+    "Experienced {specialty} doctor specializing in advanced treatments and patient care. {years} years of clinical experience at {hospital}.",
+    "Dedicated {specialty} physician with {years} years of experience in both clinical practice and research. Affiliated with {hospital}.",
+    "{specialty} specialist with a focus on innovative treatments and compassionate care. {years} years of medical practice at {hospital} in {city}."
+]
+week_days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+additional_languages = ["French", "German", "Spanish", "Russian", "Italian"]
+
 # International phone number formats
 def generate_international_phone(country):
     """Generate a random phone number based on country"""
-    country_codes = {
-        "Turkey": "+90",
-        "UAE": "+971",
-        "Saudi Arabia": "+966",
-        "Egypt": "+20",
-        "Lebanon": "+961",
-        "Jordan": "+962",
-        "Iraq": "+964",
-        "Iran": "+98",
-        "Qatar": "+974",
-        "Kuwait": "+965"
-    }
-    
     country_code = country_codes.get(country, "+90")  # Default to Turkey format
     
     if country == "Turkey":
         return f"{country_code} {random.randint(500, 559)} {random.randint(100, 999)} {random.randint(1000, 9999)}"
-    elif country in ["UAE", "Saudi Arabia", "Qatar", "Kuwait"]:
+    elif country in gulf_countries:
         return f"{country_code} {random.randint(50, 59)} {random.randint(100, 999)} {random.randint(1000, 9999)}"
     elif country in ["Egypt"]:
         return f"{country_code} {random.randint(10, 15)} {random.randint(1000, 9999)} {random.randint(1000, 9999)}"
@@ -252,34 +258,11 @@ def generate_international_address(city, country):
     """Generate a random address based on country"""
     number = random.randint(1, 120)
     
-    # Different address formats for different countries
-    street_types = {
-        "Turkey": ["Caddesi", "Sokak", "Bulvarı", "Mahallesi"],
-        "UAE": ["Street", "Road", "Avenue"],
-        "Saudi Arabia": ["Street", "Road", "Way"],
-        "Egypt": ["Street", "Avenue", "Square"],
-        "Lebanon": ["Street", "Avenue", "Boulevard"],
-        "Jordan": ["Street", "Road", "Avenue"],
-        "Iraq": ["Street", "Road", "Square"],
-        "Iran": ["Street", "Avenue", "Boulevard"],
-        "Qatar": ["Street", "Road", "Zone"],
-        "Kuwait": ["Street", "Road", "Block"]
-    }
-    
     # Use generic street type if country not in list
-    street_type = random.choice(street_types.get(country, ["Street", "Road", "Avenue"]))
+    street_type = random.choice(street_types.get(country, default_street_types))
     
     # Street names based on region
-    if country == "Turkey":
-        street_names = [
-            "Atatürk", "Cumhuriyet", "İstiklal", "Millet", "Bağdat", "Istiklal", 
-            "İnönü", "Vatan", "Gazi", "Fatih", "Fevzi Çakmak", "Kızılay"
-        ]
-    else:
-        street_names = [
-            "Al Wahda", "Al Salam", "Al Quds", "Al Nahda", "Al Jazeera", "Al Noor",
-            "Mohammed", "Sultan Qaboos", "King Abdullah", "Sheikh Zayed", "Hamdan"
-        ]
+    street_names = turkish_street_names if country == "Turkey" else arabic_street_names
     
     street_name = random.choice(street_names)
     
@@ -295,25 +278,22 @@ def generate_international_address(city, country):
     
     # Build the address based on common formats for the country
     if country == "Turkey":
-        district = random.choice(["Beyoğlu", "Kadıköy", "Şişli", "Beşiktaş", "Üsküdar", "Bahçelievler", "Bağcılar", "Bakırköy", "Fatih", "Gaziosmanpaşa"])
+        district = random.choice(turkish_districts)
         return f"{street_name} {street_type} No:{number}, {district}, {city}, {country}, {postal_code}"
-    elif country in ["UAE", "Saudi Arabia", "Qatar", "Kuwait"]:
-        district = random.choice(["Al Nahyan", "Al Bateen", "Al Manhal", "Al Mushrif", "Al Khalidiya", "Al Danah", "Al Markaziyah"])
+    elif country in gulf_countries:
+        district = random.choice(gulf_districts)
         return f"{number} {street_name} {street_type}, {district}, {city}, {country}, {postal_code}"
     else:
         return f"{number} {street_name} {street_type}, {city}, {country}, {postal_code}"
 
-def generate_email(first_name, last_name):
-    """Generate a random email from first and last name"""
-    domains = ["gmail.com", "yahoo.com", "outlook.com", "hotmail.com", "icloud.com", "doctor.com", "medmail.com"]
-    separators = ["", ".", "_"]
-    sep = random.choice(separators)
-    domain = random.choice(domains)
+def generate_email(first_name, last_name, domain=None):
+    """Generate a random email from first and last name (on domain when given)"""
+    sep = random.choice(email_separators)
+    domain = domain or random.choice(email_domains)
     
     # For doctors, sometimes include title or specialty
     if random.random() < 0.3:
-        prefixes = ["dr", "doctor", "med", "doc"]
-        prefix = random.choice(prefixes)
+        prefix = random.choice(email_prefixes)
         email = f"{prefix}{sep}{first_name.lower()}{sep}{last_name.lower()}@{domain}"
     elif random.random() < 0.5:
         # firstname.lastname@domain.com style
@@ -340,7 +320,7 @@ def generate_license_number(country):
 def generate_education():
     """Generate education history for a doctor"""
     school = random.choice(medical_schools)
-    graduation_year = datetime.now().year - random.randint(5, 35)  # Graduated 5-35 years ago
+    graduation_year = anchored_now().year - random.randint(5, 35)  # Graduated 5-35 years ago
     
     education = {
         "medical_school": school,
@@ -380,19 +360,13 @@ def generate_professional_profile(specialty, country, city):
     years_experience = random.randint(5, 30)
     
     # Generate bio
-    bio_templates = [
-        f"Board-certified {specialty} specialist with {years_experience} years of experience. Currently practicing at {hospital} in {city}, {country}.",
-        f"Experienced {specialty} doctor specializing in advanced treatments and patient care. {years_experience} years of clinical experience at {hospital}.",
-        f"Dedicated {specialty} physician with {years_experience} years of experience in both clinical practice and research. Affiliated with {hospital}.",
-        f"{specialty} specialist with a focus on innovative treatments and compassionate care. {years_experience} years of medical practice at {hospital} in {city}."
-    ]
-    
-    bio = random.choice(bio_templates)
+    bio = random.choice(bio_templates).format(
+        specialty=specialty, years=years_experience, hospital=hospital, city=city, country=country
+    )
     
     # Generate availability
-    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-    work_days = random.sample(days, random.randint(3, 6))
-    work_days.sort(key=lambda x: days.index(x))
+    work_days = random.sample(week_days, random.randint(3, 6))
+    work_days.sort(key=lambda x: week_days.index(x))
     
     availability = {}
     for day in work_days:
@@ -404,7 +378,7 @@ def generate_professional_profile(specialty, country, city):
     if country == "Turkey":
         currency = "TRY"
         base_amount = random.randint(500, 2000)
-    elif country in ["UAE", "Saudi Arabia", "Qatar", "Kuwait"]:
+    elif country in gulf_countries:
         currency = "USD"
         base_amount = random.randint(100, 500)
     else:
@@ -436,31 +410,39 @@ def generate_professional_profile(specialty, country, city):
     
     # Sometimes add another language
     if random.random() < 0.4:
-        additional_languages = ["French", "German", "Spanish", "Russian", "Italian"]
         additional = random.choice(additional_languages)
         if additional not in profile["languages"]:
             profile["languages"].append(additional)
     
     return profile
 
-# Generate doctors
-doctors = []
-for i in range(20):
-    # Determine ethnicity and location (70% Turkish, 30% other Middle Eastern)
-    if random.random() < 0.7:
+def generate_doctor(admin_id, keys=None):
+    """Generate a single doctor document
+
+    keys is a shard's KeySpace when running with --workers; it restricts the
+    last name and email domain to pairs no other shard can produce.
+    """
+    # Determine ethnicity and location (70% Turkish, 30% other Middle Eastern);
+    # in a shard the drawn last name decides the ethnicity instead
+    if keys is None:
+        turkish, last_name, domain = random.random() < 0.7, None, None
+    else:
+        last_name, domain = keys.draw()
+        turkish = last_name in turkish_last_names
+    if turkish:
         first_name = random.choice(turkish_first_names)
-        last_name = random.choice(turkish_last_names)
+        last_name = last_name or random.choice(turkish_last_names)
         # For Turkish doctors, ensure they're in Turkey
         turkish_locations = [loc for loc in locations if loc[1] == "Turkey"]
         city, country = random.choice(turkish_locations)
     else:
         first_name = random.choice(middle_eastern_first_names)
-        last_name = random.choice(middle_eastern_last_names)
+        last_name = last_name or random.choice(middle_eastern_last_names)
         # For other Middle Eastern doctors, can be anywhere in the Middle East
         city, country = random.choice(locations)
     
     # Generate random birth date for a doctor (30-70 years old)
-    birth_year = datetime.now().year - random.randint(30, 70)
+    birth_year = anchored_now().year - random.randint(30, 70)
     birth_month = random.randint(1, 12)
     birth_day = random.randint(1, 28)  # Using 28 to avoid invalid dates
     birth_date = datetime(birth_year, birth_month, birth_day)
@@ -469,34 +451,6 @@ for i in range(20):
     specialty = random.choice(specialties)
     
     # Generate department based on specialty
-    departments = {
-        "Family Medicine": "Family Medicine",
-        "Internal Medicine": "Internal Medicine",
-        "Pediatrics": "Pediatrics",
-        "General Surgery": "Surgery",
-        "Obstetrics and Gynecology": "OB/GYN",
-        "Cardiology": "Cardiology",
-        "Orthopedics": "Orthopedics",
-        "Dermatology": "Dermatology",
-        "Neurology": "Neurology",
-        "Psychiatry": "Psychiatry",
-        "Ophthalmology": "Ophthalmology",
-        "Oncology": "Oncology",
-        "Endocrinology": "Endocrinology",
-        "Gastroenterology": "Gastroenterology",
-        "Nephrology": "Nephrology",
-        "Urology": "Urology",
-        "Pulmonology": "Pulmonology",
-        "Rheumatology": "Rheumatology",
-        "Hematology": "Hematology",
-        "Infectious Disease": "Infectious Disease",
-        "Allergy and Immunology": "Allergy and Immunology",
-        "Nuclear Medicine": "Nuclear Medicine",
-        "Plastic Surgery": "Surgery",
-        "Vascular Surgery": "Surgery",
-        "Neonatology": "Pediatrics",
-        "Geriatrics": "Geriatrics"
-    }
     department = departments.get(specialty, specialty)
     
     # Generate professional profile
@@ -512,7 +466,7 @@ for i in range(20):
     
     # Create the doctor record
     doctor = {
-        "email": generate_email(first_name, last_name),
+        "email": generate_email(first_name, last_name, domain),
         "password": "password123",  # Would be hashed in a real scenario
         "role": "doctor",
         "firstName": first_name,
@@ -532,8 +486,8 @@ for i in range(20):
         "isInternational": True,
         "nationality": country,
         "createdBy": admin_id,
-        "createdAt": datetime.now(),
-        "updatedAt": datetime.now(),
+        "createdAt": anchored_now(),
+        "updatedAt": anchored_now(),
         # Visibility settings
         "visibilitySettings": {
             "phone": random.random() < 0.3,  # 30% chance of showing phone
@@ -546,30 +500,314 @@ for i in range(20):
             "experience": True
         }
     }
-    doctors.append(doctor)
-
-# Check for existing international doctors
-try:
-    # Ask for confirmation before adding doctors
-    existing_count = users_collection.count_documents({"role": "doctor", "isInternational": True})
-    if existing_count > 0:
-        confirm = input(f"Found {existing_count} existing international doctors. Add 20 more? (y/n): ")
-        if confirm.lower() != 'y':
-            print("Operation cancelled by user.")
-            sys.exit(0)
-except Exception as e:
-    print(f"Error checking existing doctors: {e}")
-
-# Insert doctors into the database
-try:
-    result = users_collection.insert_many(doctors)
-    print(f"Successfully added {len(result.inserted_ids)} international doctors to the database.")
-    
-    # Print the names of doctors that were added
-    for i, doctor in enumerate(doctors):
-        print(f"  {i+1}. Dr. {doctor['firstName']} {doctor['lastName']} - {doctor['specialization']} - {doctor['location']}")
-except Exception as e:
-    print(f"Error adding doctors: {e}")
-    sys.exit(1)
-
-print("Done!") 
\ No newline at end of file
+    return doctor
+
+def generate_doctors(count, admin_id, keys=None):
+    """Yield doctor documents one at a time"""
+    for _ in range(count):
+        yield generate_doctor(admin_id, keys)
+
+def build_doctor_chunk(columns, admin_id, keys=None):
+    """Assemble one chunk of doctor documents from column draws
+
+    Mirrors generate_doctor field by field; see healthbridge_tools.columnar.
+    Country-specific formats draw every variant's numbers up front and pick
+    the right one per row, which leaves each branch's distribution unchanged.
+    """
+    turkish_locations = [loc for loc in locations if loc[1] == "Turkey"]
+    male_names = set(turkish_first_names[:10]) | set(middle_eastern_first_names[:20])
+    now = anchored_now()
+
+    # 70% Turkish doctors based in Turkey, 30% other Middle Eastern doctors anywhere
+    # (in a --workers shard the last name drawn from the shard's key space decides instead)
+    if keys is None:
+        turkish = np.asarray(columns.chance(0.7))
+    else:
+        shard_last_names, shard_domains = keys.draw_column(columns)
+        turkish = np.isin(shard_last_names, turkish_last_names)
+    first_names = np.where(turkish, columns.pick(turkish_first_names), columns.pick(middle_eastern_first_names))
+    if keys is None:
+        last_names = np.where(turkish, columns.pick(turkish_last_names), columns.pick(middle_eastern_last_names))
+    else:
+        last_names = np.asarray(shard_last_names)
+    places = np.where(turkish, objects(columns.pick(turkish_locations)), objects(columns.pick(locations))).tolist()
+    countries = [country for _, country in places]
+
+    specialty_index = columns.index(len(specialties))
+    residency_index = columns.index(len(specialties))
+    # Fellowship specialty differs from the residency: skip over its position
+    fellowship_index = columns.index(len(specialties) - 1)
+    fellowship_index += fellowship_index >= residency_index
+
+    years_experience = columns.integers(5, 30)
+    base_rating = np.minimum(3 + np.asarray(years_experience) / 10, 4.9)
+    ratings = np.clip(base_rating + columns.rng.uniform(-0.5, 0.5, columns.size), 3, 5).round(1)
+
+    # Office hours for every week day; only the sampled work days are used
+    office_hours = objects([f"{start}:00 - {end}:00" for start in range(8, 11) for end in range(16, 20)])[
+        columns.rng.integers(0, 3, (columns.size, 7)) * 4 + columns.rng.integers(0, 4, (columns.size, 7))
+    ].tolist()
+
+    rows = zip(
+        columns.object_ids(), first_names.tolist(), last_names.tolist(), places, columns.birth_dates(30, 70, now.year),
+        objects(specialties)[specialty_index].tolist(),
+        objects([departments.get(s, s) for s in specialties])[specialty_index].tolist(),
+        # Professional profile
+        columns.pick_each([hospitals.get(country, [None]) for country in countries]),
+        years_experience, columns.pick(bio_templates), columns.subsets(week_days, 3, 6), office_hours,
+        columns.integers(500, 2000), columns.integers(100, 500), columns.integers(50, 300),
+        columns.chance(0.8), columns.chance(0.7), columns.chance(0.4), columns.pick(additional_languages),
+        ratings.tolist(), columns.integers(10, 500),
+        # Education
+        columns.pick(medical_schools), columns.integers(5, 35), objects(specialties)[residency_index].tolist(),
+        columns.pick(medical_schools), columns.chance(0.4), objects(specialties)[fellowship_index].tolist(),
+        columns.pick(medical_schools),
+        # Email: prefix, plain and numbered styles
+        columns.pick(email_separators), columns.pick(email_domains) if keys is None else shard_domains,
+        columns.chance(0.3),
+        columns.pick(email_prefixes), columns.chance(0.5), columns.integers(1, 99),
+        # Phone: leading group per country format, then the shared groups
+        columns.integers(500, 559), columns.integers(50, 59), columns.integers(10, 15), columns.integers(50, 79),
+        columns.integers(100, 999), columns.integers(1000, 9999), columns.integers(1000, 9999),
+        # Address
+        columns.integers(1, 120), columns.pick_each([street_types.get(c, default_street_types) for c in countries]),
+        columns.pick(turkish_street_names), columns.pick(arabic_street_names),
+        columns.integers(10000, 81900), columns.integers(10000, 99999), columns.integers(1000, 9999),
+        columns.pick(turkish_districts), columns.pick(gulf_districts),
+        # License number and visibility
+        columns.integers(10000, 99999), columns.integers(1000, 9999),
+        columns.chance(0.3), columns.chance(0.3), columns.chance(0.5)
+    )
+    for (_id, first_name, last_name, (city, country), birth_date, specialty, department,
+         hospital, years, bio_template, work_days, hours, fee_try, fee_gulf, fee_other,
+         accepting, telehealth, extra_language, language, rating, rating_count,
+         school, years_since_graduation, residency_specialty, residency_school, has_fellowship,
+         fellowship_specialty, fellowship_school,
+         sep, domain, prefixed, prefix, plain, email_number,
+         phone_tr, phone_gulf, phone_eg, phone_other, phone_mid, phone_last, phone_eg_mid,
+         street_number, street_type, street_tr, street_ar, postal_tr, postal, postal_suffix,
+         district_tr, district_gulf, license_number, license_number_uae,
+         show_phone, show_email, show_license) in rows:
+        hospital = hospital or f"{city} Medical Center"
+        graduation_year = now.year - years_since_graduation
+        education = {
+            "medical_school": school,
+            "degree": "M.D.",
+            "graduation_year": graduation_year,
+            "residency": {
+                "specialty": residency_specialty,
+                "institution": residency_school,
+                "years": f"{graduation_year + 1} - {graduation_year + 4}"
+            }
+        }
+        if has_fellowship:
+            education["fellowship"] = {
+                "specialty": fellowship_specialty,
+                "institution": fellowship_school,
+                "years": f"{graduation_year + 5} - {graduation_year + 7}"
+            }
+
+        languages = ["English"]
+        if country == "Turkey":
+            languages.append("Turkish")
+        elif country in ["UAE", "Saudi Arabia", "Egypt", "Lebanon", "Jordan", "Iraq"]:
+            languages.append("Arabic")
+        elif country == "Iran":
+            languages.append("Persian")
+        if extra_language and language not in languages:
+            languages.append(language)
+
+        # Same branches as the scalar helpers, reading pre-drawn columns
+        if prefixed:
+            email = f"{prefix}{sep}{first_name.lower()}{sep}{last_name.lower()}@{domain}"
+        elif plain:
+            email = f"{first_name.lower()}{sep}{last_name.lower()}@{domain}"
+        else:
+            email = f"{first_name.lower()}{sep}{last_name.lower()}{email_number}@{domain}"
+
+        country_code = country_codes.get(country, "+90")
+        if country == "Turkey":
+            phone = f"{country_code} {phone_tr} {phone_mid} {phone_last}"
+            consultation_fee = f"{fee_try} TRY"
+            license_code = f"TR-MD-{license_number}"
+            address = (f"{street_tr} {street_type} No:{street_number}, {district_tr}, {city}, {country}, "
+                       f"{postal_tr}")
+        else:
+            if country in gulf_countries:
+                phone = f"{country_code} {phone_gulf} {phone_mid} {phone_last}"
+                consultation_fee = f"{fee_gulf} USD"
+            elif country == "Egypt":
+                phone = f"{country_code} {phone_eg} {phone_eg_mid} {phone_last}"
+                consultation_fee = f"{fee_other} USD"
+            else:
+                phone = f"{country_code} {phone_other} {phone_mid} {phone_last}"
+                consultation_fee = f"{fee_other} USD"
+            postal_code = f"{postal}-{postal_suffix}" if country == "Saudi Arabia" else f"{postal}"
+            if country in gulf_countries:
+                address = f"{street_number} {street_ar} {street_type}, {district_gulf}, {city}, {country}, {postal_code}"
+            else:
+                address = f"{street_number} {street_ar} {street_type}, {city}, {country}, {postal_code}"
+            if country == "UAE":
+                license_code = f"UAE-DHA-{license_number_uae}"
+            elif country == "Saudi Arabia":
+                license_code = f"SCFHS-{license_number}"
+            elif country == "Egypt":
+                license_code = f"EG-MS-{license_number}"
+            else:
+                license_code = f"MED-{country[:2].upper()}-{license_number}"
+
+        yield {
+            "_id": _id,
+            "email": email,
+            "password": "password123",  # Would be hashed in a real scenario
+            "role": "doctor",
+            "firstName": first_name,
+            "lastName": last_name,
+            "dateOfBirth": birth_date,
+            "gender": "male" if first_name in male_names else "female",
+            "phone": phone,
+            "address": address,
+            "location": f"{city}, {country}",
+            "active": True,
+            "department": department,
+            "specialization": specialty,
+            "licenseNumber": license_code,
+            "rating": rating,
+            "ratingCount": rating_count,
+            "professionalProfile": {
+                "bio": bio_template.format(specialty=specialty, years=years, hospital=hospital, city=city,
+                                           country=country),
+                "education": education,
+                "experience": f"{years} years",
+                "hospital": hospital,
+                "availability": {day: hours[week_days.index(day)] for day in work_days},
+                "consultationFee": consultation_fee,
+                "acceptingNewPatients": accepting,
+                "telehealth": telehealth,
+                "languages": languages
+            },
+            "isInternational": True,
+            "nationality": country,
+            "createdBy": admin_id,
+            "createdAt": now,
+            "updatedAt": now,
+            # Visibility settings
+            "visibilitySettings": {
+                "phone": show_phone,
+                "email": show_email,
+                "department": True,
+                "specialization": True,
+                "licenseNumber": show_license,
+                "bio": True,
+                "education": True,
+                "experience": True
+            }
+        }
+
+def generate_doctors_columnar(count, admin_id, rng, chunk_size=None, keys=None):
+    """Yield doctor documents built from NumPy column draws"""
+    return generate_columnar(count, lambda columns: build_doctor_chunk(columns, admin_id, keys), rng, chunk_size)
+
+def insert_shard(shard):
+    """Generate and insert one --workers shard of doctors (runs in a worker process)"""
+    rng = shard.seed_random()
+    admin_id = shard.options["admin_id"]
+    if shard.options["columnar"]:
+        doctors = generate_doctors_columnar(shard.count, admin_id, rng, keys=shard.keys)
+    else:
+        doctors = generate_doctors(shard.count, admin_id, shard.keys)
+    user_keys = shard.options["user_keys"].for_shard(shard.index)
+    doctors = user_keys.assign(doctors)
+    hasher = shard.password_hasher()
+    if hasher:
+        doctors = hasher.materialize(doctors)
+    added = []
+    doctors = keep_first(doctors, added, shard.sample)
+    if shard.options["columnar"] and not shard.options["dry_run"]:
+        doctors = encode_raw(doctors)
+    stats = bulk_insert(get_db().users, doctors, **shard.writer_options())
+    return shard.result(stats, added, hasher, replacedKeys=user_keys.replaced)
+
+def run(args, summary):
+    """Add sample international doctors to the database"""
+    db = get_db()
+    users_collection = db.users
+    admin_id = resolve_admin_id(db, assume_yes=args.yes, dry_run=args.dry_run)
+    
+    # Generate doctors
+    if args.columnar:
+        doctors = generate_doctors_columnar(args.count, admin_id, make_rng(args.seed))
+    else:
+        doctors = generate_doctors(args.count, admin_id)
+    # Keep emails unique against the existing users and each other
+    user_keys = UserKeys.preload(users_collection, args.count, args.cursor_batch_size)
+    doctors = user_keys.assign(doctors)
+    # Replace plain-text passwords with cached bcrypt hashes when asked to
+    hasher = PasswordHasher(**hasher_options(args)) if args.hash_passwords else None
+    if hasher:
+        doctors = hasher.materialize(doctors)
+    if args.columnar and not args.dry_run:
+        doctors = encode_raw(doctors)
+    
+    # Check for existing international doctors
+    try:
+        # Ask for confirmation before adding doctors
+        existing_count = users_collection.count_documents({"role": "doctor", "isInternational": True})
+        if existing_count > 0:
+            if not confirm(args, f"Found {existing_count} existing international doctors. Add {args.count} more? (y/n): "):
+                print("Operation cancelled by user.")
+                return
+    except Exception as e:
+        print(f"Error checking existing doctors: {e}")
+    
+    # Insert doctors into the database
+    try:
+        if args.workers > 1:
+            # Shards split the last names by their overall 70/30 weight
+            last_name_weights = {name: 0.7 / len(turkish_last_names) for name in turkish_last_names}
+            last_name_weights.update({name: 0.3 / len(middle_eastern_last_names) for name in middle_eastern_last_names})
+            keys = partition_keys(list(last_name_weights), email_domains, args.workers, last_name_weights)
+            stats, added, results = run_sharded(args, insert_shard, keys=keys, admin_id=admin_id, columnar=args.columnar,
+                                                user_keys=user_keys, passwords=hasher_options(args) if hasher else None)
+            user_keys.replaced += sum(result["replacedKeys"] for result in results)
+            if hasher:
+                for result in results:
+                    hasher.absorb(result.get("passwords"))
+        else:
+            added = []
+            stats = bulk_insert(users_collection, keep_first(doctors, added), **writer_options(args))
+        summary.update(stats.as_dict())
+        summary["uniqueKeys"] = user_keys.as_dict()
+        if user_keys.replaced:
+            print(f"Replaced {user_keys.replaced} duplicate emails with unique sequence-numbered ones.")
+        if hasher:
+            summary["passwords"] = hasher.as_dict()
+            print(f"Hashed {hasher.hashed} distinct passwords ({hasher.cache_hits} taken from the hash cache).")
+            hasher.close()
+        report_result(stats, "international doctors")
+    
+        # Print the names of the first doctors that were added
+        for i, doctor in enumerate(added):
+            print(f"  {i+1}. Dr. {doctor['firstName']} {doctor['lastName']} - {doctor['specialization']} - {doctor['location']}")
+        if stats.inserted > len(added):
+            print(f"  ... and {stats.inserted - len(added)} more")
+    except Exception as e:
+        print(f"Error adding doctors: {e}")
+        sys.exit(1)
+    
+    print("Done!") 
+
+def main(argv=None):
+    """Parse command-line options and run the seeder"""
+    parser = build_parser("add_international_doctors.py", "Add sample international doctors to the database.",
+                          default_count=20, columnar=True, sharded=True, passwords=True)
+    args = parser.parse_args(argv)
+    apply_seed(args, "add_international_doctors")
+    with json_summary(args, "add_international_doctors") as summary:
+        summary["count"] = args.count
+        summary["columnar"] = args.columnar
+        summary["workers"] = args.workers
+        run(args, summary)
+
+if __name__ == "__main__":
+    main()
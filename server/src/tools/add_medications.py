@@ -1,87 +1,10 @@
 #!/usr/bin/env python3
-import os
 import sys
-import pymongo
-from datetime import datetime
-from bson import ObjectId
-from dotenv import load_dotenv
-import re
 
-# Check for .env file and create if it doesn't exist
-env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env')
-if not os.path.exists(env_path):
-    print(f"Warning: .env file not found at {env_path}")
-    mongo_uri = input("Please enter your MongoDB connection string: ")
-    with open(env_path, 'w') as f:
-        f.write(f"MONGODB_URI={mongo_uri}\n")
-    print(f"Created .env file at {env_path}")
-
-# Load environment variables from .env file
-load_dotenv(env_path)
-
-# Get MongoDB URI from environment variable
-mongo_uri = os.getenv('MONGODB_URI')
-if not mongo_uri:
-    print("Error: MONGODB_URI environment variable not found.")
-    mongo_uri = input("Please enter your MongoDB connection string: ")
-    with open(env_path, 'a') as f:
-        f.write(f"MONGODB_URI={mongo_uri}\n")
-    print(f"Updated .env file with MongoDB URI")
-
-# Extract database name from URI or use default
-db_name = "test"
-uri_db_match = re.search(r'/([^/\?]+)(\?|$)', mongo_uri)
-if uri_db_match:
-    db_name = uri_db_match.group(1)
-
-# Setup MongoDB connection
-try:
-    client = pymongo.MongoClient(mongo_uri)
-    
-    # Use database from URI or default
-    db = client[db_name]
-    medications_collection = db.medications
-    users_collection = db.users
-    print(f"Connected to MongoDB database '{db_name}' successfully!")
-except Exception as e:
-    print(f"Error connecting to MongoDB: {e}")
-    sys.exit(1)
-
-# We need to find an admin user to set as createdBy
-try:
-    admin_user = users_collection.find_one({"role": "admin"})
-    if not admin_user:
-        print("No admin user found. Looking for any user...")
-        any_user = users_collection.find_one({})
-        if not any_user:
-            print("No users found in the database.")
-            create_user = input("Would you like to create a placeholder admin user? (y/n): ")
-            if create_user.lower() == 'y':
-                admin_id = ObjectId()
-                admin_user = {
-                    "_id": admin_id,
-                    "email": "admin@healthbridge.com",
-                    "password": "placeholder",  # This would be hashed in a real scenario
-                    "firstName": "Admin",
-                    "lastName": "User",
-                    "role": "admin",
-                    "createdAt": datetime.now(),
-                    "updatedAt": datetime.now()
-                }
-                users_collection.insert_one(admin_user)
-                print(f"Created placeholder admin user with ID: {admin_id}")
-            else:
-                print("Cannot proceed without a user. Exiting.")
-                sys.exit(1)
-        else:
-            admin_id = any_user["_id"]
-            print(f"Using user ID: {admin_id} as creator")
-    else:
-        admin_id = admin_user["_id"]
-        print(f"Using admin user ID: {admin_id} as creator")
-except Exception as e:
-    print(f"Error finding or creating admin user: {e}")
-    sys.exit(1)
+from healthbridge_tools import bulk_insert, get_db, report_result, resolve_admin_id
+from healthbridge_tools.checkpoints import preserve
+from healthbridge_tools.cli import apply_seed, build_parser, confirm, json_summary, writer_options
+from healthbridge_tools.repro import anchored_now
 
 # List of 20 new medications with relevant details
 medications = [
@@ -267,45 +190,73 @@ medications = [
     }
 ]
 
-# Delete existing medications if they exist
-try:
-    # Ask for confirmation before deleting existing medications
-    existing_count = medications_collection.count_documents({})
-    if existing_count > 0:
-        confirm = input(f"Found {existing_count} existing medications. Delete them all and add new ones? (y/n): ")
-        if confirm.lower() == 'y':
-            medications_collection.delete_many({})
-            print(f"Deleted {existing_count} existing medications.")
-        else:
-            print("Will only add medications that don't already exist.")
-except Exception as e:
-    print(f"Error checking existing medications: {e}")
+def generate_medications(admin_id):
+    """Add timestamps and creator information to each medication"""
+    return [
+        {**medication, "createdBy": admin_id, "createdAt": anchored_now(), "updatedAt": anchored_now()}
+        for medication in medications
+    ]
 
-# Add timestamps and creator information to each medication
-for medication in medications:
-    medication["createdBy"] = admin_id
-    medication["createdAt"] = datetime.now()
-    medication["updatedAt"] = datetime.now()
-
-# Insert medications into the database
-try:
-    # Check for existing medications to avoid duplicates
-    existing_medications = set(med["name"] for med in medications_collection.find({}, {"name": 1}))
+def run(args, summary):
+    """Add the sample medications to the database"""
+    db = get_db()
+    medications_collection = db.medications
+    admin_id = resolve_admin_id(db, assume_yes=args.yes, dry_run=args.dry_run)
+    
+    # Delete existing medications if they exist
+    try:
+        # Ask for confirmation before deleting existing medications
+        existing_count = medications_collection.count_documents({})
+        if args.resume:
+            # Deleting now would also delete what the interrupted run added
+            print(f"Resuming: keeping the {existing_count} medications in the database.")
+        elif existing_count > 0:
+            # Deleting is destructive, so --yes alone keeps the existing medications; --replace opts in
+            if args.replace or (not args.yes and confirm(args, f"Found {existing_count} existing medications. Delete them all and add new ones? (y/n): ")):
+                if args.dry_run:
+                    print(f"Dry run: would delete {existing_count} existing medications.")
+                else:
+                    medications_collection.delete_many({})
+                    print(f"Deleted {existing_count} existing medications.")
+            else:
+                print("Will only add medications that don't already exist.")
+    except Exception as e:
+        print(f"Error checking existing medications: {e}")
+    
+    # Insert medications into the database
+    try:
+        # Check for existing medications to avoid duplicates
+        # A resumed run filters against the names its interrupted run found
+        existing_medications = preserve("medication_names",
+                                        lambda: set(med["name"] for med in medications_collection.find({}, {"name": 1})))
     
-    # Filter out medications that already exist
-    new_medications = [med for med in medications if med["name"] not in existing_medications]
+        # Filter out medications that already exist
+        new_medications = [med for med in generate_medications(admin_id) if med["name"] not in existing_medications]
     
-    if not new_medications:
-        print("All medications already exist in the database. No new medications were added.")
-    else:
-        result = medications_collection.insert_many(new_medications)
-        print(f"Successfully added {len(result.inserted_ids)} medications to the database.")
-        
-        # Print the names of medications that were added
-        for i, med_id in enumerate(result.inserted_ids):
-            print(f"  {i+1}. {new_medications[i]['name']}")
-except Exception as e:
-    print(f"Error adding medications: {e}")
-    sys.exit(1)
+        if not new_medications:
+            print("All medications already exist in the database. No new medications were added.")
+        else:
+            stats = bulk_insert(medications_collection, new_medications, **{**writer_options(args), "progress": False})
+            summary.update(stats.as_dict())
+            report_result(stats, "medications")
+    
+            # Print the names of medications that were added
+            for i, medication in enumerate(new_medications):
+                print(f"  {i+1}. {medication['name']}")
+    except Exception as e:
+        print(f"Error adding medications: {e}")
+        sys.exit(1)
+    
+    print("Done!") 
+
+def main(argv=None):
+    """Parse command-line options and run the seeder"""
+    parser = build_parser("add_medications.py", "Add the sample medications to the database.", default_count=False)
+    parser.add_argument("--replace", action="store_true", help="delete existing medications before adding")
+    args = parser.parse_args(argv)
+    apply_seed(args, "add_medications")
+    with json_summary(args, "add_medications") as summary:
+        run(args, summary)
 
-print("Done!") 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+import sys
+from collections import Counter
+from datetime import timedelta
+import random
+
+from healthbridge_tools import bulk_insert, get_db, load_columns, observe, report_result
+from healthbridge_tools.cli import apply_seed, build_parser, confirm, json_summary, prompt_int, writer_options
+from healthbridge_tools.repro import anchored_now
+
+# Only these appointment fields are read, packed into compact columns
+APPOINTMENT_SCHEMA = {
+    "_id": "objectid",
+    "patient": "objectid",
+    "doctor": "objectid",
+    "date": "date"
+}
+
+# Thread lengths follow a Pareto distribution: most conversations are a few
+# messages long, a few run to hundreds
+THREAD_LENGTH_ALPHA = 1.3
+MAX_THREAD_LENGTH = 500
+
+# Average minutes between a message and its reply
+MEAN_REPLY_MINUTES = 180
+
+# Messages patients start conversations with
+patient_openers = [
+    "Hello doctor, I have a question about my upcoming appointment.",
+    "Hi, could we move my appointment to a later time?",
+    "I've been feeling worse since my last visit. Should I come in earlier?",
+    "Do I need to fast before my appointment?",
+    "Can you tell me which documents I should bring?",
+    "I'm running out of my medication. Can you renew my prescription?",
+    "I received my lab results. Could you explain them to me?",
+    "Is it okay to take ibuprofen with my current medication?",
+    "My symptoms have improved a lot, thank you!",
+    "I have a rash that appeared after starting the new medication."
+]
+
+# Patient replies later in a conversation
+patient_replies = [
+    "Thank you, that helps a lot.",
+    "Okay, I will do that.",
+    "Should I be worried about this?",
+    "How long will it take to feel better?",
+    "I forgot to mention that I also have headaches.",
+    "Can I continue exercising in the meantime?",
+    "Got it, see you at the appointment.",
+    "The pain is about a 4 out of 10 today.",
+    "I've attached a photo, can you take a look?",
+    "Thanks doctor, have a nice day."
+]
+
+# Doctor replies
+doctor_replies = [
+    "Thank you for your message. Please continue the current treatment for now.",
+    "That is a common side effect and should pass within a few days.",
+    "Please come in if the symptoms get worse.",
+    "Yes, please fast for 8 hours before the blood test.",
+    "I've renewed your prescription; you can pick it up at the pharmacy.",
+    "Your results are within the normal range.",
+    "Let's discuss this in detail at your appointment.",
+    "Please avoid ibuprofen and take paracetamol instead.",
+    "I'd like to see you earlier. Please book a slot this week.",
+    "Glad to hear you're feeling better!"
+]
+
+# Files shared in conversations
+attachment_names = [
+    "lab-results.pdf",
+    "prescription.pdf",
+    "referral-letter.pdf",
+    "photo.jpg",
+    "insurance-card.png",
+    "blood-pressure-log.xlsx"
+]
+
+def load_appointments(appointments_collection, batch_size=None):
+    """Get every appointment's patient, doctor and date as compact columns"""
+    try:
+        appointments = load_columns(appointments_collection, {}, APPOINTMENT_SCHEMA, batch_size)
+        appointment_count = len(appointments)
+        if appointment_count == 0:
+            print("No appointments found in the database. Cannot create messages.")
+            sys.exit(1)
+        else:
+            print(f"Found {appointment_count} appointments to attach conversations to "
+                  f"({appointments.nbytes / 1024:.0f} KiB loaded).")
+    except Exception as e:
+        print(f"Error finding appointments: {e}")
+        sys.exit(1)
+    return appointments
+
+# Draw a thread length from the heavy-tailed distribution
+def generate_thread_length():
+    return min(MAX_THREAD_LENGTH, int(random.paretovariate(THREAD_LENGTH_ALPHA)))
+
+# Generate the createdAt of every message in a thread, oldest first
+def generate_timestamps(appointment_date, length):
+    now = anchored_now()
+    gaps = [timedelta(minutes=random.expovariate(1 / MEAN_REPLY_MINUTES)) for _ in range(length - 1)]
+    span = sum(gaps, timedelta())
+    
+    # Conversations start up to a week before the appointment or up to two weeks after it
+    start = appointment_date + timedelta(days=random.uniform(-7, 14))
+    # Nothing can be written after now
+    start = min(start, now - span - timedelta(minutes=1))
+    
+    timestamps = [start]
+    for gap in gaps:
+        timestamps.append(timestamps[-1] + gap)
+    return timestamps
+
+# Generate the status of a message; all but the newest messages of a thread have been read
+def generate_status(is_latest):
+    if not is_latest:
+        return "read"
+    return random.choices(["sent", "delivered", "read"], weights=[0.2, 0.3, 0.5], k=1)[0]
+
+# Generate message attachments (5% of messages carry one)
+def generate_attachments():
+    if random.random() < 0.05:
+        return [f"/uploads/messages/{random.randint(100000, 999999)}-{random.choice(attachment_names)}"]
+    return []
+
+def generate_thread(appointment, length):
+    """Yield the messages of one doctor-patient conversation in createdAt order"""
+    patient_id = appointment["patient"]
+    doctor_id = appointment["doctor"]
+    # Patients start most conversations
+    patient_turn = random.random() < 0.8
+    timestamps = generate_timestamps(appointment.get("date", anchored_now()), length)
+    
+    for position, created_at in enumerate(timestamps):
+        if patient_turn:
+            sender, recipient = patient_id, doctor_id
+            content = random.choice(patient_openers if position == 0 else patient_replies)
+        else:
+            sender, recipient = doctor_id, patient_id
+            content = random.choice(doctor_replies)
+        
+        status = generate_status(position == length - 1)
+        message = {
+            "sender": sender,
+            "recipient": recipient,
+            "content": content,
+            "status": status,
+            "appointmentId": appointment["_id"],
+            "attachments": generate_attachments(),
+            "createdAt": created_at,
+            # Read messages were last updated when the recipient read them
+            "updatedAt": created_at + timedelta(minutes=random.randint(1, 120)) if status == "read" else created_at
+        }
+        yield message
+        
+        # Most replies come from the other side; sometimes the same person writes twice
+        if random.random() < 0.85:
+            patient_turn = not patient_turn
+
+def generate_messages(num_messages, appointments, thread_lengths=None):
+    """Yield exactly num_messages messages, grouped into conversation threads
+    
+    thread_lengths, if given, is a Counter that receives the length of every thread.
+    """
+    remaining = num_messages
+    while remaining > 0:
+        appointment = appointments.row(random.randrange(len(appointments)))
+        length = min(remaining, generate_thread_length())
+        yield from generate_thread(appointment, length)
+        remaining -= length
+        if thread_lengths is not None:
+            thread_lengths[length] += 1
+
+def run(args, summary):
+    """Add conversation threads between the patients and doctors of existing appointments"""
+    db = get_db()
+    appointments_collection = db.appointments
+    messages_collection = db.messages
+    appointments = load_appointments(appointments_collection, args.cursor_batch_size)
+    
+    # Check for existing messages
+    try:
+        existing_count = messages_collection.estimated_document_count()
+        if existing_count > 0:
+            if not confirm(args, f"Found about {existing_count} existing messages. Add more? (y/n): "):
+                print("Operation cancelled by user.")
+                return
+    except Exception as e:
+        print(f"Error checking existing messages: {e}")
+    
+    # Ask how many messages to create unless --count was given
+    num_messages = args.count
+    if num_messages is None:
+        num_messages = prompt_int(args, "How many messages would you like to create? (recommended: 1000-5000): ", 2000)
+    summary["count"] = num_messages
+    
+    # Generate and insert messages, tallying threads and statuses as they stream past
+    status_counts = Counter()
+    thread_lengths = Counter()
+    
+    def tally(message):
+        status_counts[message["status"]] += 1
+    
+    messages = generate_messages(num_messages, appointments, thread_lengths)
+    
+    try:
+        stats = bulk_insert(messages_collection, observe(messages, tally), **writer_options(args))
+        summary.update(stats.as_dict())
+        summary["statusCounts"] = dict(status_counts)
+        thread_count = sum(thread_lengths.values())
+        longest_thread = max(thread_lengths, default=0)
+        summary["threads"] = thread_count
+        summary["longestThread"] = longest_thread
+        report_result(stats, "messages")
+        
+        total = sum(status_counts.values())
+        if total == 0:
+            print("No messages were generated.")
+            return
+        
+        print(f"\nConversation threads: {thread_count} (average {total / thread_count:.1f} messages, "
+              f"longest {longest_thread})")
+        print("\nMessage Status Distribution:")
+        for status, count in status_counts.items():
+            print(f"  {status.capitalize()}: {count} ({count/total*100:.1f}%)")
+    
+    except Exception as e:
+        print(f"Error adding messages: {e}")
+        sys.exit(1)
+    
+    print("\nDone!")
+
+def main(argv=None):
+    """Parse command-line options and run the seeder"""
+    parser = build_parser(
+        "add_messages.py", "Add doctor-patient conversation threads linked to existing appointments.",
+        count_help="number of messages to create (prompted for if omitted, 2000 with --yes)"
+    )
+    args = parser.parse_args(argv)
+    apply_seed(args, "add_messages")
+    with json_summary(args, "add_messages") as summary:
+        run(args, summary)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+import sys
+from collections import Counter
+from datetime import timedelta
+
+import numpy as np
+
+from healthbridge_tools import IdArray, bulk_insert, get_db, keep_first, load_ids, observe, report_result
+from healthbridge_tools.cli import apply_seed, build_parser, confirm, json_summary, prompt_int, writer_options
+from healthbridge_tools.columnar import make_rng
+from healthbridge_tools.repro import anchored_now
+from healthbridge_tools.shards import run_sharded
+
+# Notification types from notification.model.ts and how often each is sent
+notification_types = [
+    "appointment_reminder",
+    "appointment_created",
+    "appointment_confirmed",
+    "appointment_updated",
+    "appointment_cancelled",
+    "message_received",
+    "lab_results",
+    "prescription",
+    "system"
+]
+type_weights = [0.25, 0.12, 0.12, 0.08, 0.05, 0.20, 0.07, 0.06, 0.05]
+
+# (title, message) pairs for each notification type
+notification_texts = {
+    "appointment_reminder": [
+        ("Appointment Reminder", "You have an appointment tomorrow. Please arrive 10 minutes early."),
+        ("Upcoming Appointment", "Your appointment is in 2 hours."),
+    ],
+    "appointment_created": [
+        ("Appointment Booked", "Your appointment request has been received."),
+        ("New Appointment", "A new appointment has been scheduled for you."),
+    ],
+    "appointment_confirmed": [
+        ("Appointment Confirmed", "Your doctor has confirmed your appointment."),
+    ],
+    "appointment_updated": [
+        ("Appointment Rescheduled", "Your appointment has been moved to a new time."),
+        ("Appointment Updated", "The details of your appointment have changed."),
+    ],
+    "appointment_cancelled": [
+        ("Appointment Cancelled", "Your appointment has been cancelled. Please book a new time."),
+    ],
+    "message_received": [
+        ("New Message", "You have received a new message."),
+        ("New Message", "Your doctor replied to your message."),
+    ],
+    "lab_results": [
+        ("Lab Results Available", "Your lab results are ready to view."),
+    ],
+    "prescription": [
+        ("Prescription Ready", "Your prescription has been sent to the pharmacy."),
+        ("Prescription Renewed", "Your prescription has been renewed."),
+    ],
+    "system": [
+        ("Scheduled Maintenance", "HealthBridge will be unavailable on Sunday from 02:00 to 04:00."),
+        ("Welcome to HealthBridge", "Complete your profile to get the most out of HealthBridge."),
+        ("Privacy Policy Update", "We have updated our privacy policy."),
+    ],
+}
+
+def load_users(users_collection, batch_size=None):
+    """Get the _id of every user as a compact IdArray"""
+    try:
+        users = load_ids(users_collection, {}, batch_size)
+        user_count = len(users)
+        if user_count == 0:
+            print("No users found in the database. Cannot create notifications.")
+            sys.exit(1)
+        else:
+            print(f"Found {user_count} users to send notifications to.")
+    except Exception as e:
+        print(f"Error finding users: {e}")
+        sys.exit(1)
+    return users
+
+def fan_out(total, user_count, skew, max_per_user, rng):
+    """Split total notifications across users, returning each user's count
+    
+    Users get Zipf-like weights 1/rank**skew in random order, so most users
+    receive a few notifications and a hot tail receives many. No user gets
+    more than max_per_user; what the cap cuts off goes to users with room.
+    """
+    if max_per_user * user_count < total:
+        raise ValueError(f"{total} notifications do not fit in {user_count} users at {max_per_user} per user")
+    weights = (rng.permutation(user_count) + 1.0) ** -skew
+    counts = rng.multinomial(total, weights / weights.sum())
+    while True:
+        excess = int(np.maximum(counts - max_per_user, 0).sum())
+        if excess == 0:
+            return counts
+        counts = np.minimum(counts, max_per_user)
+        room = np.where(counts < max_per_user, weights, 0.0)
+        counts += rng.multinomial(excess, room / room.sum())
+
+def shard_bounds(counts, shards):
+    """Split the users into shards contiguous ranges carrying about the same number of notifications"""
+    cumulative = np.cumsum(counts)
+    targets = cumulative[-1] * np.arange(1, shards) / shards
+    return [0] + np.searchsorted(cumulative, targets, side="right").tolist() + [len(counts)]
+
+def generate_notifications(users, counts, read_ratio, days, rng):
+    """Yield every user's notifications, oldest first, with the newest ones left unread
+    
+    Each user's unread count is binomial with the unread ratio, so hot users
+    also have the largest unread backlogs.
+    """
+    now = anchored_now()
+    type_probabilities = np.asarray(type_weights) / sum(type_weights)
+    for index in np.flatnonzero(counts).tolist():
+        user_id = users[index]
+        count = int(counts[index])
+        # Ages in seconds, oldest first
+        ages = np.sort(rng.uniform(0, days * 86400, count))[::-1].tolist()
+        types = rng.choice(len(notification_types), count, p=type_probabilities).tolist()
+        variants = rng.integers(0, 1 << 16, count).tolist()
+        read_delays = rng.integers(1, 48 * 60, count).tolist()
+        unread = int(rng.binomial(count, 1 - read_ratio))
+        
+        for position in range(count):
+            notification_type = notification_types[types[position]]
+            texts = notification_texts[notification_type]
+            title, message = texts[variants[position] % len(texts)]
+            created_at = now - timedelta(seconds=ages[position])
+            read = position < count - unread
+            yield {
+                "user": user_id,
+                "title": title,
+                "message": message,
+                "type": notification_type,
+                "read": read,
+                "createdAt": created_at,
+                # Read notifications were last updated when they were read, at most two days later
+                "updatedAt": min(now, created_at + timedelta(minutes=read_delays[position])) if read else created_at
+            }
+
+class NotificationTally:
+    """Counts of the notifications streamed past, by type and read flag"""
+    
+    def __init__(self):
+        self.types = Counter()
+        self.read = 0
+    
+    def __call__(self, notification):
+        self.types[notification["type"]] += 1
+        self.read += notification["read"]
+
+def insert_shard(shard):
+    """Generate and insert one --workers shard of notifications (runs in a worker process)"""
+    rng = shard.seed_random()
+    low, high = shard.options["bounds"][shard.index], shard.options["bounds"][shard.index + 1]
+    users = IdArray(shard.options["users"].raw[low:high])
+    notifications = generate_notifications(users, shard.options["counts"][low:high], shard.options["read_ratio"],
+                                           shard.options["days"], rng)
+    added = []
+    tally = NotificationTally()
+    notifications = keep_first(observe(notifications, tally), added, shard.sample)
+    stats = bulk_insert(get_db().notifications, notifications, **shard.writer_options())
+    return shard.result(stats, added, typeCounts=dict(tally.types), readCount=tally.read)
+
+def run(args, summary):
+    """Fan notifications out to existing users"""
+    db = get_db()
+    users_collection = db.users
+    notifications_collection = db.notifications
+    users = load_users(users_collection, args.cursor_batch_size)
+    
+    # Check for existing notifications
+    try:
+        existing_count = notifications_collection.estimated_document_count()
+        if existing_count > 0:
+            if not confirm(args, f"Found about {existing_count} existing notifications. Add more? (y/n): "):
+                print("Operation cancelled by user.")
+                return
+    except Exception as e:
+        print(f"Error checking existing notifications: {e}")
+    
+    # Ask how many notifications to create unless --count was given
+    if args.count is None:
+        args.count = prompt_int(args, "How many notifications would you like to create? (recommended: 1000-10000): ",
+                                5000)
+    summary["count"] = args.count
+    
+    # Decide how many notifications every user gets
+    rng = make_rng(args.seed)
+    try:
+        counts = fan_out(args.count, len(users), args.skew, args.max_per_user, rng)
+    except ValueError as e:
+        print(f"Error: {e}. Raise --max-per-user or lower --count.")
+        sys.exit(1)
+    receiving = counts[counts > 0]
+    per_user = {
+        "usersNotified": int(len(receiving)),
+        "median": int(np.median(receiving)) if len(receiving) else 0,
+        "p99": int(np.percentile(receiving, 99)) if len(receiving) else 0,
+        "max": int(counts.max()),
+    }
+    summary["perUser"] = per_user
+    print(f"Notifying {per_user['usersNotified']} users: median {per_user['median']}, "
+          f"99th percentile {per_user['p99']}, max {per_user['max']} notifications per user.")
+    
+    # Generate and insert notifications, tallying types and read flags as they stream past
+    tally = NotificationTally()
+    try:
+        if args.workers > 1:
+            bounds = shard_bounds(counts, args.workers)
+            weights = [int(counts[bounds[i]:bounds[i + 1]].sum()) for i in range(args.workers)]
+            stats, added, results = run_sharded(args, insert_shard, weights=weights, users=users, counts=counts,
+                                                bounds=bounds, read_ratio=args.read_ratio, days=args.days)
+            for result in results:
+                tally.types.update(result["typeCounts"])
+                tally.read += result["readCount"]
+        else:
+            added = []
+            notifications = generate_notifications(users, counts, args.read_ratio, args.days, rng)
+            stats = bulk_insert(notifications_collection, keep_first(observe(notifications, tally), added),
+                                **writer_options(args))
+        summary.update(stats.as_dict())
+        report_result(stats, "notifications")
+        
+        if tally.types:
+            total = sum(tally.types.values())
+            summary["typeCounts"] = dict(tally.types)
+            summary["readCount"] = tally.read
+            print(f"\nRead: {tally.read} ({tally.read/total*100:.1f}%), unread: {total - tally.read}")
+            print("\nNotification Type Distribution:")
+            for notification_type, count in tally.types.most_common():
+                print(f"  {notification_type}: {count} ({count/total*100:.1f}%)")
+    
+    except Exception as e:
+        print(f"Error adding notifications: {e}")
+        sys.exit(1)
+    
+    print("\nDone!")
+
+def main(argv=None):
+    """Parse command-line options and run the seeder"""
+    parser = build_parser(
+        "add_notifications.py", "Fan notifications out to existing users with a skewed per-user distribution.",
+        count_help="total number of notifications to create (prompted for if omitted, 5000 with --yes)",
+        sharded=True
+    )
+    parser.add_argument("--skew", type=float, default=1.0,
+                        help="Zipf exponent of the per-user distribution; higher gives a hotter tail (default: 1.0)")
+    parser.add_argument("--max-per-user", type=int, default=50000,
+                        help="most notifications any one user receives (default: 50000)")
+    parser.add_argument("--read-ratio", type=float, default=0.8,
+                        help="share of notifications already read; the newest ones stay unread (default: 0.8)")
+    parser.add_argument("--days", type=int, default=90,
+                        help="spread createdAt over this many days before now (default: 90)")
+    args = parser.parse_args(argv)
+    if not 0 <= args.read_ratio <= 1:
+        parser.error("--read-ratio must be between 0 and 1")
+    apply_seed(args, "add_notifications")
+    with json_summary(args, "add_notifications") as summary:
+        summary["workers"] = args.workers
+        run(args, summary)
+
+if __name__ == "__main__":
+    main()
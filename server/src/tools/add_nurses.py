@@ -1,87 +1,17 @@
 #!/usr/bin/env python3
-import os
 import sys
-import pymongo
-from datetime import datetime, timedelta
-from bson import ObjectId
-from dotenv import load_dotenv
-import re
+from datetime import datetime
 import random
 
-# Check for .env file and create if it doesn't exist
-env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env')
-if not os.path.exists(env_path):
-    print(f"Warning: .env file not found at {env_path}")
-    mongo_uri = input("Please enter your MongoDB connection string: ")
-    with open(env_path, 'w') as f:
-        f.write(f"MONGODB_URI={mongo_uri}\n")
-    print(f"Created .env file at {env_path}")
-
-# Load environment variables from .env file
-load_dotenv(env_path)
-
-# Get MongoDB URI from environment variable
-mongo_uri = os.getenv('MONGODB_URI')
-if not mongo_uri:
-    print("Error: MONGODB_URI environment variable not found.")
-    mongo_uri = input("Please enter your MongoDB connection string: ")
-    with open(env_path, 'a') as f:
-        f.write(f"MONGODB_URI={mongo_uri}\n")
-    print(f"Updated .env file with MongoDB URI")
-
-# Extract database name from URI or use default
-db_name = "test"
-uri_db_match = re.search(r'/([^/\?]+)(\?|$)', mongo_uri)
-if uri_db_match:
-    db_name = uri_db_match.group(1)
-
-# Setup MongoDB connection
-try:
-    client = pymongo.MongoClient(mongo_uri)
-    
-    # Use database from URI or default
-    db = client[db_name]
-    users_collection = db.users
-    print(f"Connected to MongoDB database '{db_name}' successfully!")
-except Exception as e:
-    print(f"Error connecting to MongoDB: {e}")
-    sys.exit(1)
-
-# We need to find an admin user to set as createdBy
-try:
-    admin_user = users_collection.find_one({"role": "admin"})
-    if not admin_user:
-        print("No admin user found. Looking for any user...")
-        any_user = users_collection.find_one({})
-        if not any_user:
-            print("No users found in the database.")
-            create_user = input("Would you like to create a placeholder admin user? (y/n): ")
-            if create_user.lower() == 'y':
-                admin_id = ObjectId()
-                admin_user = {
-                    "_id": admin_id,
-                    "email": "admin@healthbridge.com",
-                    "password": "placeholder",  # This would be hashed in a real scenario
-                    "firstName": "Admin",
-                    "lastName": "User",
-                    "role": "admin",
-                    "createdAt": datetime.now(),
-                    "updatedAt": datetime.now()
-                }
-                users_collection.insert_one(admin_user)
-                print(f"Created placeholder admin user with ID: {admin_id}")
-            else:
-                print("Cannot proceed without a user. Exiting.")
-                sys.exit(1)
-        else:
-            admin_id = any_user["_id"]
-            print(f"Using user ID: {admin_id} as creator")
-    else:
-        admin_id = admin_user["_id"]
-        print(f"Using admin user ID: {admin_id} as creator")
-except Exception as e:
-    print(f"Error finding or creating admin user: {e}")
-    sys.exit(1)
+import numpy as np
+
+from healthbridge_tools import bulk_insert, get_db, keep_first, report_result, resolve_admin_id
+from healthbridge_tools.cli import apply_seed, build_parser, confirm, hasher_options, json_summary, writer_options
+from healthbridge_tools.passwords import PasswordHasher
+from healthbridge_tools.repro import anchored_now
+from healthbridge_tools.columnar import encode_raw, generate_columnar, make_rng, objects
+from healthbridge_tools.shards import partition_keys, run_sharded
+from healthbridge_tools.unique import UserKeys
 
 # Nurse data
 nurse_first_names = [
@@ -167,6 +97,51 @@ nursing_schools = [
     "Boston College Connell School of Nursing"
 ]
 
+# Contact details
+email_domains = ["gmail.com", "yahoo.com", "outlook.com", "hotmail.com", "icloud.com", "nurse.com", "healthcare.org"]
+email_separators = ["", ".", "_"]
+email_prefixes = ["nurse", "rn", "healthcare", "medical"]
+
+street_names = [
+    "Main St", "Park Ave", "Oak St", "Cedar Rd", "Maple Dr", "Pine St", "Elm St",
+    "Washington St", "Lake Ave", "Hill Rd", "River Rd", "Church St", "High St",
+    "Sunset Blvd", "Lincoln Ave", "Ridge Rd", "Meadow Ln", "Valley View Dr"
+]
+cities = [
+    "New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia",
+    "San Antonio", "San Diego", "Dallas", "San Jose", "Austin", "Jacksonville",
+    "Fort Worth", "Columbus", "Charlotte", "San Francisco", "Indianapolis", "Seattle"
+]
+states = [
+    "AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "FL", "GA", 
+    "HI", "ID", "IL", "IN", "IA", "KS", "KY", "LA", "ME", "MD", 
+    "MA", "MI", "MN", "MS", "MO", "MT", "NE", "NV", "NH", "NJ", 
+    "NM", "NY", "NC", "ND", "OH", "OK", "OR", "PA", "RI", "SC", 
+    "SD", "TN", "TX", "UT", "VT", "VA", "WA", "WV", "WI", "WY"
+]
+work_locations = ['Hospital', 'Clinic', 'Medical Center', 'Health Center']
+
+# Profile details
+additional_certifications = [
+    "Basic Life Support (BLS)", 
+    "Advanced Cardiac Life Support (ACLS)",
+    "Pediatric Advanced Life Support (PALS)",
+    "Trauma Nursing Core Course (TNCC)",
+    "Emergency Nursing Pediatric Course (ENPC)",
+    "Certified Emergency Nurse (CEN)",
+    "Critical Care Registered Nurse (CCRN)",
+    "Medical-Surgical Nursing Certification (MEDSURG-BC)"
+]
+bio_templates = [
+    "Dedicated {specialty} with {years} years of experience providing compassionate patient care.",
+    "Experienced {specialty} focused on delivering high-quality patient-centered care. {years} years in the healthcare field.",
+    "Compassionate {specialty} with {years} years of clinical experience in diverse healthcare settings.",
+    "Detail-oriented {specialty} with {years} years of experience and a passion for patient advocacy."
+]
+week_days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+shifts = ["Morning (7AM-3PM)", "Evening (3PM-11PM)", "Night (11PM-7AM)", "Rotating"]
+additional_languages = ["Spanish", "French", "Chinese", "Tagalog", "Vietnamese", "Korean", "Russian", "Arabic"]
+
 # Generate certification based on specialty
 def generate_certification(specialty):
     """Generate appropriate certification based on nursing specialty"""
@@ -199,26 +174,17 @@ def generate_certification(specialty):
 
 def generate_license_number():
     """Generate a random nursing license number"""
-    state_codes = ["AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "FL", "GA", 
-                   "HI", "ID", "IL", "IN", "IA", "KS", "KY", "LA", "ME", "MD", 
-                   "MA", "MI", "MN", "MS", "MO", "MT", "NE", "NV", "NH", "NJ", 
-                   "NM", "NY", "NC", "ND", "OH", "OK", "OR", "PA", "RI", "SC", 
-                   "SD", "TN", "TX", "UT", "VT", "VA", "WA", "WV", "WI", "WY"]
-    
-    state = random.choice(state_codes)
+    state = random.choice(states)
     return f"RN{state}{random.randint(100000, 999999)}"
 
-def generate_email(first_name, last_name):
-    """Generate a random email from first and last name"""
-    domains = ["gmail.com", "yahoo.com", "outlook.com", "hotmail.com", "icloud.com", "nurse.com", "healthcare.org"]
-    separators = ["", ".", "_"]
-    sep = random.choice(separators)
-    domain = random.choice(domains)
+def generate_email(first_name, last_name, domain=None):
+    """Generate a random email from first and last name (on domain when given)"""
+    sep = random.choice(email_separators)
+    domain = domain or random.choice(email_domains)
     
     # For nurses, sometimes include title or specialty
     if random.random() < 0.3:
-        prefixes = ["nurse", "rn", "healthcare", "medical"]
-        prefix = random.choice(prefixes)
+        prefix = random.choice(email_prefixes)
         email = f"{prefix}{sep}{first_name.lower()}{sep}{last_name.lower()}@{domain}"
     elif random.random() < 0.5:
         # firstname.lastname@domain.com style
@@ -236,24 +202,6 @@ def generate_phone():
 def generate_address():
     """Generate a random address"""
     number = random.randint(100, 9999)
-    street_names = [
-        "Main St", "Park Ave", "Oak St", "Cedar Rd", "Maple Dr", "Pine St", "Elm St",
-        "Washington St", "Lake Ave", "Hill Rd", "River Rd", "Church St", "High St",
-        "Sunset Blvd", "Lincoln Ave", "Ridge Rd", "Meadow Ln", "Valley View Dr"
-    ]
-    cities = [
-        "New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia",
-        "San Antonio", "San Diego", "Dallas", "San Jose", "Austin", "Jacksonville",
-        "Fort Worth", "Columbus", "Charlotte", "San Francisco", "Indianapolis", "Seattle"
-    ]
-    states = [
-        "AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "FL", "GA", 
-        "HI", "ID", "IL", "IN", "IA", "KS", "KY", "LA", "ME", "MD", 
-        "MA", "MI", "MN", "MS", "MO", "MT", "NE", "NV", "NH", "NJ", 
-        "NM", "NY", "NC", "ND", "OH", "OK", "OR", "PA", "RI", "SC", 
-        "SD", "TN", "TX", "UT", "VT", "VA", "WA", "WV", "WI", "WY"
-    ]
-    
     street = random.choice(street_names)
     city = random.choice(cities)
     state = random.choice(states)
@@ -265,7 +213,7 @@ def generate_education_history():
     """Generate nursing education history"""
     degree = random.choice(nursing_education)
     school = random.choice(nursing_schools)
-    graduation_year = datetime.now().year - random.randint(1, 25)  # Graduated 1-25 years ago
+    graduation_year = anchored_now().year - random.randint(1, 25)  # Graduated 1-25 years ago
     
     education = {
         "degree": degree,
@@ -275,17 +223,7 @@ def generate_education_history():
     
     # Sometimes add additional certification
     if random.random() < 0.7:
-        certifications = [
-            "Basic Life Support (BLS)", 
-            "Advanced Cardiac Life Support (ACLS)",
-            "Pediatric Advanced Life Support (PALS)",
-            "Trauma Nursing Core Course (TNCC)",
-            "Emergency Nursing Pediatric Course (ENPC)",
-            "Certified Emergency Nurse (CEN)",
-            "Critical Care Registered Nurse (CCRN)",
-            "Medical-Surgical Nursing Certification (MEDSURG-BC)"
-        ]
-        education["additional_certifications"] = random.sample(certifications, random.randint(1, 3))
+        education["additional_certifications"] = random.sample(additional_certifications, random.randint(1, 3))
     
     return education
 
@@ -294,21 +232,12 @@ def generate_professional_profile(specialty):
     years_experience = random.randint(1, 20)
     
     # Generate bio
-    bio_templates = [
-        f"Dedicated {specialty} with {years_experience} years of experience providing compassionate patient care.",
-        f"Experienced {specialty} focused on delivering high-quality patient-centered care. {years_experience} years in the healthcare field.",
-        f"Compassionate {specialty} with {years_experience} years of clinical experience in diverse healthcare settings.",
-        f"Detail-oriented {specialty} with {years_experience} years of experience and a passion for patient advocacy."
-    ]
-    
-    bio = random.choice(bio_templates)
+    bio = random.choice(bio_templates).format(specialty=specialty, years=years_experience)
     
     # Generate availability
-    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-    work_days = random.sample(days, random.randint(3, 5))  # Nurses typically work 3-5 days
-    work_days.sort(key=lambda x: days.index(x))
+    work_days = random.sample(week_days, random.randint(3, 5))  # Nurses typically work 3-5 days
+    work_days.sort(key=lambda x: week_days.index(x))
     
-    shifts = ["Morning (7AM-3PM)", "Evening (3PM-11PM)", "Night (11PM-7AM)", "Rotating"]
     primary_shift = random.choice(shifts)
     
     availability = {
@@ -328,18 +257,23 @@ def generate_professional_profile(specialty):
     
     # Sometimes add another language
     if random.random() < 0.3:
-        additional_languages = ["Spanish", "French", "Chinese", "Tagalog", "Vietnamese", "Korean", "Russian", "Arabic"]
         additional = random.choice(additional_languages)
         profile["languages"].append(additional)
     
     return profile
 
-# Generate nurses
-nurses = []
-for i in range(7):
+def generate_nurse(admin_id, keys=None):
+    """Generate a single nurse document
+
+    keys is a shard's KeySpace when running with --workers; it restricts the
+    last name and email domain to pairs no other shard can produce.
+    """
     # Generate basic nurse information
     first_name = random.choice(nurse_first_names)
-    last_name = random.choice(nurse_last_names)
+    if keys is None:
+        last_name, domain = random.choice(nurse_last_names), None
+    else:
+        last_name, domain = keys.draw()
     
     # Determine gender based on first name list position
     is_female = True
@@ -347,7 +281,7 @@ for i in range(7):
         is_female = False
     
     # Generate random birth date (25-60 years old)
-    birth_year = datetime.now().year - random.randint(25, 60)
+    birth_year = anchored_now().year - random.randint(25, 60)
     birth_month = random.randint(1, 12)
     birth_day = random.randint(1, 28)  # Using 28 to avoid invalid dates
     birth_date = datetime(birth_year, birth_month, birth_day)
@@ -371,7 +305,7 @@ for i in range(7):
     
     # Create the nurse record
     nurse = {
-        "email": generate_email(first_name, last_name),
+        "email": generate_email(first_name, last_name, domain),
         "password": "password123",  # Would be hashed in a real scenario
         "role": "nurse",
         "firstName": first_name,
@@ -380,7 +314,7 @@ for i in range(7):
         "gender": "female" if is_female else "male",
         "phone": generate_phone(),
         "address": generate_address(),
-        "location": f"{random.choice(['Hospital', 'Clinic', 'Medical Center', 'Health Center'])}",
+        "location": f"{random.choice(work_locations)}",
         "active": True,
         "department": department,
         "specialization": specialty,
@@ -390,8 +324,8 @@ for i in range(7):
         "ratingCount": rating_count,
         "professionalProfile": profile,
         "createdBy": admin_id,
-        "createdAt": datetime.now(),
-        "updatedAt": datetime.now(),
+        "createdAt": anchored_now(),
+        "updatedAt": anchored_now(),
         # Visibility settings
         "visibilitySettings": {
             "phone": random.random() < 0.3,  # 30% chance of showing phone
@@ -404,30 +338,228 @@ for i in range(7):
             "experience": True
         }
     }
-    nurses.append(nurse)
-
-# Check for existing nurses
-try:
-    # Ask for confirmation before adding nurses
-    existing_count = users_collection.count_documents({"role": "nurse"})
-    if existing_count > 0:
-        confirm = input(f"Found {existing_count} existing nurses. Add 7 more? (y/n): ")
-        if confirm.lower() != 'y':
-            print("Operation cancelled by user.")
-            sys.exit(0)
-except Exception as e:
-    print(f"Error checking existing nurses: {e}")
-
-# Insert nurses into the database
-try:
-    result = users_collection.insert_many(nurses)
-    print(f"Successfully added {len(result.inserted_ids)} nurses to the database.")
+    return nurse
+
+def generate_nurses(count, admin_id, keys=None):
+    """Yield nurse documents one at a time"""
+    for _ in range(count):
+        yield generate_nurse(admin_id, keys)
+
+def build_nurse_chunk(columns, admin_id, keys=None):
+    """Assemble one chunk of nurse documents from column draws
+
+    Mirrors generate_nurse field by field; see healthbridge_tools.columnar.
+    Fields derived from the specialty and years of experience are looked up in
+    small precomputed tables instead of being rebuilt for every document.
+    """
+    male_names = set(nurse_first_names[16:])
+    now = anchored_now()
+
+    specialty_index = columns.index(len(nursing_specialties))
+    years_experience = columns.integers(1, 20)
+    years = np.asarray(years_experience)
+    bios = objects([
+        template.format(specialty=specialty, years=y)
+        for template in bio_templates for specialty in nursing_specialties for y in range(1, 21)
+    ])[(columns.index(len(bio_templates)) * len(nursing_specialties) + specialty_index) * 20 + years - 1]
+
+    # Rating grows with experience, plus uniform noise, kept between 3.5 and 5
+    base_rating = np.minimum(3.5 + years / 15, 4.9)
+    ratings = np.clip(base_rating + columns.rng.uniform(-0.3, 0.3, columns.size), 3.5, 5).round(1)
+
+    # A --workers shard draws last names and domains from its own key space
+    shard_last_names, shard_domains = keys.draw_column(columns) if keys else (None, None)
+    rows = zip(
+        columns.object_ids(), columns.pick(nurse_first_names),
+        columns.pick(nurse_last_names) if keys is None else shard_last_names,
+        columns.birth_dates(25, 60, now.year), objects(nursing_specialties)[specialty_index].tolist(),
+        objects([departments.get(s, "General Nursing") for s in nursing_specialties])[specialty_index].tolist(),
+        objects([generate_certification(s) for s in nursing_specialties])[specialty_index].tolist(),
+        # Professional profile
+        years_experience, bios.tolist(), columns.pick(nursing_education), columns.pick(nursing_schools),
+        columns.integers(1, 25), columns.chance(0.7), columns.samples(additional_certifications, 1, 3),
+        columns.subsets(week_days, 3, 5), columns.pick(shifts), columns.chance(0.3),
+        columns.pick(additional_languages), ratings.tolist(), columns.integers(5, 100),
+        # Email: prefix, plain and numbered styles
+        columns.pick(email_separators), columns.pick(email_domains) if keys is None else shard_domains,
+        columns.chance(0.3),
+        columns.pick(email_prefixes), columns.chance(0.5), columns.integers(1, 99),
+        # Contact details
+        columns.us_phones(), columns.integers(100, 9999), columns.pick(street_names), columns.pick(cities),
+        columns.pick(states), columns.integers(10000, 99999), columns.pick(work_locations),
+        columns.pick(states), columns.integers(100000, 999999),
+        columns.chance(0.3), columns.chance(0.4), columns.chance(0.3)
+    )
+    for (_id, first_name, last_name, birth_date, specialty, department, certification,
+         years_experience, bio, degree, school, years_since_graduation, has_certifications,
+         certifications, work_days, shift, extra_language, language, rating, rating_count,
+         sep, domain, prefixed, prefix, plain, email_number,
+         phone, street_number, street, city, state, zipcode, location, license_state, license_number,
+         show_phone, show_email, show_license) in rows:
+        education = {
+            "degree": degree,
+            "school": school,
+            "graduation_year": now.year - years_since_graduation
+        }
+        if has_certifications:
+            education["additional_certifications"] = certifications
+
+        # Same branches as generate_email; later coins are drawn for every row,
+        # which leaves the distribution unchanged
+        if prefixed:
+            email = f"{prefix}{sep}{first_name.lower()}{sep}{last_name.lower()}@{domain}"
+        elif plain:
+            email = f"{first_name.lower()}{sep}{last_name.lower()}@{domain}"
+        else:
+            email = f"{first_name.lower()}{sep}{last_name.lower()}{email_number}@{domain}"
+
+        yield {
+            "_id": _id,
+            "email": email,
+            "password": "password123",  # Would be hashed in a real scenario
+            "role": "nurse",
+            "firstName": first_name,
+            "lastName": last_name,
+            "dateOfBirth": birth_date,
+            "gender": "male" if first_name in male_names else "female",
+            "phone": phone,
+            "address": f"{street_number} {street}, {city}, {state} {zipcode}",
+            "location": location,
+            "active": True,
+            "department": department,
+            "specialization": specialty,
+            "licenseNumber": f"RN{license_state}{license_number}",
+            "certification": certification,
+            "rating": rating,
+            "ratingCount": rating_count,
+            "professionalProfile": {
+                "bio": bio,
+                "education": education,
+                "experience": f"{years_experience} years",
+                "availability": {
+                    "days": work_days,
+                    "shift": shift
+                },
+                "specialties": [specialty],
+                "languages": ["English", language] if extra_language else ["English"]
+            },
+            "createdBy": admin_id,
+            "createdAt": now,
+            "updatedAt": now,
+            # Visibility settings
+            "visibilitySettings": {
+                "phone": show_phone,
+                "email": show_email,
+                "department": True,
+                "specialization": True,
+                "licenseNumber": show_license,
+                "bio": True,
+                "education": True,
+                "experience": True
+            }
+        }
+
+def generate_nurses_columnar(count, admin_id, rng, chunk_size=None, keys=None):
+    """Yield nurse documents built from NumPy column draws"""
+    return generate_columnar(count, lambda columns: build_nurse_chunk(columns, admin_id, keys), rng, chunk_size)
+
+def insert_shard(shard):
+    """Generate and insert one --workers shard of nurses (runs in a worker process)"""
+    rng = shard.seed_random()
+    admin_id = shard.options["admin_id"]
+    if shard.options["columnar"]:
+        nurses = generate_nurses_columnar(shard.count, admin_id, rng, keys=shard.keys)
+    else:
+        nurses = generate_nurses(shard.count, admin_id, shard.keys)
+    user_keys = shard.options["user_keys"].for_shard(shard.index)
+    nurses = user_keys.assign(nurses)
+    hasher = shard.password_hasher()
+    if hasher:
+        nurses = hasher.materialize(nurses)
+    added = []
+    nurses = keep_first(nurses, added, shard.sample)
+    if shard.options["columnar"] and not shard.options["dry_run"]:
+        nurses = encode_raw(nurses)
+    stats = bulk_insert(get_db().users, nurses, **shard.writer_options())
+    return shard.result(stats, added, hasher, replacedKeys=user_keys.replaced)
+
+def run(args, summary):
+    """Add sample nurses to the database"""
+    db = get_db()
+    users_collection = db.users
+    admin_id = resolve_admin_id(db, assume_yes=args.yes, dry_run=args.dry_run)
+    
+    # Generate nurses
+    if args.columnar:
+        nurses = generate_nurses_columnar(args.count, admin_id, make_rng(args.seed))
+    else:
+        nurses = generate_nurses(args.count, admin_id)
+    # Keep emails unique against the existing users and each other
+    user_keys = UserKeys.preload(users_collection, args.count, args.cursor_batch_size)
+    nurses = user_keys.assign(nurses)
+    # Replace plain-text passwords with cached bcrypt hashes when asked to
+    hasher = PasswordHasher(**hasher_options(args)) if args.hash_passwords else None
+    if hasher:
+        nurses = hasher.materialize(nurses)
+    if args.columnar and not args.dry_run:
+        nurses = encode_raw(nurses)
+    
+    # Check for existing nurses
+    try:
+        # Ask for confirmation before adding nurses
+        existing_count = users_collection.count_documents({"role": "nurse"})
+        if existing_count > 0:
+            if not confirm(args, f"Found {existing_count} existing nurses. Add {args.count} more? (y/n): "):
+                print("Operation cancelled by user.")
+                return
+    except Exception as e:
+        print(f"Error checking existing nurses: {e}")
     
-    # Print the names of nurses that were added
-    for i, nurse in enumerate(nurses):
-        print(f"  {i+1}. {nurse['firstName']} {nurse['lastName']} - {nurse['specialization']}")
-except Exception as e:
-    print(f"Error adding nurses: {e}")
-    sys.exit(1)
-
-print("Done!") 
\ No newline at end of file
+    # Insert nurses into the database
+    try:
+        if args.workers > 1:
+            keys = partition_keys(nurse_last_names, email_domains, args.workers)
+            stats, added, results = run_sharded(args, insert_shard, keys=keys, admin_id=admin_id, columnar=args.columnar,
+                                                user_keys=user_keys, passwords=hasher_options(args) if hasher else None)
+            user_keys.replaced += sum(result["replacedKeys"] for result in results)
+            if hasher:
+                for result in results:
+                    hasher.absorb(result.get("passwords"))
+        else:
+            added = []
+            stats = bulk_insert(users_collection, keep_first(nurses, added), **writer_options(args))
+        summary.update(stats.as_dict())
+        summary["uniqueKeys"] = user_keys.as_dict()
+        if user_keys.replaced:
+            print(f"Replaced {user_keys.replaced} duplicate emails with unique sequence-numbered ones.")
+        if hasher:
+            summary["passwords"] = hasher.as_dict()
+            print(f"Hashed {hasher.hashed} distinct passwords ({hasher.cache_hits} taken from the hash cache).")
+            hasher.close()
+        report_result(stats, "nurses")
+    
+        # Print the names of the first nurses that were added
+        for i, nurse in enumerate(added):
+            print(f"  {i+1}. {nurse['firstName']} {nurse['lastName']} - {nurse['specialization']}")
+        if stats.inserted > len(added):
+            print(f"  ... and {stats.inserted - len(added)} more")
+    except Exception as e:
+        print(f"Error adding nurses: {e}")
+        sys.exit(1)
+    
+    print("Done!") 
+
+def main(argv=None):
+    """Parse command-line options and run the seeder"""
+    parser = build_parser("add_nurses.py", "Add sample nurses to the database.", default_count=7,
+                          columnar=True, sharded=True, passwords=True)
+    args = parser.parse_args(argv)
+    apply_seed(args, "add_nurses")
+    with json_summary(args, "add_nurses") as summary:
+        summary["count"] = args.count
+        summary["columnar"] = args.columnar
+        summary["workers"] = args.workers
+        run(args, summary)
+
+if __name__ == "__main__":
+    main()
@@ -1,197 +1,151 @@
 #!/usr/bin/env python3
-import os
 import sys
-import pymongo
-from datetime import datetime, timedelta
-from bson import ObjectId
-from dotenv import load_dotenv
-import re
+from collections import Counter
+from datetime import timedelta
 import random
 
-# Check for .env file and create if it doesn't exist
-env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env')
-if not os.path.exists(env_path):
-    print(f"Warning: .env file not found at {env_path}")
-    mongo_uri = input("Please enter your MongoDB connection string: ")
-    with open(env_path, 'w') as f:
-        f.write(f"MONGODB_URI={mongo_uri}\n")
-    print(f"Created .env file at {env_path}")
+from healthbridge_tools import (DocumentCache, bulk_insert, get_db, load_columns, new_object_id, observe, report_result,
+                                resolve_admin_id)
+from healthbridge_tools.checkpoints import preserve
+from healthbridge_tools.cli import apply_seed, build_parser, confirm, json_summary, prompt_int, writer_options
+from healthbridge_tools.repro import anchored_now
 
-# Load environment variables from .env file
-load_dotenv(env_path)
-
-# Get MongoDB URI from environment variable
-mongo_uri = os.getenv('MONGODB_URI')
-if not mongo_uri:
-    print("Error: MONGODB_URI environment variable not found.")
-    mongo_uri = input("Please enter your MongoDB connection string: ")
-    with open(env_path, 'a') as f:
-        f.write(f"MONGODB_URI={mongo_uri}\n")
-    print(f"Updated .env file with MongoDB URI")
-
-# Extract database name from URI or use default
-db_name = "test"
-uri_db_match = re.search(r'/([^/\?]+)(\?|$)', mongo_uri)
-if uri_db_match:
-    db_name = uri_db_match.group(1)
-
-# Setup MongoDB connection
-try:
-    client = pymongo.MongoClient(mongo_uri)
-    
-    # Use database from URI or default
-    db = client[db_name]
-    appointments_collection = db.appointments
-    patient_history_collection = db.patienthistories
-    medications_collection = db.medications
-    users_collection = db.users
-    print(f"Connected to MongoDB database '{db_name}' successfully!")
-except Exception as e:
-    print(f"Error connecting to MongoDB: {e}")
-    sys.exit(1)
+# Only these appointment fields are read, packed into compact columns
+APPOINTMENT_SCHEMA = {
+    "patient": "objectid",
+    "doctor": "objectid",
+    "date": "date",
+    "createdAt": "date",
+    "updatedAt": "date"
+}
 
-# We need to find an admin user to set as createdBy
-try:
-    admin_user = users_collection.find_one({"role": "admin"})
-    if not admin_user:
-        print("No admin user found. Looking for any user...")
-        any_user = users_collection.find_one({})
-        if not any_user:
-            print("No users found in the database.")
-            create_user = input("Would you like to create a placeholder admin user? (y/n): ")
-            if create_user.lower() == 'y':
-                admin_id = ObjectId()
-                admin_user = {
-                    "_id": admin_id,
-                    "email": "admin@healthbridge.com",
-                    "password": "placeholder",  # This would be hashed in a real scenario
-                    "firstName": "Admin",
-                    "lastName": "User",
-                    "role": "admin",
-                    "createdAt": datetime.now(),
-                    "updatedAt": datetime.now()
-                }
-                users_collection.insert_one(admin_user)
-                print(f"Created placeholder admin user with ID: {admin_id}")
+def load_completed_appointments(appointments_collection, args):
+    """Get completed appointments to use as a basis for patient records"""
+    try:
+        completed_appointments = load_columns(
+            appointments_collection, {"status": "completed"}, APPOINTMENT_SCHEMA, args.cursor_batch_size
+        )
+        completed_count = len(completed_appointments)
+        if completed_count == 0:
+            print("No completed appointments found in the database. Cannot create patient records.")
+            if confirm(args, "Would you like to use all appointments instead? (y/n): "):
+                completed_appointments = load_columns(
+                    appointments_collection, {}, APPOINTMENT_SCHEMA, args.cursor_batch_size
+                )
+                completed_count = len(completed_appointments)
+                if completed_count == 0:
+                    print("No appointments found. Cannot proceed.")
+                    sys.exit(1)
+                print(f"Using {completed_count} appointments as a basis for patient records.")
             else:
-                print("Cannot proceed without a user. Exiting.")
+                print("Cannot proceed without completed appointments. Exiting.")
                 sys.exit(1)
         else:
-            admin_id = any_user["_id"]
-            print(f"Using user ID: {admin_id} as creator")
-    else:
-        admin_id = admin_user["_id"]
-        print(f"Using admin user ID: {admin_id} as creator")
-except Exception as e:
-    print(f"Error finding or creating admin user: {e}")
-    sys.exit(1)
+            print(f"Found {completed_count} completed appointments to use as a basis for patient records "
+                  f"({completed_appointments.nbytes / 1024:.0f} KiB loaded).")
+    except Exception as e:
+        print(f"Error finding completed appointments: {e}")
+        sys.exit(1)
+    return completed_appointments
 
-# Get completed appointments to use as a basis for patient records
-try:
-    completed_appointments = list(appointments_collection.find({"status": "completed"}))
-    completed_count = len(completed_appointments)
-    if completed_count == 0:
-        print("No completed appointments found in the database. Cannot create patient records.")
-        create_dummy = input("Would you like to use all appointments instead? (y/n): ")
-        if create_dummy.lower() == 'y':
-            completed_appointments = list(appointments_collection.find({}))
-            completed_count = len(completed_appointments)
-            if completed_count == 0:
-                print("No appointments found. Cannot proceed.")
-                sys.exit(1)
-            print(f"Using {completed_count} appointments as a basis for patient records.")
-        else:
-            print("Cannot proceed without completed appointments. Exiting.")
-            sys.exit(1)
-    else:
-        print(f"Found {completed_count} completed appointments to use as a basis for patient records.")
-except Exception as e:
-    print(f"Error finding completed appointments: {e}")
-    sys.exit(1)
+def dummy_medications(admin_id):
+    """The medications created when the database has none"""
+    return [
+        {
+            "name": "Acetaminophen",
+            "description": "Pain reliever and fever reducer",
+            "warnings": ["May cause liver damage in high doses", "Avoid alcohol consumption"],
+            "sideEffects": ["Nausea", "Stomach pain", "Headache"],
+            "dosageForm": "Tablet",
+            "strength": "500mg",
+            "manufacturer": "Various",
+            "createdBy": admin_id,
+            "createdAt": anchored_now(),
+            "updatedAt": anchored_now()
+        },
+        {
+            "name": "Amoxicillin",
+            "description": "Penicillin antibiotic used to treat bacterial infections",
+            "warnings": ["May cause allergic reactions", "Take full course as prescribed"],
+            "sideEffects": ["Diarrhea", "Rash", "Nausea"],
+            "dosageForm": "Capsule",
+            "strength": "250mg, 500mg",
+            "manufacturer": "Various",
+            "createdBy": admin_id,
+            "createdAt": anchored_now(),
+            "updatedAt": anchored_now()
+        },
+        {
+            "name": "Lisinopril",
+            "description": "ACE inhibitor used to treat high blood pressure and heart failure",
+            "warnings": ["May cause dizziness", "Avoid pregnancy", "Monitor kidney function"],
+            "sideEffects": ["Dry cough", "Dizziness", "Headache"],
+            "dosageForm": "Tablet",
+            "strength": "5mg, 10mg, 20mg",
+            "manufacturer": "Various",
+            "createdBy": admin_id,
+            "createdAt": anchored_now(),
+            "updatedAt": anchored_now()
+        },
+        {
+            "name": "Metformin",
+            "description": "Oral diabetes medicine to control blood sugar levels",
+            "warnings": ["May cause lactic acidosis", "Avoid with kidney disease"],
+            "sideEffects": ["Diarrhea", "Nausea", "Stomach pain"],
+            "dosageForm": "Tablet",
+            "strength": "500mg, 850mg, 1000mg",
+            "manufacturer": "Various",
+            "createdBy": admin_id,
+            "createdAt": anchored_now(),
+            "updatedAt": anchored_now()
+        },
+        {
+            "name": "Atorvastatin",
+            "description": "Statin medication used to lower blood cholesterol",
+            "warnings": ["May cause muscle pain", "Avoid grapefruit juice"],
+            "sideEffects": ["Muscle pain", "Joint pain", "Digestive issues"],
+            "dosageForm": "Tablet",
+            "strength": "10mg, 20mg, 40mg, 80mg",
+            "manufacturer": "Various",
+            "createdBy": admin_id,
+            "createdAt": anchored_now(),
+            "updatedAt": anchored_now()
+        }
+    ]
 
-# Get all medications
-try:
-    medications = list(medications_collection.find({}))
-    medication_count = len(medications)
-    if medication_count == 0:
-        print("No medications found in the database.")
-        create_medications = input("Would you like to create some dummy medications? (y/n): ")
-        if create_medications.lower() == 'y':
-            # Create dummy medications
-            dummy_medications = [
-                {
-                    "name": "Acetaminophen",
-                    "description": "Pain reliever and fever reducer",
-                    "warnings": ["May cause liver damage in high doses", "Avoid alcohol consumption"],
-                    "sideEffects": ["Nausea", "Stomach pain", "Headache"],
-                    "dosageForm": "Tablet",
-                    "strength": "500mg",
-                    "manufacturer": "Various",
-                    "createdBy": admin_id,
-                    "createdAt": datetime.now(),
-                    "updatedAt": datetime.now()
-                },
-                {
-                    "name": "Amoxicillin",
-                    "description": "Penicillin antibiotic used to treat bacterial infections",
-                    "warnings": ["May cause allergic reactions", "Take full course as prescribed"],
-                    "sideEffects": ["Diarrhea", "Rash", "Nausea"],
-                    "dosageForm": "Capsule",
-                    "strength": "250mg, 500mg",
-                    "manufacturer": "Various",
-                    "createdBy": admin_id,
-                    "createdAt": datetime.now(),
-                    "updatedAt": datetime.now()
-                },
-                {
-                    "name": "Lisinopril",
-                    "description": "ACE inhibitor used to treat high blood pressure and heart failure",
-                    "warnings": ["May cause dizziness", "Avoid pregnancy", "Monitor kidney function"],
-                    "sideEffects": ["Dry cough", "Dizziness", "Headache"],
-                    "dosageForm": "Tablet",
-                    "strength": "5mg, 10mg, 20mg",
-                    "manufacturer": "Various",
-                    "createdBy": admin_id,
-                    "createdAt": datetime.now(),
-                    "updatedAt": datetime.now()
-                },
-                {
-                    "name": "Metformin",
-                    "description": "Oral diabetes medicine to control blood sugar levels",
-                    "warnings": ["May cause lactic acidosis", "Avoid with kidney disease"],
-                    "sideEffects": ["Diarrhea", "Nausea", "Stomach pain"],
-                    "dosageForm": "Tablet",
-                    "strength": "500mg, 850mg, 1000mg",
-                    "manufacturer": "Various",
-                    "createdBy": admin_id,
-                    "createdAt": datetime.now(),
-                    "updatedAt": datetime.now()
-                },
-                {
-                    "name": "Atorvastatin",
-                    "description": "Statin medication used to lower blood cholesterol",
-                    "warnings": ["May cause muscle pain", "Avoid grapefruit juice"],
-                    "sideEffects": ["Muscle pain", "Joint pain", "Digestive issues"],
-                    "dosageForm": "Tablet",
-                    "strength": "10mg, 20mg, 40mg, 80mg",
-                    "manufacturer": "Various",
-                    "createdBy": admin_id,
-                    "createdAt": datetime.now(),
-                    "updatedAt": datetime.now()
-                }
-            ]
-            
-            medications_collection.insert_many(dummy_medications)
-            medications = dummy_medications
-            medication_count = len(medications)
-            print(f"Created {medication_count} dummy medications.")
+def load_medications(medications_collection, admin_id, args):
+    """Get all medications, optionally creating dummy ones"""
+    dummies = dummy_medications(admin_id)
+    # Prescriptions reference these _ids. They are drawn even when the dummies are not created, so
+    # the seeded ObjectIds after them do not depend on what the collection holds: a resumed run
+    # finds the medications the interrupted run created
+    for medication in dummies:
+        medication["_id"] = new_object_id()
+    
+    def load_or_create():
+        # Sorted so seeded runs pick prescriptions from the same list order every time
+        medications = list(medications_collection.find({}).sort("_id", 1))
+        medication_count = len(medications)
+        if medication_count == 0:
+            print("No medications found in the database.")
+            if confirm(args, "Would you like to create some dummy medications? (y/n): "):
+                bulk_insert(medications_collection, dummies,
+                            **{**writer_options(args), "progress": False, "fingerprint": False})
+                medications = dummies
+                medication_count = len(medications)
+                print(f"Created {medication_count} dummy medications.")
+            else:
+                print("Will attempt to create patient records without medications.")
         else:
-            print("Will attempt to create patient records without medications.")
-    else:
-        print(f"Found {medication_count} medications in the database.")
-except Exception as e:
-    print(f"Error finding medications: {e}")
-    sys.exit(1)
+            print(f"Found {medication_count} medications in the database.")
+        return medications
+    
+    try:
+        # Saved with the checkpoint, so a resumed run gets the list the interrupted run used
+        return preserve("medications", load_or_create)
+    except Exception as e:
+        print(f"Error finding medications: {e}")
+        sys.exit(1)
 
 # Common diagnoses by specialty
 diagnoses_by_specialty = {
@@ -262,6 +216,20 @@ symptoms_by_diagnosis = {
     "default": ["Fatigue", "Pain", "Discomfort", "Mobility issues", "Reported symptoms during evaluation"]
 }
 
+def choose_diagnosis(doctor):
+    """Pick a diagnosis that fits the doctor's specialty (or department)"""
+    specialty = doctor.get("specialization", "default") if doctor else "default"
+    department = doctor.get("department", "default") if doctor else "default"
+    diagnoses = diagnoses_by_specialty.get(specialty, diagnoses_by_specialty.get(department, diagnoses_by_specialty["default"]))
+    return random.choice(diagnoses)
+
+def choose_symptoms(diagnosis):
+    """Pick 2-5 symptoms of the diagnosis"""
+    # A copy, so shuffling never reorders the shared lists
+    symptoms = list(symptoms_by_diagnosis.get(diagnosis, symptoms_by_diagnosis["default"]))
+    random.shuffle(symptoms)
+    return symptoms[:random.randint(2, min(5, len(symptoms)))]
+
 # Generate common vital signs with some variance
 def generate_vitals():
     # Generate slightly different vital signs
@@ -377,51 +345,50 @@ def generate_followup_date(visit_date):
         return None
 
 # Generate patient records
-def generate_patient_records(completed_appointments, medications, process_all=False):
-    patient_records = []
+def select_appointments(completed_appointments, num_to_process=None):
+    """Choose which appointment rows to create patient records for (all of them when num_to_process is None)"""
     appointment_count = len(completed_appointments)
     
-    # Ask how many records to create if not processing all
-    if not process_all:
-        try:
-            num_to_process = int(input(f"Found {appointment_count} appointments. How many would you like to create records for? (recommended: 10-50, max: {appointment_count}): ") or "25")
-            num_to_process = min(num_to_process, appointment_count)
-        except ValueError:
-            print(f"Invalid input. Defaulting to 25 records (or all available if less).")
-            num_to_process = min(25, appointment_count)
+    # Get random sample of appointment rows if not processing all
+    if num_to_process is not None and num_to_process < appointment_count:
+        indices = sorted(random.sample(range(appointment_count), num_to_process))
     else:
-        num_to_process = appointment_count
+        indices = range(appointment_count)
     
-    # Get random sample of appointments if not processing all
-    if not process_all and num_to_process < appointment_count:
-        appointments_to_process = random.sample(completed_appointments, num_to_process)
-    else:
-        appointments_to_process = completed_appointments
+    print(f"Generating {len(indices)} patient records...")
+    return indices
+
+def ask_num_to_process(args, appointment_count):
+    """Work out how many records to create from --count or interactive prompts"""
+    if args.count is not None:
+        return min(args.count, appointment_count)
+    if args.yes:
+        return None
     
-    print(f"Generating {len(appointments_to_process)} patient records...")
+    # Ask if the user wants to process all completed appointments
+    if appointment_count > 50:
+        if confirm(args, f"Found {appointment_count} completed appointments. Process all of them? (y/n): "):
+            return None
     
+    # Ask how many records to create if not processing all
+    num_to_process = prompt_int(
+        args,
+        f"Found {appointment_count} appointments. How many would you like to create records for? (recommended: 10-50, max: {appointment_count}): ",
+        25
+    )
+    return min(num_to_process, appointment_count)
+
+def generate_patient_records(appointments_to_process, medications, doctor_cache, admin_id):
+    """Yield one patient record document per appointment"""
     for appointment in appointments_to_process:
         try:
             # Get patient and doctor details
             patient_id = appointment["patient"]
             doctor_id = appointment["doctor"]
             
-            # Get doctor's specialty to determine diagnosis
-            doctor = users_collection.find_one({"_id": doctor_id})
-            specialty = doctor.get("specialization", "default") if doctor else "default"
-            department = doctor.get("department", "default") if doctor else "default"
-            
-            # Choose appropriate diagnoses based on specialty
-            diagnoses = diagnoses_by_specialty.get(specialty, diagnoses_by_specialty.get(department, diagnoses_by_specialty["default"]))
-            
-            # Select a random diagnosis
-            diagnosis = random.choice(diagnoses)
-            
-            # Get symptoms based on diagnosis
-            symptoms = symptoms_by_diagnosis.get(diagnosis, symptoms_by_diagnosis["default"])
-            # Shuffle and select 2-5 symptoms
-            random.shuffle(symptoms)
-            selected_symptoms = symptoms[:random.randint(2, min(5, len(symptoms)))]
+            # Choose a diagnosis suited to the doctor's specialty, and its symptoms
+            diagnosis = choose_diagnosis(doctor_cache.get(doctor_id))
+            selected_symptoms = choose_symptoms(diagnosis)
             
             # Use appointment date as visit date
             visit_date = appointment["date"]
@@ -449,73 +416,101 @@ def generate_patient_records(completed_appointments, medications, process_all=Fa
                 "vitals": vitals,
                 "prescriptions": prescriptions,
                 "createdBy": admin_id,
-                "createdAt": appointment.get("createdAt", datetime.now()),
-                "updatedAt": appointment.get("updatedAt", datetime.now())
+                "createdAt": appointment.get("createdAt", anchored_now()),
+                "updatedAt": appointment.get("updatedAt", anchored_now())
             }
             
             # Add follow-up date if it exists
             if followup_date:
                 patient_record["followUpDate"] = followup_date
                 
-            patient_records.append(patient_record)
+            yield patient_record
             
         except Exception as e:
             print(f"Error generating record for appointment: {e}")
             continue
-    
-    return patient_records
-
-# Check for existing patient history records
-try:
-    existing_count = patient_history_collection.count_documents({})
-    if existing_count > 0:
-        confirm = input(f"Found {existing_count} existing patient history records. Add more? (y/n): ")
-        if confirm.lower() != 'y':
-            print("Operation cancelled by user.")
-            sys.exit(0)
-except Exception as e:
-    print(f"Error checking existing patient records: {e}")
-
-# Ask if the user wants to process all completed appointments
-process_all = False
-if len(completed_appointments) > 50:
-    process_all_input = input(f"Found {len(completed_appointments)} completed appointments. Process all of them? (y/n): ")
-    process_all = process_all_input.lower() == 'y'
-
-# Generate and insert patient records
-patient_records = generate_patient_records(completed_appointments, medications, process_all)
 
-try:
-    if not patient_records:
-        print("No patient records were generated.")
-        sys.exit(1)
-        
-    result = patient_history_collection.insert_many(patient_records)
-    print(f"Successfully added {len(result.inserted_ids)} patient history records to the database.")
+def run(args, summary):
+    """Add patient history records based on existing appointments"""
+    db = get_db()
+    users_collection = db.users
+    appointments_collection = db.appointments
+    medications_collection = db.medications
+    patient_history_collection = db.patienthistories
+    admin_id = resolve_admin_id(db, assume_yes=args.yes, dry_run=args.dry_run)
+    completed_appointments = load_completed_appointments(appointments_collection, args)
+    medications = load_medications(medications_collection, admin_id, args)
     
-    # Count prescriptions
-    total_prescriptions = sum(len(record.get("prescriptions", [])) for record in patient_records)
-    avg_prescriptions = total_prescriptions / len(patient_records) if patient_records else 0
+    # Check for existing patient history records
+    try:
+        existing_count = patient_history_collection.count_documents({})
+        if existing_count > 0:
+            if not confirm(args, f"Found {existing_count} existing patient history records. Add more? (y/n): "):
+                print("Operation cancelled by user.")
+                return
+    except Exception as e:
+        print(f"Error checking existing patient records: {e}")
     
-    print(f"\nTotal prescriptions added: {total_prescriptions}")
-    print(f"Average prescriptions per record: {avg_prescriptions:.1f}")
+    # Generate and insert patient records, tallying prescriptions and diagnoses as they stream past
+    num_to_process = ask_num_to_process(args, len(completed_appointments))
+    indices = select_appointments(completed_appointments, num_to_process)
+    summary["count"] = len(indices)
+    diagnosis_counts = Counter()
+    total_prescriptions = 0
     
-    # Count by diagnosis
-    diagnosis_counts = {}
-    for record in patient_records:
-        diagnosis = record["diagnosis"]
-        if diagnosis in diagnosis_counts:
-            diagnosis_counts[diagnosis] += 1
-        else:
-            diagnosis_counts[diagnosis] = 1
+    def tally(record):
+        nonlocal total_prescriptions
+        diagnosis_counts[record["diagnosis"]] += 1
+        total_prescriptions += len(record.get("prescriptions", []))
     
-    print("\nTop diagnoses:")
-    sorted_diagnoses = sorted(diagnosis_counts.items(), key=lambda x: x[1], reverse=True)
-    for diagnosis, count in sorted_diagnoses[:5]:  # Show top 5
-        print(f"  {diagnosis}: {count} ({count/len(patient_records)*100:.1f}%)")
+    # Prefetch the referenced doctors' specialties in one projected $in query instead of one find_one per record
+    doctor_cache = DocumentCache(users_collection, {"specialization": 1, "department": 1})
+    doctor_cache.prefetch(completed_appointments.column("doctor").take(indices).unique())
+    
+    appointments_to_process = completed_appointments.rows(indices)
+    patient_records = generate_patient_records(appointments_to_process, medications, doctor_cache, admin_id)
+    
+    try:
+        stats = bulk_insert(patient_history_collection, observe(patient_records, tally), **writer_options(args))
+        summary.update(stats.as_dict())
+        summary["totalPrescriptions"] = total_prescriptions
+        summary["topDiagnoses"] = dict(diagnosis_counts.most_common(5))
+        summary["doctorLookups"] = doctor_cache.as_dict()
+        record_count = sum(diagnosis_counts.values())
+        if record_count == 0:
+            print("No patient records were generated.")
+            sys.exit(1)
+        
+        report_result(stats, "patient history records")
+        
+        # Count prescriptions
+        avg_prescriptions = total_prescriptions / record_count
+        
+        print(f"\nTotal prescriptions added: {total_prescriptions}")
+        print(f"Average prescriptions per record: {avg_prescriptions:.1f}")
+        print(f"Doctor lookups: {doctor_cache.lookups} ({doctor_cache.hit_ratio*100:.1f}% cache hits, "
+              f"{doctor_cache.round_trips} round trips, {doctor_cache.round_trips_saved} saved)")
+        
+        print("\nTop diagnoses:")
+        for diagnosis, count in diagnosis_counts.most_common(5):  # Show top 5
+            print(f"  {diagnosis}: {count} ({count/record_count*100:.1f}%)")
+        
+    except Exception as e:
+        print(f"Error adding patient records: {e}")
+        sys.exit(1)
     
-except Exception as e:
-    print(f"Error adding patient records: {e}")
-    sys.exit(1)
+    print("\nDone!") 
+
+def main(argv=None):
+    """Parse command-line options and run the seeder"""
+    parser = build_parser(
+        "add_patient_records.py", "Add patient history records based on existing appointments.",
+        count_help="number of appointments to create records for (prompted for if omitted, all with --yes)"
+    )
+    args = parser.parse_args(argv)
+    apply_seed(args, "add_patient_records")
+    with json_summary(args, "add_patient_records") as summary:
+        run(args, summary)
 
-print("\nDone!") 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,87 +1,15 @@
 #!/usr/bin/env python3
-import os
 import sys
-import pymongo
-from datetime import datetime, timedelta
-from bson import ObjectId
-from dotenv import load_dotenv
-import re
+from datetime import datetime
 import random
 
-# Check for .env file and create if it doesn't exist
-env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env')
-if not os.path.exists(env_path):
-    print(f"Warning: .env file not found at {env_path}")
-    mongo_uri = input("Please enter your MongoDB connection string: ")
-    with open(env_path, 'w') as f:
-        f.write(f"MONGODB_URI={mongo_uri}\n")
-    print(f"Created .env file at {env_path}")
-
-# Load environment variables from .env file
-load_dotenv(env_path)
-
-# Get MongoDB URI from environment variable
-mongo_uri = os.getenv('MONGODB_URI')
-if not mongo_uri:
-    print("Error: MONGODB_URI environment variable not found.")
-    mongo_uri = input("Please enter your MongoDB connection string: ")
-    with open(env_path, 'a') as f:
-        f.write(f"MONGODB_URI={mongo_uri}\n")
-    print(f"Updated .env file with MongoDB URI")
-
-# Extract database name from URI or use default
-db_name = "test"
-uri_db_match = re.search(r'/([^/\?]+)(\?|$)', mongo_uri)
-if uri_db_match:
-    db_name = uri_db_match.group(1)
-
-# Setup MongoDB connection
-try:
-    client = pymongo.MongoClient(mongo_uri)
-    
-    # Use database from URI or default
-    db = client[db_name]
-    users_collection = db.users
-    print(f"Connected to MongoDB database '{db_name}' successfully!")
-except Exception as e:
-    print(f"Error connecting to MongoDB: {e}")
-    sys.exit(1)
-
-# We need to find an admin user to set as createdBy
-try:
-    admin_user = users_collection.find_one({"role": "admin"})
-    if not admin_user:
-        print("No admin user found. Looking for any user...")
-        any_user = users_collection.find_one({})
-        if not any_user:
-            print("No users found in the database.")
-            create_user = input("Would you like to create a placeholder admin user? (y/n): ")
-            if create_user.lower() == 'y':
-                admin_id = ObjectId()
-                admin_user = {
-                    "_id": admin_id,
-                    "email": "admin@healthbridge.com",
-                    "password": "placeholder",  # This would be hashed in a real scenario
-                    "firstName": "Admin",
-                    "lastName": "User",
-                    "role": "admin",
-                    "createdAt": datetime.now(),
-                    "updatedAt": datetime.now()
-                }
-                users_collection.insert_one(admin_user)
-                print(f"Created placeholder admin user with ID: {admin_id}")
-            else:
-                print("Cannot proceed without a user. Exiting.")
-                sys.exit(1)
-        else:
-            admin_id = any_user["_id"]
-            print(f"Using user ID: {admin_id} as creator")
-    else:
-        admin_id = admin_user["_id"]
-        print(f"Using admin user ID: {admin_id} as creator")
-except Exception as e:
-    print(f"Error finding or creating admin user: {e}")
-    sys.exit(1)
+from healthbridge_tools import bulk_insert, get_db, keep_first, report_result, resolve_admin_id
+from healthbridge_tools.cli import apply_seed, build_parser, confirm, hasher_options, json_summary, writer_options
+from healthbridge_tools.passwords import PasswordHasher
+from healthbridge_tools.repro import anchored_now
+from healthbridge_tools.columnar import encode_raw, generate_columnar, make_rng
+from healthbridge_tools.shards import partition_keys, run_sharded
+from healthbridge_tools.unique import UserKeys
 
 # Define sample data for generating realistic patient information
 first_names = [
@@ -122,6 +50,12 @@ street_names = [
 
 relations = ["Spouse", "Parent", "Child", "Sibling", "Friend"]
 
+email_domains = ["gmail.com", "yahoo.com", "outlook.com", "hotmail.com", "aol.com", "icloud.com"]
+email_separators = ["", ".", "_"]
+
+# Medical record numbers are MRN followed by a number in this range
+mrn_range = (100000, 999999)
+
 # Define blood types, gender options and common allergies for realism
 blood_types = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
 gender_options = ['male', 'female', 'other', 'prefer not to say']
@@ -135,12 +69,10 @@ def generate_phone():
     """Generate a random US-formatted phone number"""
     return f"({random.randint(100, 999)}) {random.randint(100, 999)}-{random.randint(1000, 9999)}"
 
-def generate_email(first_name, last_name):
-    """Generate a random email from first and last name"""
-    domains = ["gmail.com", "yahoo.com", "outlook.com", "hotmail.com", "aol.com", "icloud.com"]
-    separators = ["", ".", "_"]
-    sep = random.choice(separators)
-    domain = random.choice(domains)
+def generate_email(first_name, last_name, domain=None):
+    """Generate a random email from first and last name (on domain when given)"""
+    sep = random.choice(email_separators)
+    domain = domain or random.choice(email_domains)
     
     if random.random() < 0.5:
         # firstname.lastname@domain.com style
@@ -163,15 +95,21 @@ def generate_address():
     zipcode = random.randint(10000, 99999)
     return f"{number} {street}, {city}, {state} {zipcode}"
 
-# Generate patients
-patients = []
-for i in range(15):
+def generate_patient(admin_id, keys=None):
+    """Generate a single patient document
+
+    keys is a shard's KeySpace when running with --workers; it restricts the
+    last name, email domain and MRN to values no other shard can produce.
+    """
     # Generate basic patient information
     first_name = random.choice(first_names)
-    last_name = random.choice(last_names)
+    if keys is None:
+        last_name, domain, mrn_low, mrn_high = random.choice(last_names), None, *mrn_range
+    else:
+        (last_name, domain), (mrn_low, mrn_high) = keys.draw(), keys.mrn_range
     
     # Generate random birth date between 18 and 85 years ago
-    birth_year = datetime.now().year - random.randint(18, 85)
+    birth_year = anchored_now().year - random.randint(18, 85)
     birth_month = random.randint(1, 12)
     birth_day = random.randint(1, 28)  # Using 28 to avoid invalid dates
     birth_date = datetime(birth_year, birth_month, birth_day)
@@ -181,7 +119,7 @@ for i in range(15):
     patient_allergies = random.sample(allergies_options, num_allergies) if num_allergies > 0 else []
     
     # Generate a realistic medical record number
-    mrn = f"MRN{random.randint(100000, 999999)}"
+    mrn = f"MRN{random.randint(mrn_low, mrn_high)}"
     
     # Generate a realistic emergency contact
     emergency_first_name = random.choice(first_names)
@@ -191,8 +129,8 @@ for i in range(15):
     emergency_contact = f"{emergency_name} ({emergency_relation}): {generate_phone()}"
     
     # Create the patient record
-    patient = {
-        "email": generate_email(first_name, last_name),
+    return {
+        "email": generate_email(first_name, last_name, domain),
         "password": "password123",  # Would be hashed in a real scenario
         "role": "patient",
         "firstName": first_name,
@@ -208,36 +146,169 @@ for i in range(15):
         "bloodType": random.choice(blood_types),
         "allergies": patient_allergies,
         "createdBy": admin_id,
-        "createdAt": datetime.now(),
-        "updatedAt": datetime.now()
+        "createdAt": anchored_now(),
+        "updatedAt": anchored_now()
     }
-    patients.append(patient)
-
-# Check for existing patients to avoid duplicates
-try:
-    # Ask for confirmation before adding patients
-    existing_count = users_collection.count_documents({"role": "patient"})
-    if existing_count > 0:
-        confirm = input(f"Found {existing_count} existing patients. Add 15 more? (y/n): ")
-        if confirm.lower() != 'y':
-            print("Operation cancelled by user.")
-            sys.exit(0)
-except Exception as e:
-    print(f"Error checking existing patients: {e}")
-
-# Insert patients into the database
-try:
-    # Hash passwords before inserting (in a real app)
-    # In production, you would use bcrypt or similar, but for this script we'll keep it simple
+
+def generate_patients(count, admin_id, keys=None):
+    """Yield patient documents one at a time"""
+    for _ in range(count):
+        yield generate_patient(admin_id, keys)
+
+def build_patient_chunk(columns, admin_id, keys=None):
+    """Assemble one chunk of patient documents from column draws
+
+    Mirrors generate_patient field by field; see healthbridge_tools.columnar.
+    """
+    now = anchored_now()
+    # A --workers shard draws last names and domains from its own key space
+    shard_last_names, shard_domains = keys.draw_column(columns) if keys else (None, None)
+    rows = zip(
+        columns.object_ids(), columns.pick(first_names),
+        columns.pick(last_names) if keys is None else shard_last_names, columns.pick(email_separators),
+        columns.pick(email_domains) if keys is None else shard_domains,
+        columns.chance(0.5), columns.chance(0.7), columns.integers(1, 99),
+        columns.birth_dates(18, 85, now.year), columns.pick(gender_options), columns.us_phones(),
+        columns.integers(100, 9999), columns.pick(street_names), columns.pick(cities), columns.pick(states),
+        columns.integers(10000, 99999), columns.pick(cities), columns.pick(states),
+        columns.integers(*(keys.mrn_range if keys else mrn_range)), columns.pick(first_names), columns.pick(last_names),
+        columns.pick(relations), columns.us_phones(), columns.pick(blood_types),
+        columns.samples(allergies_options, 0, 3)
+    )
+    for (_id, first_name, last_name, sep, domain, plain, numbered, email_number, birth_date, gender, phone,
+         street_number, street, city, state, zipcode, location_city, location_state, mrn,
+         emergency_first_name, emergency_last_name, relation, emergency_phone, blood_type, allergies) in rows:
+        # Same branches as generate_email; the second coin is drawn for every row,
+        # which leaves the distribution unchanged
+        if plain:
+            email = f"{first_name.lower()}{sep}{last_name.lower()}@{domain}"
+        elif numbered:
+            email = f"{first_name.lower()}{sep}{last_name.lower()}{email_number}@{domain}"
+        else:
+            email = f"{first_name.lower()[0]}{sep}{last_name.lower()}@{domain}"
+        yield {
+            "_id": _id,
+            "email": email,
+            "password": "password123",  # Would be hashed in a real scenario
+            "role": "patient",
+            "firstName": first_name,
+            "lastName": last_name,
+            "dateOfBirth": birth_date,
+            "gender": gender,
+            "phone": phone,
+            "address": f"{street_number} {street}, {city}, {state} {zipcode}",
+            "location": f"{location_city}, {location_state}",
+            "active": True,
+            "medicalRecordNumber": f"MRN{mrn}",
+            "emergencyContact": f"{emergency_first_name} {emergency_last_name} ({relation}): {emergency_phone}",
+            "bloodType": blood_type,
+            "allergies": allergies,
+            "createdBy": admin_id,
+            "createdAt": now,
+            "updatedAt": now
+        }
+
+def generate_patients_columnar(count, admin_id, rng, chunk_size=None, keys=None):
+    """Yield patient documents built from NumPy column draws"""
+    return generate_columnar(count, lambda columns: build_patient_chunk(columns, admin_id, keys), rng, chunk_size)
+
+def insert_shard(shard):
+    """Generate and insert one --workers shard of patients (runs in a worker process)"""
+    rng = shard.seed_random()
+    admin_id = shard.options["admin_id"]
+    if shard.options["columnar"]:
+        patients = generate_patients_columnar(shard.count, admin_id, rng, keys=shard.keys)
+    else:
+        patients = generate_patients(shard.count, admin_id, shard.keys)
+    user_keys = shard.options["user_keys"].for_shard(shard.index)
+    patients = user_keys.assign(patients)
+    hasher = shard.password_hasher()
+    if hasher:
+        patients = hasher.materialize(patients)
+    added = []
+    patients = keep_first(patients, added, shard.sample)
+    if shard.options["columnar"] and not shard.options["dry_run"]:
+        patients = encode_raw(patients)
+    stats = bulk_insert(get_db().users, patients, **shard.writer_options())
+    return shard.result(stats, added, hasher, replacedKeys=user_keys.replaced)
+
+def run(args, summary):
+    """Add sample patients to the database"""
+    db = get_db()
+    users_collection = db.users
+    admin_id = resolve_admin_id(db, assume_yes=args.yes, dry_run=args.dry_run)
     
-    result = users_collection.insert_many(patients)
-    print(f"Successfully added {len(result.inserted_ids)} patients to the database.")
+    # Generate patients
+    if args.columnar:
+        patients = generate_patients_columnar(args.count, admin_id, make_rng(args.seed))
+    else:
+        patients = generate_patients(args.count, admin_id)
+    # Keep emails and MRNs unique against the existing users and each other
+    user_keys = UserKeys.preload(users_collection, args.count, args.cursor_batch_size, mrn_start=mrn_range[1] + 1)
+    patients = user_keys.assign(patients)
+    # Replace plain-text passwords with cached bcrypt hashes when asked to
+    hasher = PasswordHasher(**hasher_options(args)) if args.hash_passwords else None
+    if hasher:
+        patients = hasher.materialize(patients)
+    if args.columnar and not args.dry_run:
+        patients = encode_raw(patients)
+    
+    # Check for existing patients to avoid duplicates
+    try:
+        # Ask for confirmation before adding patients
+        existing_count = users_collection.count_documents({"role": "patient"})
+        if existing_count > 0:
+            if not confirm(args, f"Found {existing_count} existing patients. Add {args.count} more? (y/n): "):
+                print("Operation cancelled by user.")
+                return
+    except Exception as e:
+        print(f"Error checking existing patients: {e}")
+    
+    # Insert patients into the database
+    try:
+        if args.workers > 1:
+            keys = partition_keys(last_names, email_domains, args.workers, mrn_range=mrn_range)
+            stats, added, results = run_sharded(args, insert_shard, keys=keys, admin_id=admin_id, columnar=args.columnar,
+                                                user_keys=user_keys, passwords=hasher_options(args) if hasher else None)
+            user_keys.replaced += sum(result["replacedKeys"] for result in results)
+            if hasher:
+                for result in results:
+                    hasher.absorb(result.get("passwords"))
+        else:
+            added = []
+            stats = bulk_insert(users_collection, keep_first(patients, added), **writer_options(args))
+        summary.update(stats.as_dict())
+        summary["uniqueKeys"] = user_keys.as_dict()
+        if user_keys.replaced:
+            print(f"Replaced {user_keys.replaced} duplicate emails or MRNs with unique sequence-numbered ones.")
+        if hasher:
+            summary["passwords"] = hasher.as_dict()
+            print(f"Hashed {hasher.hashed} distinct passwords ({hasher.cache_hits} taken from the hash cache).")
+            hasher.close()
+        report_result(stats, "patients")
+        
+        # Print the names of the first patients that were added
+        for i, patient in enumerate(added):
+            print(f"  {i+1}. {patient['firstName']} {patient['lastName']} - {patient['email']}")
+        if stats.inserted > len(added):
+            print(f"  ... and {stats.inserted - len(added)} more")
+    except Exception as e:
+        print(f"Error adding patients: {e}")
+        sys.exit(1)
     
-    # Print the names of patients that were added
-    for i, patient in enumerate(patients):
-        print(f"  {i+1}. {patient['firstName']} {patient['lastName']} - {patient['email']}")
-except Exception as e:
-    print(f"Error adding patients: {e}")
-    sys.exit(1)
-
-print("Done!") 
\ No newline at end of file
+    print("Done!")
+
+def main(argv=None):
+    """Parse command-line options and run the seeder"""
+    parser = build_parser("add_patients.py", "Add sample patients to the database.", default_count=15,
+                          columnar=True, sharded=True, passwords=True)
+    args = parser.parse_args(argv)
+    apply_seed(args, "add_patients")
+    with json_summary(args, "add_patients") as summary:
+        summary["count"] = args.count
+        summary["columnar"] = args.columnar
+        summary["workers"] = args.workers
+        run(args, summary)
+
+if __name__ == "__main__":
+    main()
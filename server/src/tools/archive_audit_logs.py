@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+import sys
+from datetime import datetime, timedelta
+
+from healthbridge_tools import get_db
+from healthbridge_tools.archive import DEFAULT_SEGMENT_SIZE, FORMATS, AuditArchiver
+from healthbridge_tools.cli import build_parser, confirm, json_summary, positive_int
+from healthbridge_tools.repro import parse_now
+
+def run(args, summary):
+    """Move audit log entries older than the cutoff into archive files"""
+    db = get_db()
+    audit_logs_collection = db.auditlogs
+    cutoff = args.before or datetime.utcnow() - timedelta(days=args.older_than)
+    summary["cutoff"] = cutoff
+    summary["format"] = args.format
+    
+    archiver = AuditArchiver(audit_logs_collection, cutoff, args.output, fmt=args.format,
+                             batch_size=args.batch_size, segment_size=args.segment_size, rate=args.rate,
+                             keep=args.keep, progress=not args.json, dry_run=args.dry_run)
+    
+    # Count what would go before asking
+    matched = archiver.count()
+    summary["matched"] = matched
+    if matched == 0:
+        print(f"No audit log entries older than {cutoff:%Y-%m-%d %H:%M} (UTC).")
+        return
+    
+    action = "Archive" if args.keep else "Archive and delete"
+    prompt = (f"{action} {matched} audit log entries older than {cutoff:%Y-%m-%d %H:%M} (UTC) "
+              f"into {args.output} as {args.format}? (y/n): ")
+    if args.dry_run:
+        print(f"Would archive {matched} audit log entries (dry run).")
+        return
+    if not confirm(args, prompt):
+        print("Operation cancelled by user.")
+        return
+    
+    try:
+        stats = archiver.run()
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    summary.update(stats.as_dict())
+    
+    print(f"\nArchived {stats.archived} audit log entries into {len(stats.files)} files "
+          f"({stats.bytes_written / 2 ** 20:.1f} MiB) and deleted {stats.deleted} of them "
+          f"in {stats.elapsed:.1f}s.")
+    remaining = audit_logs_collection.estimated_document_count()
+    summary["remaining"] = remaining
+    print(f"About {remaining} audit log entries remain.")
+
+def main(argv=None):
+    """Parse command-line options and run the archiver"""
+    parser = build_parser(
+        "archive_audit_logs.py",
+        "Archive audit log entries older than a cutoff into compressed BSON or Parquet files, then delete them.",
+        default_count=False, bulk=False
+    )
+    parser.add_argument("--older-than", type=positive_int, default=90,
+                        help="archive entries created more than this many days ago (default: 90)")
+    parser.add_argument("--before", type=parse_now, default=None,
+                        help="ISO date or datetime (UTC) to use as the cutoff instead of --older-than")
+    parser.add_argument("--format", choices=FORMATS, default="bson",
+                        help="'bson' writes gzip-compressed BSON that mongorestore --gzip reads; "
+                             "'parquet' needs pyarrow (default: bson)")
+    parser.add_argument("--output", default="audit-archive",
+                        help="directory to write the archive files to (default: ./audit-archive)")
+    parser.add_argument("--batch-size", type=positive_int, default=None,
+                        help="entries read, written and deleted per _id-range batch (default: 5000)")
+    parser.add_argument("--segment-size", type=positive_int, default=DEFAULT_SEGMENT_SIZE,
+                        help=f"entries per archive file (default: {DEFAULT_SEGMENT_SIZE})")
+    parser.add_argument("--rate", type=positive_int, default=None,
+                        help="maximum entries deleted per second (default: no limit)")
+    parser.add_argument("--keep", action="store_true",
+                        help="write the archive files but leave the entries in the collection")
+    args = parser.parse_args(argv)
+    with json_summary(args, "archive_audit_logs") as summary:
+        run(args, summary)
+
+if __name__ == "__main__":
+    main()
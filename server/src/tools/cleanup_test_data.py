@@ -1,69 +1,29 @@
 #!/usr/bin/env python3
-import os
-import sys
-import pymongo
-from datetime import datetime
-from bson import ObjectId
-from dotenv import load_dotenv
-import re
+from datetime import datetime, timezone
 
-# Check for .env file and create if it doesn't exist
-env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env')
-if not os.path.exists(env_path):
-    print(f"Warning: .env file not found at {env_path}")
-    mongo_uri = input("Please enter your MongoDB connection string: ")
-    with open(env_path, 'w') as f:
-        f.write(f"MONGODB_URI={mongo_uri}\n")
-    print(f"Created .env file at {env_path}")
+from healthbridge_tools import get_db
+from healthbridge_tools.cleanup import COLLECTIONS, BatchedDeleter, delete_run, truncate
+from healthbridge_tools.cli import build_parser, confirm, json_summary, positive_int
+from healthbridge_tools.collstats import collection_stats, format_table
+from healthbridge_tools.integrity import OrphanSweeper
+from healthbridge_tools.seedruns import list_runs
 
-# Load environment variables from .env file
-load_dotenv(env_path)
+def print_collection_counts(db, exact=False):
+    """Print the document count and sizes of each collection
 
-# Get MongoDB URI from environment variable
-mongo_uri = os.getenv('MONGODB_URI')
-if not mongo_uri:
-    print("Error: MONGODB_URI environment variable not found.")
-    mongo_uri = input("Please enter your MongoDB connection string: ")
-    with open(env_path, 'a') as f:
-        f.write(f"MONGODB_URI={mongo_uri}\n")
-    print(f"Updated .env file with MongoDB URI")
-
-# Extract database name from URI or use default
-db_name = "test"
-uri_db_match = re.search(r'/([^/\?]+)(\?|$)', mongo_uri)
-if uri_db_match:
-    db_name = uri_db_match.group(1)
-
-# Setup MongoDB connection
-try:
-    client = pymongo.MongoClient(mongo_uri)
-    
-    # Use database from URI or default
-    db = client[db_name]
-    print(f"Connected to MongoDB database '{db_name}' successfully!")
-except Exception as e:
-    print(f"Error connecting to MongoDB: {e}")
-    sys.exit(1)
-
-def print_collection_counts():
-    """Print the current count of documents in each collection"""
-    collections = {
-        "Users": db.users,
-        "Medications": db.medications,
-        "Appointments": db.appointments,
-        "Patient Histories": db.patienthistories,
-        "Messages": db.messages,
-        "Notifications": db.notifications
-    }
-    
+    Counts come from collection metadata (prefixed with ~) unless exact is set.
+    """
     print("\nCurrent collection counts:")
-    print("--------------------------")
-    for name, collection in collections.items():
-        count = collection.count_documents({})
-        print(f"{name}: {count} documents")
+    print(format_table(collection_stats(db, exact=exact)))
     print()
 
-def delete_test_users():
+def batched_delete(collection, query, args):
+    """Delete the matching documents in throttled _id-range batches and return how many went"""
+    deleter = BatchedDeleter(collection, query, batch_size=args.batch_size, rate=args.rate,
+                             progress=not args.json, dry_run=args.dry_run)
+    return deleter.run(resume=args.resume).deleted
+
+def delete_test_users(db, args):
     """Delete users added by the test scripts"""
     users_collection = db.users
     
@@ -120,13 +80,14 @@ def delete_test_users():
         return
     
     # Delete the users
-    result = users_collection.delete_many(delete_filter)
-    deleted_count = result.deleted_count
+    deleted_count = batched_delete(users_collection, delete_filter, args)
     
     print(f"Deleted {deleted_count} {user_type} from the database.")
+    if deleted_count:
+        print("Appointments, records and messages of these users are kept; option 9 finds and deletes them.")
     print(f"Remaining users: {total_count - deleted_count}")
 
-def delete_medications():
+def delete_medications(db, args):
     """Delete medications added by the test scripts"""
     medications_collection = db.medications
     
@@ -144,12 +105,11 @@ def delete_medications():
         return
     
     # Delete all medications
-    result = medications_collection.delete_many({})
-    deleted_count = result.deleted_count
+    deleted_count = batched_delete(medications_collection, {}, args)
     
     print(f"Deleted {deleted_count} medications from the database.")
 
-def delete_appointments():
+def delete_appointments(db, args):
     """Delete appointments added by the test scripts"""
     appointments_collection = db.appointments
     
@@ -167,12 +127,11 @@ def delete_appointments():
         return
     
     # Delete all appointments
-    result = appointments_collection.delete_many({})
-    deleted_count = result.deleted_count
+    deleted_count = batched_delete(appointments_collection, {}, args)
     
     print(f"Deleted {deleted_count} appointments from the database.")
 
-def delete_patient_histories():
+def delete_patient_histories(db, args):
     """Delete patient history records added by the test scripts"""
     patient_history_collection = db.patienthistories
     
@@ -190,12 +149,11 @@ def delete_patient_histories():
         return
     
     # Delete all patient histories
-    result = patient_history_collection.delete_many({})
-    deleted_count = result.deleted_count
+    deleted_count = batched_delete(patient_history_collection, {}, args)
     
     print(f"Deleted {deleted_count} patient history records from the database.")
 
-def delete_related_data():
+def delete_related_data(db, args):
     """Delete data in other collections that might reference deleted users"""
     # Check if there are messages or notifications
     messages_count = db.messages.count_documents({})
@@ -211,21 +169,18 @@ def delete_related_data():
         confirm = input("Would you like to delete this related data as well? (y/n): ")
         if confirm.lower() == 'y':
             if messages_count > 0:
-                db.messages.delete_many({})
-                print(f"Deleted {messages_count} messages.")
+                deleted = batched_delete(db.messages, {}, args)
+                print(f"Deleted {deleted} messages.")
             
             if notifications_count > 0:
-                db.notifications.delete_many({})
-                print(f"Deleted {notifications_count} notifications.")
+                deleted = batched_delete(db.notifications, {}, args)
+                print(f"Deleted {deleted} notifications.")
         else:
             print("Skipping deletion of related data.")
 
-def delete_all_data():
+def delete_all_data(db, args):
     """Delete all data from all collections"""
-    collections = [
-        "users", "medications", "appointments", "patienthistories", 
-        "messages", "notifications"
-    ]
+    collections = COLLECTIONS
     
     print("\n⚠️ WARNING: This will delete ALL data from ALL collections! ⚠️")
     print("This action is irreversible and will completely empty your database.")
@@ -241,20 +196,167 @@ def delete_all_data():
         print("Deletion cancelled.")
         return
     
-    # Delete all data from all collections
+    # Empty every collection, dropping and recreating it with its model indexes
     total_deleted = 0
     for collection_name in collections:
-        collection = db[collection_name]
-        count = collection.count_documents({})
+        count = truncate(db, collection_name, args.dry_run)
         if count > 0:
-            collection.delete_many({})
             print(f"Deleted {count} documents from {collection_name}")
             total_deleted += count
     
     print(f"\nOperation complete. Deleted a total of {total_deleted} documents across all collections.")
 
-def main():
+def print_runs(db):
+    """Print the seed runs recorded in the manifest and return them"""
+    runs = list_runs(db)
+    if not runs:
+        print("No seed runs recorded.")
+        return runs
+    print("\nSeed runs (newest first):")
+    print("--------------------------")
+    for i, run in enumerate(runs, 1):
+        counts = ", ".join(f"{name}: {count}" for name, count in run.get("counts", {}).items()) or "nothing written"
+        print(f"{i}. {run['_id']} ({', '.join(run.get('tools', []))}; {run['createdAt']:%Y-%m-%d %H:%M}) - {counts}")
+    return runs
+
+def delete_seed_run(db, args, run_id=None):
+    """Delete the documents of one seed run across all collections, returning {collection: DeleteStats}"""
+    if run_id is None:
+        runs = print_runs(db)
+        if not runs:
+            return {}
+        choice = input("\nEnter the number of the run to delete (blank to cancel): ")
+        if not choice.isdigit() or not 1 <= int(choice) <= len(runs):
+            print("Deletion cancelled.")
+            return {}
+        run_id = runs[int(choice) - 1]["_id"]
+    
+    if not confirm(args, f"Delete everything seed run {run_id} wrote? This cannot be undone. (y/n): "):
+        print("Deletion cancelled.")
+        return {}
+    
+    results = delete_run(db, run_id, resume=args.resume, batch_size=args.batch_size, rate=args.rate,
+                         progress=not args.json, dry_run=args.dry_run)
+    deleted_count = sum(stats.deleted for stats in results.values())
+    print(f"Deleted {deleted_count} documents of seed run {run_id}.")
+    return results
+
+def sweep_orphans(db, args, delete=None):
+    """Report documents whose user (or appointment) references dangle, optionally deleting them
+
+    delete=None asks before deleting; True or False decides without asking.
+    Returns {collection: OrphanReport}.
+    """
+    print("\nScanning for orphaned records...")
+    sweeper = OrphanSweeper(db, progress=not args.json)
+    reports = sweeper.find()
+    total = sum(len(report.orphans) for report in reports.values())
+    print(f"Found {total} orphaned records.")
+    if total == 0:
+        return reports
+    
+    if delete is None:
+        delete = confirm(args, f"Delete all {total} orphaned records? (y/n): ")
+    if delete:
+        sweeper.delete(reports, batch_size=args.batch_size, rate=args.rate, dry_run=args.dry_run)
+        deleted_count = sum(report.deleted for report in reports.values())
+        print(f"Deleted {deleted_count} orphaned records.")
+    return reports
+
+def collection_list(value):
+    """argparse type for --collections: comma-separated names, or all"""
+    if value == "all":
+        return list(COLLECTIONS)
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+def run(args, summary):
+    """Empty the chosen collections without prompting for each one"""
+    db = get_db()
+    print_collection_counts(db, args.exact_counts)
+    
+    how = "Drop and recreate" if args.mode == "truncate" else "Delete all documents in"
+    if not confirm(args, f"{how} {', '.join(args.collections)}? This cannot be undone. (y/n): "):
+        print("Operation cancelled by user.")
+        return
+    
+    summary["mode"] = args.mode
+    summary["collections"] = {}
+    for name in args.collections:
+        if args.mode == "truncate":
+            count = truncate(db, name, args.dry_run)
+            verb = "Would remove" if args.dry_run else "Removed"
+            print(f"{verb} {count} documents from {name} (collection recreated with its indexes).")
+            summary["collections"][name] = {"deleted": count}
+        else:
+            deleter = BatchedDeleter(db[name], batch_size=args.batch_size, rate=args.rate,
+                                     progress=not args.json, dry_run=args.dry_run)
+            stats = deleter.run(resume=args.resume)
+            summary["collections"][name] = stats.as_dict()
+            if stats.interrupted:
+                break
+    
+    print("\nCollection counts after cleanup:")
+    print_collection_counts(db, args.exact_counts)
+
+def main(argv=None):
     """Main function to run the cleanup script"""
+    parser = build_parser(
+        "cleanup_test_data.py",
+        "Delete test data added by the seeding scripts (interactively unless --mode is given).",
+        default_count=False, bulk=False
+    )
+    parser.add_argument("--mode", choices=["batched", "truncate"], default=None,
+                        help="empty --collections without the menu: 'batched' deletes in throttled _id-range "
+                             "batches, 'truncate' drops and recreates each collection with its model indexes")
+    parser.add_argument("--collections", type=collection_list, default=list(COLLECTIONS),
+                        help=f"comma-separated collections for --mode (default: all = {','.join(COLLECTIONS)})")
+    parser.add_argument("--batch-size", type=positive_int, default=None,
+                        help="documents per delete batch (default: 5000)")
+    parser.add_argument("--rate", type=positive_int, default=None,
+                        help="maximum documents deleted per second in batched deletes (default: no limit)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue batched deletes from where an interrupted run stopped")
+    parser.add_argument("--run-id", default=None,
+                        help="delete only the documents this seed run wrote, in every collection")
+    parser.add_argument("--list-runs", action="store_true", help="list the recorded seed runs and exit")
+    parser.add_argument("--sweep-orphans", action="store_true",
+                        help="report documents referencing users or appointments that no longer exist")
+    parser.add_argument("--delete-orphans", action="store_true",
+                        help="like --sweep-orphans, then batch-delete the orphans")
+    parser.add_argument("--stats", action="store_true",
+                        help="print document counts, data, storage and index sizes per collection and exit "
+                             "(with --json, as a JSON document)")
+    parser.add_argument("--exact-counts", action="store_true",
+                        help="count documents exactly (a collection scan each) instead of using metadata")
+    args = parser.parse_args(argv)
+    if args.stats:
+        with json_summary(args, "cleanup_test_data") as summary:
+            stats = collection_stats(get_db(), exact=args.exact_counts)
+            summary["takenAt"] = datetime.now(timezone.utc)
+            summary["collections"] = {name: entry.as_dict() for name, entry in stats.items()}
+            print(format_table(stats))
+        return
+    if args.list_runs:
+        print_runs(get_db())
+        return
+    if args.sweep_orphans or args.delete_orphans:
+        with json_summary(args, "cleanup_test_data") as summary:
+            reports = sweep_orphans(get_db(), args, delete=args.delete_orphans)
+            summary["orphans"] = {name: report.as_dict() for name, report in reports.items()}
+        return
+    if args.run_id is not None:
+        with json_summary(args, "cleanup_test_data") as summary:
+            results = delete_seed_run(get_db(), args, args.run_id)
+            summary["seedRunId"] = args.run_id
+            summary["collections"] = {name: stats.as_dict() for name, stats in results.items()}
+        return
+    if args.mode is not None:
+        with json_summary(args, "cleanup_test_data") as summary:
+            run(args, summary)
+        return
+    
+    db = get_db()
+    
     print("\n=================================================")
     print("HealthBridge Test Data Cleanup Utility")
     print("=================================================")
@@ -262,7 +364,7 @@ def main():
     print("You can choose which data to delete.")
     
     # Print current collection counts
-    print_collection_counts()
+    print_collection_counts(db, args.exact_counts)
     
     while True:
         print("\nWhat would you like to do?")
@@ -273,33 +375,39 @@ def main():
         print("5. Delete related data (messages, notifications)")
         print("6. Delete ALL data (DANGEROUS)")
         print("7. Show current collection counts")
+        print("8. Delete one seed run")
+        print("9. Find and delete orphaned records")
         print("0. Exit")
         
-        choice = input("\nEnter your choice (0-7): ")
+        choice = input("\nEnter your choice (0-9): ")
         
         if choice == "0":
             print("Exiting cleanup utility.")
             break
         elif choice == "1":
-            delete_test_users()
+            delete_test_users(db, args)
         elif choice == "2":
-            delete_medications()
+            delete_medications(db, args)
         elif choice == "3":
-            delete_appointments()
+            delete_appointments(db, args)
         elif choice == "4":
-            delete_patient_histories()
+            delete_patient_histories(db, args)
         elif choice == "5":
-            delete_related_data()
+            delete_related_data(db, args)
         elif choice == "6":
-            delete_all_data()
+            delete_all_data(db, args)
         elif choice == "7":
-            print_collection_counts()
+            print_collection_counts(db, args.exact_counts)
+        elif choice == "8":
+            delete_seed_run(db, args)
+        elif choice == "9":
+            sweep_orphans(db, args)
         else:
             print("Invalid choice. Please try again.")
     
     # Print final collection counts
     print("\nFinal collection counts after cleanup:")
-    print_collection_counts()
+    print_collection_counts(db, args.exact_counts)
     
     print("Thank you for using the HealthBridge Test Data Cleanup Utility!")
 
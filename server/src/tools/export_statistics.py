@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from healthbridge_tools import get_db
+from healthbridge_tools.analytics import (DEFAULT_CHUNK_SIZE, PERIODS, READ_PREFERENCES, compute_statistics,
+                                          load_tables, read_tables, write_tables)
+from healthbridge_tools.cli import build_parser, json_summary, positive_int
+from healthbridge_tools.repro import parse_now
+
+def print_statistics(statistics):
+    """Print the summary counts and the top lists"""
+    summary = statistics["summary"]
+    print(f"\nUsers: {summary['totalUsers']} "
+          f"({', '.join(f'{role}: {count}' for role, count in summary['usersByRole'].items())})")
+    print(f"Appointments: {summary['totalAppointments']} "
+          f"({', '.join(f'{status}: {count}' for status, count in summary['appointmentsByStatus'].items())})")
+    print(f"Registrations in the last 7 days: {summary['recentRegistrations']}; "
+          f"appointments today: {summary['todayAppointments']}")
+    
+    print("\nBusiest departments:")
+    for entry in statistics["departmentLoad"][:10]:
+        print(f"  {entry['department']}: {entry['appointmentCount']} appointments, {entry['doctorCount']} doctors")
+    print("\nTop doctors by completed appointments:")
+    for entry in statistics["doctorPerformance"]:
+        info = entry["doctorInfo"]
+        print(f"  {info.get('firstName', '')} {info.get('lastName', '')} ({info.get('specialization', '-')}): "
+              f"{entry['completedAppointments']}")
+    print("\nCommon diagnoses:")
+    for entry in statistics["commonDiagnoses"]:
+        print(f"  {entry['_id']}: {entry['count']}")
+    print("\nCommon medications:")
+    for entry in statistics["commonMedications"]:
+        print(f"  {entry['medication']}: {entry['count']}")
+
+def run(args, summary):
+    """Load the tables, compute the statistics and write them out"""
+    now = args.now or datetime.utcnow()
+    summary["now"] = now
+    try:
+        if args.input:
+            print(f"Reading tables from {args.input}...")
+            tables = read_tables(args.input)
+        else:
+            print(f"Streaming users, appointments and patient histories ({args.read_preference})...")
+            tables, elapsed = load_tables(get_db(), args.read_preference, chunk_size=args.chunk_size,
+                                          batch_size=args.cursor_batch_size)
+            summary["loadSeconds"] = {name: round(seconds, 3) for name, seconds in elapsed.items()}
+            for name, table in tables.items():
+                print(f"  {name}: {table.num_rows} rows, {table.nbytes / 2 ** 20:.1f} MiB in {elapsed[name]:.1f}s")
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    summary["rows"] = {name: table.num_rows for name, table in tables.items()}
+    
+    started = time.monotonic()
+    statistics = compute_statistics(tables, now, args.start_date, args.end_date,
+                                    timeline_period=args.timeline_period, growth_period=args.growth_period)
+    summary["computeSeconds"] = round(time.monotonic() - started, 3)
+    summary["statistics"] = statistics
+    print_statistics(statistics)
+    print(f"\nComputed the statistics in {summary['computeSeconds']:.2f}s.")
+    
+    if args.dry_run:
+        return
+    files = [] if args.input else write_tables(tables, args.output)
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, "statistics.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(statistics, f, default=str, indent=2)
+    files.append(path)
+    summary["files"] = files
+    print(f"Wrote {', '.join(files)}.")
+
+def main(argv=None):
+    """Parse command-line options and compute the admin statistics offline"""
+    parser = build_parser(
+        "export_statistics.py",
+        "Compute the admin dashboard statistics from Arrow tables of users, appointments and patient "
+        "histories, and write the tables to Parquet.",
+        default_count=False, bulk=False
+    )
+    parser.add_argument("--output", default="statistics-export",
+                        help="directory for the Parquet tables and statistics.json (default: ./statistics-export)")
+    parser.add_argument("--input", default=None,
+                        help="compute from the Parquet tables an earlier export wrote to this directory "
+                             "instead of reading the database")
+    parser.add_argument("--start-date", type=parse_now, default=None,
+                        help="count only users and appointments created from this date, like startDate")
+    parser.add_argument("--end-date", type=parse_now, default=None,
+                        help="count only users and appointments created up to this date, like endDate")
+    parser.add_argument("--timeline-period", choices=PERIODS, default="week",
+                        help="period of the appointment timeline unless both dates are given (default: week)")
+    parser.add_argument("--growth-period", choices=PERIODS, default="year",
+                        help="period of the user growth chart; 'week' counts as 'year' (default: year)")
+    parser.add_argument("--now", type=parse_now, default=None,
+                        help="ISO date or datetime (UTC) the statistics are computed at (default: the current time)")
+    parser.add_argument("--read-preference", choices=list(READ_PREFERENCES), default="secondaryPreferred",
+                        help="where to read the collections from (default: secondaryPreferred)")
+    parser.add_argument("--chunk-size", type=positive_int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"documents per Arrow record batch (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--cursor-batch-size", type=positive_int, default=None,
+                        help="documents per cursor batch (default: HEALTHBRIDGE_CURSOR_BATCH_SIZE)")
+    args = parser.parse_args(argv)
+    with json_summary(args, "export_statistics") as summary:
+        run(args, summary)
+
+if __name__ == "__main__":
+    main()
@@ -1,98 +1,92 @@
 #!/usr/bin/env python3
-import os
-import sys
-import pymongo
-import bcrypt
-from dotenv import load_dotenv
 import re
+import sys
 
-# Check for .env file and create if it doesn't exist
-env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env')
-if not os.path.exists(env_path):
-    print(f"Warning: .env file not found at {env_path}")
-    mongo_uri = input("Please enter your MongoDB connection string: ")
-    with open(env_path, 'w') as f:
-        f.write(f"MONGODB_URI={mongo_uri}\n")
-    print(f"Created .env file at {env_path}")
-
-# Load environment variables from .env file
-load_dotenv(env_path)
+from pymongo import UpdateOne
 
-# Get MongoDB URI from environment variable
-mongo_uri = os.getenv('MONGODB_URI')
-if not mongo_uri:
-    print("Error: MONGODB_URI environment variable not found.")
-    mongo_uri = input("Please enter your MongoDB connection string: ")
-    with open(env_path, 'a') as f:
-        f.write(f"MONGODB_URI={mongo_uri}\n")
-    print(f"Updated .env file with MongoDB URI")
+from healthbridge_tools import chunked, get_db
+from healthbridge_tools.cli import build_parser, confirm, hasher_options, json_summary
+from healthbridge_tools.passwords import DEFAULT_CHUNK_SIZE, PasswordHasher
 
-# Extract database name from URI or use default
-db_name = "test"
-uri_db_match = re.search(r'/([^/\?]+)(\?|$)', mongo_uri)
-if uri_db_match:
-    db_name = uri_db_match.group(1)
+# Users whose password is a string that is not already a bcrypt hash
+PLAIN_TEXT_QUERY = {"password": {"$type": "string", "$not": re.compile(r"^\$2[aby]\$")}}
 
-# Setup MongoDB connection
-try:
-    client = pymongo.MongoClient(mongo_uri)
-    
-    # Use database from URI or default
-    db = client[db_name]
-    users_collection = db.users
-    print(f"Connected to MongoDB database '{db_name}' successfully!")
-except Exception as e:
-    print(f"Error connecting to MongoDB: {e}")
-    sys.exit(1)
+def hash_users(users_collection, hasher, query, samples):
+    """Hash every matching user's password in chunks, returning the number of users updated
 
-# Default password to use for all accounts
-DEFAULT_PASSWORD = "password123"
+    Each chunk's distinct passwords go through the hasher (cache first, then
+    the process pool) and the chunk is written back with one unordered
+    bulk_write. The update filter includes the plain-text password, so a
+    password changed in the meantime is left alone.
+    """
+    modified = 0
+    cursor = users_collection.find(query, {"password": 1, "email": 1, "role": 1})
+    for chunk in chunked(cursor, DEFAULT_CHUNK_SIZE):
+        hashes = hasher.hash_many(user["password"] for user in chunk)
+        result = users_collection.bulk_write([
+            UpdateOne({"_id": user["_id"], "password": user["password"]},
+                      {"$set": {"password": hashes[user["password"]]}})
+            for user in chunk
+        ], ordered=False)
+        modified += result.modified_count
+        samples.extend(chunk[:5 - len(samples)])
+        sys.stdout.write(f"\r  users: {modified:,} passwords hashed "
+                         f"({hasher.hashed:,} distinct hashed, {hasher.cache_hits:,} from the cache)")
+        sys.stdout.flush()
+    sys.stdout.write("\n")
+    return modified
 
-# Function to hash password using bcrypt
-def hash_password(password):
-    # Generate a salt
-    salt = bcrypt.gensalt(10)
-    # Hash the password
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed_password.decode('utf-8')
-
-# Count users with non-hashed passwords
-try:
-    # Check for users with plain-text 'password123'
-    users_to_update = users_collection.find({"password": "password123"})
-    count = users_collection.count_documents({"password": "password123"})
+def run(args, summary):
+    """Hash plain-text passwords so seeded users can log in"""
+    users_collection = get_db().users
+    
+    # Count users with non-hashed passwords
+    try:
+        # Check for users with plain-text passwords ('password123' or anything else)
+        count = users_collection.count_documents(PLAIN_TEXT_QUERY)
     
-    if count == 0:
-        print("No users found with plain-text passwords. All passwords appear to be hashed already.")
-        sys.exit(0)
+        if count == 0:
+            print("No users found with plain-text passwords. All passwords appear to be hashed already.")
+            return
     
-    print(f"Found {count} users with plain-text passwords that need to be hashed.")
+        print(f"Found {count} users with plain-text passwords that need to be hashed.")
+        summary["matched"] = count
+        if args.dry_run:
+            print("Dry run: no passwords were changed.")
+            return
     
-    # Ask for confirmation before updating
-    confirm = input(f"Do you want to update all these passwords to hashed 'password123'? (y/n): ")
-    if confirm.lower() != 'y':
-        print("Operation cancelled by user.")
-        sys.exit(0)
+        # Ask for confirmation before updating
+        if not confirm(args, "Do you want to replace all these passwords with their bcrypt hashes? (y/n): "):
+            print("Operation cancelled by user.")
+            return
     
-    # Hash the default password once
-    hashed_password = hash_password(DEFAULT_PASSWORD)
+        # Hash each distinct password once, through the hash cache and a process pool
+        samples = []
+        with PasswordHasher(**hasher_options(args)) as hasher:
+            modified = hash_users(users_collection, hasher, PLAIN_TEXT_QUERY, samples)
+            summary["passwords"] = hasher.as_dict()
     
-    # Update all users with plain-text passwords
-    result = users_collection.update_many(
-        {"password": "password123"},
-        {"$set": {"password": hashed_password}}
-    )
+        print(f"Successfully updated {modified} user passwords to hashed values.")
+        summary["modified"] = modified
     
-    print(f"Successfully updated {result.modified_count} user passwords to hashed values.")
+        # Print sample users
+        print("\nSample users that can now be used for login:")
+        for user in samples:
+            print(f"  Email: {user.get('email')} | Role: {user.get('role')} | Password: {user['password']}")
     
-    # Print sample users
-    users = list(users_collection.find({}, {"email": 1, "role": 1, "_id": 0}).limit(5))
-    print("\nSample users that can now be used for login:")
-    for user in users:
-        print(f"  Email: {user['email']} | Role: {user['role']} | Password: {DEFAULT_PASSWORD}")
+    except Exception as e:
+        print(f"Error updating passwords: {e}")
+        sys.exit(1)
     
-except Exception as e:
-    print(f"Error updating passwords: {e}")
-    sys.exit(1)
+    print("Done!") 
+
+def main(argv=None):
+    """Parse command-line options and run the password fix"""
+    parser = build_parser("fix_passwords.py", "Hash plain-text passwords so seeded users can log in.",
+                          default_count=False, bulk=False, passwords=True)
+    args = parser.parse_args(argv)
+    with json_summary(args, "fix_passwords") as summary:
+        run(args, summary)
 
-print("Done!") 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Core package shared by the HealthBridge seeding and cleanup tools
+
+The add_*.py scripts import their connection, settings and admin lookup from
+here so that several tools can run in one process on a single warm client.
+"""
+from .config import Settings, settings
+from .db import close_client, get_client, get_db, resolve_admin_id
+from .loaders import ColumnTable, IdArray, load_columns, load_ids
+from .lookup import DocumentCache
+from .repro import Fingerprint, anchored_now, new_object_id
+from .writer import BulkWriter, WriteStats, bulk_insert, bulk_insert_routed, chunked, keep_first, observe, report_result
+
+__all__ = [
+    "Settings",
+    "settings",
+    "get_client",
+    "get_db",
+    "close_client",
+    "resolve_admin_id",
+    "IdArray",
+    "ColumnTable",
+    "load_ids",
+    "load_columns",
+    "DocumentCache",
+    "Fingerprint",
+    "anchored_now",
+    "new_object_id",
+    "BulkWriter",
+    "WriteStats",
+    "bulk_insert",
+    "bulk_insert_routed",
+    "chunked",
+    "keep_first",
+    "observe",
+    "report_result",
+]
@@ -0,0 +1,24 @@
+"""Entry point for `python -m healthbridge_tools <tool> [options] [<tool> [options] ...]`"""
+import sys
+
+from .runner import TOOLS, run_tools, split_invocations
+
+
+def main(argv=None):
+    """Run the named tools in one process"""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print("Usage: python -m healthbridge_tools <tool> [options] [<tool> [options] ...]")
+        print(f"Available tools: {', '.join(TOOLS)}")
+        print("Run `python -m healthbridge_tools <tool> --help` for a tool's options.")
+        sys.exit(0 if argv else 1)
+    try:
+        invocations = split_invocations(argv)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    run_tools(invocations)
+
+
+if __name__ == "__main__":
+    main()
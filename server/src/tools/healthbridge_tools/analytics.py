@@ -0,0 +1,347 @@
+"""Offline analytics: the statistics.controller.ts responses computed from Arrow tables
+
+The admin statistics endpoints issue a countDocuments per role, per status
+and per department, and $group pipelines over whole collections, all on the
+primary. load_tables() instead streams the few fields those endpoints read
+from users, appointments and patienthistories into Arrow tables, a record
+batch per chunk of documents. It reads from a secondary when there is one,
+one collection per thread. The functions below compute the same responses
+from the tables with vectorized filters, joins and group-bys. The tables can
+be written to Parquet and read back with read_tables(), so the numbers can be
+recomputed or checked against the controller without touching the database.
+
+The responses follow the controller's, with two differences:
+
+- there is no mock data, so an empty database gives zeros and empty lists;
+- "today" and the user-growth buckets use UTC; the controller uses the
+  server's time zone for those (its $dateToString buckets are UTC as well).
+
+Needs pyarrow, which is not in requirements.txt.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from pymongo import ReadPreference
+
+from .config import settings
+
+ROLES = ["patient", "doctor", "nurse", "admin"]
+ROLE_LABELS = {"patient": "Patients", "doctor": "Doctors", "nurse": "Nurses", "admin": "Admins"}
+STATUSES = ["pending", "confirmed", "cancelled", "completed", "rescheduled"]
+PERIODS = ["week", "month", "quarter", "year"]
+TOP_LIMIT = 10
+DEFAULT_CHUNK_SIZE = 50_000
+
+# The fields each endpoint reads, by collection; "medications" is prescriptions.medication as a list
+SCHEMAS = {
+    "users": {"_id": "objectid", "role": "string", "department": "string", "firstName": "string",
+              "lastName": "string", "specialization": "string", "rating": "number", "createdAt": "date"},
+    "appointments": {"_id": "objectid", "doctor": "objectid", "status": "string", "date": "date",
+                     "createdAt": "date"},
+    "patienthistories": {"_id": "objectid", "diagnosis": "string", "prescriptions": "medications",
+                         "createdAt": "date"},
+}
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Offline analytics need pyarrow; install it with 'pip install pyarrow'") from None
+    return pyarrow
+
+
+def arrow_schema(name):
+    """The Arrow schema of the table load_tables() builds for collection name"""
+    pa = _pyarrow()
+    types = {"objectid": pa.string(), "string": pa.string(), "number": pa.float64(), "date": pa.timestamp("ms"),
+             "medications": pa.list_(pa.string())}
+    return pa.schema([(field, types[kind]) for field, kind in SCHEMAS[name].items()])
+
+
+def _value(value, kind):
+    if value is None:
+        return None
+    if kind == "objectid" or kind == "string":
+        return str(value)
+    if kind == "number":
+        return float(value) if isinstance(value, (int, float)) else None
+    if kind == "date":
+        return value if isinstance(value, datetime) else None
+    return [item.get("medication") for item in value if isinstance(item, dict)] if isinstance(value, list) else None
+
+
+def _record_batches(collection, name, chunk_size, batch_size):
+    """Yield the documents of collection as Arrow record batches of up to chunk_size rows"""
+    pa = _pyarrow()
+    schema = SCHEMAS[name]
+    projection = {("prescriptions.medication" if kind == "medications" else field): 1
+                  for field, kind in schema.items()}
+    columns = {field: [] for field in schema}
+    cursor = collection.find({}, projection, batch_size=batch_size or settings.cursor_batch_size)
+    for document in cursor:
+        for field, kind in schema.items():
+            columns[field].append(_value(document.get(field), kind))
+        if len(columns["_id"]) >= chunk_size:
+            yield pa.RecordBatch.from_pydict(columns, schema=arrow_schema(name))
+            columns = {field: [] for field in schema}
+    if columns["_id"]:
+        yield pa.RecordBatch.from_pydict(columns, schema=arrow_schema(name))
+
+
+def _load_table(db, name, read_preference, chunk_size, batch_size):
+    pa = _pyarrow()
+    started = time.monotonic()
+    collection = db[name].with_options(read_preference=READ_PREFERENCES[read_preference])
+    table = pa.Table.from_batches(list(_record_batches(collection, name, chunk_size, batch_size)),
+                                  schema=arrow_schema(name))
+    return table, time.monotonic() - started
+
+
+def load_tables(db, read_preference="secondaryPreferred", chunk_size=DEFAULT_CHUNK_SIZE, batch_size=None):
+    """Stream users, appointments and patienthistories into Arrow tables
+
+    Returns ({name: Table}, {name: seconds taken}).
+    """
+    with ThreadPoolExecutor(max_workers=len(SCHEMAS)) as executor:
+        futures = {name: executor.submit(_load_table, db, name, read_preference, chunk_size, batch_size)
+                   for name in SCHEMAS}
+    results = {name: future.result() for name, future in futures.items()}
+    return ({name: table for name, (table, _) in results.items()},
+            {name: elapsed for name, (_, elapsed) in results.items()})
+
+
+def write_tables(tables, directory):
+    """Write every table to directory/<name>.parquet and return the paths"""
+    pa = _pyarrow()
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, table in tables.items():
+        path = os.path.join(directory, f"{name}.parquet")
+        pa.parquet.write_table(table, path + ".part", compression="zstd")
+        os.replace(path + ".part", path)
+        paths.append(path)
+    return paths
+
+
+def read_tables(directory):
+    """Read the tables write_tables() wrote to directory"""
+    pa = _pyarrow()
+    tables = {}
+    for name in SCHEMAS:
+        path = os.path.join(directory, f"{name}.parquet")
+        if not os.path.exists(path):
+            raise ValueError(f"{path} is missing; export the tables first")
+        tables[name] = pa.parquet.read_table(path)
+    return tables
+
+
+def _add_months(value, months):
+    """value moved by months calendar months, rolling an overflowing day over like JavaScript's setMonth()"""
+    month = value.month - 1 + months
+    first = value.replace(year=value.year + month // 12, month=month % 12 + 1, day=1)
+    return first + timedelta(days=value.day - 1)
+
+
+def _between(table, column, start=None, end=None, inclusive_end=True):
+    """The rows of table whose column is within [start, end] (or [start, end) without inclusive_end)"""
+    pa = _pyarrow()
+    pc = pa.compute
+    mask = None
+    if start is not None:
+        mask = pc.greater_equal(table[column], pa.scalar(start, pa.timestamp("ms")))
+    if end is not None:
+        compare = pc.less_equal if inclusive_end else pc.less
+        upper = compare(table[column], pa.scalar(end, pa.timestamp("ms")))
+        mask = upper if mask is None else pc.and_(mask, upper)
+    return table if mask is None else table.filter(mask)
+
+
+def _equal(table, column, value):
+    pa = _pyarrow()
+    return table.filter(pa.compute.equal(table[column], value))
+
+
+def _value_counts(values):
+    """{value: count} for an Arrow array or chunked array, nulls under None"""
+    pa = _pyarrow()
+    counts = pa.compute.value_counts(values)
+    return dict(zip(counts.field("values").to_pylist(), counts.field("counts").to_pylist()))
+
+
+def _top(counts, limit):
+    """The limit largest (value, count) pairs, ties broken by value for a stable order"""
+    return sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))[:limit]
+
+
+def statistics_summary(users, appointments, now, start=None, end=None):
+    """GET /api/admin/statistics/summary; start and end filter on createdAt like startDate and endDate"""
+    users_created = _between(users, "createdAt", start, end)
+    appointments_created = _between(appointments, "createdAt", start, end)
+    roles = _value_counts(users_created["role"])
+    statuses = _value_counts(appointments_created["status"])
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        "totalUsers": users_created.num_rows,
+        "usersByRole": {role: roles.get(role, 0) for role in ROLES},
+        "totalAppointments": appointments_created.num_rows,
+        "appointmentsByStatus": {status: statuses.get(status, 0) for status in STATUSES},
+        "recentRegistrations": _between(users, "createdAt", now - timedelta(days=7)).num_rows,
+        "todayAppointments": _between(appointments, "date", today, today + timedelta(days=1),
+                                      inclusive_end=False).num_rows,
+    }
+
+
+def appointment_timeline(appointments, now, period="week", start=None, end=None):
+    """GET /api/admin/statistics/appointment-timeline: appointments per day, week or month of their date"""
+    pa = _pyarrow()
+    if start is not None and end is not None:
+        days = -(-(end - start) // timedelta(days=1))
+        date_format = "%Y-%m-%d" if days <= 14 else "%Y-%m-W%V" if days <= 90 else "%Y-%m"
+    else:
+        end = now
+        if period == "month":
+            start, date_format = _add_months(now, -1), "%Y-%m-%d"
+        elif period == "quarter":
+            start, date_format = _add_months(now, -3), "%Y-W%V"
+        elif period == "year":
+            start, date_format = _add_months(now, -12), "%Y-%m"
+        else:
+            start, date_format = now - timedelta(days=7), "%Y-%m-%d"
+    dates = _between(appointments, "date", start, end)["date"]
+    counts = _value_counts(pa.compute.strftime(dates, date_format)) if len(dates) else {}
+    labels = sorted(counts)
+    return {"labels": labels, "data": [counts[label] for label in labels]}
+
+
+def department_load(users, appointments):
+    """GET /api/admin/statistics/department-load: appointments and doctors per department"""
+    pa = _pyarrow()
+    pc = pa.compute
+    doctors = users.filter(pc.and_(pc.equal(users["role"], "doctor"), pc.not_equal(users["department"], "")))
+    doctors = doctors.select(["_id", "department"])
+    doctor_counts = _value_counts(doctors["department"])
+    booked = appointments.select(["doctor"]).join(doctors, keys="doctor", right_keys="_id", join_type="inner")
+    appointment_counts = _value_counts(booked["department"]) if booked.num_rows else {}
+    departments = [{"department": department, "appointmentCount": appointment_counts.get(department, 0),
+                    "doctorCount": count} for department, count in doctor_counts.items()]
+    departments.sort(key=lambda entry: -entry["appointmentCount"])
+    return departments
+
+
+def doctor_performance(users, appointments, limit=TOP_LIMIT):
+    """GET /api/admin/statistics/doctor-performance: the doctors with the most completed appointments"""
+    completed = _equal(appointments, "status", "completed").select(["doctor"])
+    counts = completed.group_by("doctor").aggregate([("doctor", "count")])
+    info = ["firstName", "lastName", "department", "specialization", "rating"]
+    # An inner join drops counts without a matching user, like $unwind after $lookup
+    joined = counts.join(users.select(["_id"] + info), keys="doctor", right_keys="_id", join_type="inner")
+    joined = joined.sort_by([("doctor_count", "descending"), ("doctor", "ascending")]).slice(0, limit)
+    return [{"_id": row["doctor"], "completedAppointments": row["doctor_count"],
+             "doctorInfo": {field: row[field] for field in info if row[field] is not None}}
+            for row in joined.to_pylist()]
+
+
+def common_diagnoses(histories, limit=TOP_LIMIT):
+    """GET /api/admin/statistics/common-diagnoses"""
+    return [{"_id": diagnosis, "count": count}
+            for diagnosis, count in _top(_value_counts(histories["diagnosis"]), limit)]
+
+
+def common_medications(histories, limit=TOP_LIMIT):
+    """GET /api/admin/statistics/common-medications: the most prescribed medication names"""
+    pa = _pyarrow()
+    medications = pa.compute.list_flatten(histories["prescriptions"])
+    counts = _value_counts(medications) if len(medications) else {}
+    return [{"medication": medication, "count": count} for medication, count in _top(counts, limit)]
+
+
+def _growth_key(value, unit):
+    if unit == "month":
+        return f"{value.year}-{value.month:02d}"
+    if unit == "week":
+        # The controller's week: days from January 4 to the Thursday of value's week, over 7, plus 1.
+        # That is one less than the ISO week in years where January 4 is not a Monday, and it is
+        # paired with the calendar year of value
+        thursday = value + timedelta(days=3 - value.weekday())
+        return f"{value.year}-W{(thursday - datetime(thursday.year, 1, 4)).days // 7 + 1}"
+    return f"{value:%Y-%m-%d}"
+
+
+def _growth_weeks(created_at):
+    """The controller's week number of each timestamp, as computed by _growth_key"""
+    pa = _pyarrow()
+    pc = pa.compute
+    shift = pc.multiply(pc.subtract(3, pc.day_of_week(created_at)), 24 * 60 * 60 * 1000)
+    thursday = pc.add(created_at, pc.cast(shift, pa.duration("ms")))
+    days = pc.cast(pc.subtract(pc.day_of_year(thursday), 4), pa.float64())
+    return pc.add(pc.cast(pc.floor(pc.divide(days, 7.0)), pa.int64()), 1)
+
+
+def user_growth(users, now, period="year"):
+    """GET /api/admin/statistics/user-growth: cumulative users per role and day, week or month
+
+    Labels are sorted as strings, as the controller sorts them (so 2025-W10
+    comes before 2025-W9).
+    """
+    pa = _pyarrow()
+    pc = pa.compute
+    if period == "quarter":
+        start, unit, step = _add_months(now, -3), "week", timedelta(days=7)
+    elif period == "month":
+        start, unit, step = _add_months(now, -1), "day", timedelta(days=1)
+    else:
+        start, unit, step = _add_months(now, -12), "month", None
+    buckets = set()
+    current = start
+    while current <= now:
+        buckets.add(_growth_key(current, unit))
+        current = _add_months(current, 1) if step is None else current + step
+
+    created = _between(users, "createdAt", start, now)
+    if unit == "week":
+        keys = pc.binary_join_element_wise(pc.cast(pc.year(created["createdAt"]), pa.string()),
+                                           pc.cast(_growth_weeks(created["createdAt"]), pa.string()), "-W")
+    else:
+        keys = pc.strftime(created["createdAt"], "%Y-%m" if unit == "month" else "%Y-%m-%d")
+    counts = {}
+    if created.num_rows:
+        grouped = pa.table({"key": keys, "role": created["role"]}).group_by(["key", "role"]).aggregate(
+            [("key", "count")])
+        counts = {(row["key"], row["role"]): row["key_count"] for row in grouped.to_pylist()}
+
+    labels = sorted(buckets)
+    datasets = []
+    for role in ROLES:
+        total, data = 0, []
+        for label in labels:
+            total += counts.get((label, role), 0)
+            data.append(total)
+        datasets.append({"label": ROLE_LABELS[role], "data": data})
+    return {"labels": labels, "datasets": datasets}
+
+
+def compute_statistics(tables, now, start=None, end=None, timeline_period="week", growth_period="year"):
+    """Every statistics endpoint's response, keyed by endpoint, from the tables load_tables() returns"""
+    users, appointments, histories = tables["users"], tables["appointments"], tables["patienthistories"]
+    return {
+        "summary": statistics_summary(users, appointments, now, start, end),
+        "appointmentTimeline": appointment_timeline(appointments, now, timeline_period, start, end),
+        "departmentLoad": department_load(users, appointments),
+        "doctorPerformance": doctor_performance(users, appointments),
+        "commonDiagnoses": common_diagnoses(histories),
+        "userGrowth": user_growth(users, now, growth_period),
+        "commonMedications": common_medications(histories),
+    }
@@ -0,0 +1,260 @@
+"""Audit log retention: archive old entries to compressed files, then delete them
+
+logAuditEvent writes one auditlogs document per action and nothing ever
+removes them, so the collection and its two indexes grow until they no longer
+fit in memory. AuditArchiver moves the entries older than a cutoff out of
+the collection:
+
+- matching documents are read in _id order, batch_size at a time, as raw BSON;
+- each batch is appended to the current archive file, either gzip-compressed
+  BSON (the format mongodump --gzip writes; mongorestore reads it back) or
+  Parquet (needs pyarrow), and a new file is started every segment_size
+  documents;
+- only when a file is complete and renamed into place are the _id ranges it
+  holds deleted, one range per batch and optionally held to rate documents
+  per second.
+
+An interrupted run leaves at most one unfinished .part file behind and
+deletes nothing that is not in a finished file; running again picks up the
+entries that are still in the collection.
+
+The server takes an audit entry's _id when it logs the event, so _id order
+is createdAt order and the cutoff also bounds the _id range that is scanned.
+"""
+import gzip
+import os
+import sys
+import time
+from datetime import timedelta
+
+from bson import ObjectId, decode, json_util
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+from .cleanup import DEFAULT_DELETE_BATCH, DeleteStats, _throttle
+
+FORMATS = ["bson", "parquet"]
+DEFAULT_SEGMENT_SIZE = 100_000
+
+# Parquet columns for auditlogs documents (auditLog.model.ts). previousValue
+# and newValue are Mixed, so they are kept as extended JSON text; fields the
+# model does not declare go to "other" the same way, so nothing is lost.
+AUDIT_LOG_COLUMNS = {
+    "_id": "objectid",
+    "action": "string",
+    "performedBy": "objectid",
+    "performedOn": "objectid",
+    "previousValue": "json",
+    "newValue": "json",
+    "details": "string",
+    "ip": "string",
+    "userAgent": "string",
+    "createdAt": "date",
+    "updatedAt": "date",
+}
+
+_RAW = CodecOptions(document_class=RawBSONDocument)
+
+
+class BsonArchiveWriter:
+    """Concatenated BSON documents in a gzip file (mongodump's .bson.gz)"""
+
+    extension = ".bson.gz"
+
+    def __init__(self, path):
+        self._file = gzip.open(path, "wb", compresslevel=6)
+
+    def write(self, documents):
+        for document in documents:
+            self._file.write(document.raw)
+
+    def close(self):
+        self._file.close()
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet archives need pyarrow; install it with 'pip install pyarrow' "
+                           "or use --format bson") from None
+    return pyarrow
+
+
+class ParquetArchiveWriter:
+    """A Parquet file with one row group per batch, in the columns of AUDIT_LOG_COLUMNS"""
+
+    extension = ".parquet"
+
+    def __init__(self, path, columns=None):
+        pa = _pyarrow()
+        self.columns = columns or AUDIT_LOG_COLUMNS
+        types = {"objectid": pa.string(), "string": pa.string(), "json": pa.string(), "date": pa.timestamp("ms")}
+        self.schema = pa.schema([(name, types[kind]) for name, kind in self.columns.items()] +
+                                [("other", pa.string())])
+        self._writer = pa.parquet.ParquetWriter(path, self.schema, compression="zstd")
+
+    def _row(self, document):
+        values = decode(document.raw)
+        row = {}
+        for name, kind in self.columns.items():
+            value = values.pop(name, None)
+            if value is not None and kind == "objectid":
+                value = str(value)
+            elif value is not None and kind == "json":
+                value = json_util.dumps(value)
+            row[name] = value
+        row["other"] = json_util.dumps(values) if values else None
+        return row
+
+    def write(self, documents):
+        pa = _pyarrow()
+        table = pa.Table.from_pylist([self._row(document) for document in documents], schema=self.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        self._writer.close()
+
+
+WRITERS = {"bson": BsonArchiveWriter, "parquet": ParquetArchiveWriter}
+
+
+class ArchiveStats:
+    """Running totals for one archiving run"""
+
+    def __init__(self, cutoff, dry_run=False):
+        self.cutoff = cutoff
+        self.dry_run = dry_run
+        self.archived = 0
+        self.deleted = 0
+        self.files = []
+        self.bytes_written = 0
+        self.interrupted = False
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    @property
+    def docs_per_sec(self):
+        return self.archived / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "cutoff": self.cutoff,
+            "archived": self.archived,
+            "deleted": self.deleted,
+            "files": self.files,
+            "bytesWritten": self.bytes_written,
+            "elapsedSeconds": round(self.elapsed, 3),
+            "docsPerSec": round(self.docs_per_sec, 1),
+            "interrupted": self.interrupted,
+            "dryRun": self.dry_run,
+        }
+
+
+class AuditArchiver:
+    """Archive the entries of collection created before cutoff (naive UTC) into output_dir, then delete them
+
+    keep=True writes the archive files but leaves the entries in place.
+    """
+
+    def __init__(self, collection, cutoff, output_dir, fmt="bson", batch_size=None,
+                 segment_size=DEFAULT_SEGMENT_SIZE, rate=None, keep=False, progress=True, dry_run=False):
+        if fmt not in WRITERS:
+            raise ValueError(f"Unknown archive format '{fmt}'. Available formats: {', '.join(FORMATS)}")
+        self.collection = collection
+        self.cutoff = cutoff
+        self.output_dir = output_dir
+        self.writer_class = WRITERS[fmt]
+        self.batch_size = batch_size or DEFAULT_DELETE_BATCH
+        self.segment_size = segment_size
+        self.rate = rate
+        self.keep = keep
+        self.progress = progress
+        self.dry_run = dry_run
+        # ObjectId timestamps are whole seconds, so bound the scan one second past the cutoff
+        self.query = {"_id": {"$lt": ObjectId.from_datetime(cutoff + timedelta(seconds=1))},
+                      "createdAt": {"$lt": cutoff}}
+
+    def _log(self, message):
+        if self.progress:
+            sys.stdout.write(message + "\n")
+            sys.stdout.flush()
+
+    def count(self):
+        """Number of entries older than the cutoff"""
+        return self.collection.count_documents(self.query)
+
+    def _batches(self):
+        """Yield the matching documents as lists of RawBSONDocuments in _id order"""
+        raw = self.collection.with_options(codec_options=_RAW)
+        last_id = None
+        while True:
+            query = self.query if last_id is None else {
+                **self.query, "_id": {**self.query["_id"], "$gt": last_id}
+            }
+            batch = list(raw.find(query).sort("_id", 1).limit(self.batch_size))
+            if not batch:
+                return
+            last_id = batch[-1]["_id"]
+            yield batch
+
+    def _segment_path(self, first):
+        created = first["createdAt"]
+        name = f"{self.collection.name}-{created:%Y%m%dT%H%M%S}-{first['_id']}{self.writer_class.extension}"
+        return os.path.join(self.output_dir, name)
+
+    def _delete(self, ranges, stats, deletes):
+        """Delete the archived (first _id, last _id) ranges, throttled to rate"""
+        for first_id, last_id in ranges:
+            result = self.collection.delete_many({**self.query, "_id": {"$gte": first_id, "$lte": last_id}})
+            stats.deleted += result.deleted_count
+            deletes.deleted += result.deleted_count
+            _throttle(deletes, self.rate)
+
+    def run(self):
+        """Archive and delete every matching entry, returning the ArchiveStats"""
+        stats = ArchiveStats(self.cutoff, self.dry_run)
+        if self.dry_run:
+            stats.archived = self.count()
+            stats.elapsed = time.monotonic() - stats.started
+            return stats
+        deletes = DeleteStats()
+        os.makedirs(self.output_dir, exist_ok=True)
+        writer = path = None
+        ranges = []
+        in_segment = 0
+        try:
+            for batch in self._batches():
+                if writer is None:
+                    path = self._segment_path(batch[0])
+                    writer = self.writer_class(path + ".part")
+                writer.write(batch)
+                ranges.append((batch[0]["_id"], batch[-1]["_id"]))
+                in_segment += len(batch)
+                stats.archived += len(batch)
+                if in_segment >= self.segment_size:
+                    self._finish(writer, path, ranges, stats, deletes)
+                    writer, ranges, in_segment = None, [], 0
+            if writer is not None:
+                self._finish(writer, path, ranges, stats, deletes)
+        except KeyboardInterrupt:
+            stats.interrupted = True
+            if writer is not None:
+                writer.close()
+                self._log(f"Interrupted; {path}.part is incomplete and its entries were not deleted. "
+                          "Run again to archive them.")
+        stats.elapsed = time.monotonic() - stats.started
+        return stats
+
+    def _finish(self, writer, path, ranges, stats, deletes):
+        """Close a finished archive file, move it into place and delete what it holds"""
+        writer.close()
+        os.replace(path + ".part", path)
+        stats.files.append(path)
+        stats.bytes_written += os.path.getsize(path)
+        if not self.keep:
+            self._delete(ranges, stats, deletes)
+        stats.elapsed = time.monotonic() - stats.started
+        self._log(f"  {os.path.basename(path)}: {stats.archived:,} archived, {stats.deleted:,} deleted so far "
+                  f"({len(ranges)} batches, {stats.docs_per_sec:,.0f} docs/sec)")
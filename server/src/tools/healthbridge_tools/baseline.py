@@ -0,0 +1,157 @@
+"""Server-side benchmark resets: pristine baseline copies swapped in with renameCollection
+
+Restoring a snapshot still sends every document over the wire. A baseline
+keeps the copy on the server instead:
+
+- capture() copies each live collection to <name>_baseline with a $out
+  aggregation. The copy is created first with the live collection's options
+  and indexes, and $out into an existing collection keeps them;
+- prepare() builds <name>_next, the collection the next reset swaps in, the
+  same way from the baseline;
+- reset() renames every <name>_next over its live collection
+  (renameCollection with dropTarget), which replaces it atomically, then
+  prepares the next copies. Once the copies are prepared, the swap itself
+  takes milliseconds whatever the collection sizes.
+
+Each collection is swapped atomically, but not the set of them: for a few
+milliseconds a client can see some collections reset and others not.
+renameCollection and $out do not work on sharded collections.
+
+The dailystats rollups are reset with the collections they count. A reset
+that leaves them out clears their watermark instead, so the next
+rollup_daily_stats run asks for a backfill rather than keep counting the
+replaced documents.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .cleanup import index_model
+from .seedruns import ROLLUP_COLLECTION, ROLLUP_WATERMARK_ID
+
+# Collections a benchmark changes, and the rollups counted from them; the rest (seedruns, auditlogs,
+# preferences) are left alone
+BASELINE_COLLECTIONS = ["users", "medications", "appointments", "patienthistories", "messages", "notifications",
+                        ROLLUP_COLLECTION]
+BASELINE_SUFFIX = "_baseline"
+NEXT_SUFFIX = "_next"
+
+
+def is_copy(name):
+    """Whether collection name is a baseline or prepared copy rather than live data"""
+    return name.endswith(BASELINE_SUFFIX) or name.endswith(NEXT_SUFFIX)
+
+
+class BaselineStats:
+    """What one capture, prepare or reset did and how long each step took"""
+
+    def __init__(self):
+        self.counts = {}
+        self.copy_elapsed = {}
+        self.swap_elapsed = 0.0
+        self.prepare_elapsed = 0.0
+        self.watermark_cleared = False
+
+    def as_dict(self):
+        return {
+            "counts": dict(self.counts),
+            "copySeconds": {name: round(elapsed, 3) for name, elapsed in self.copy_elapsed.items()},
+            "swapSeconds": round(self.swap_elapsed, 3),
+            "prepareSeconds": round(self.prepare_elapsed, 3),
+            "watermarkCleared": self.watermark_cleared,
+        }
+
+
+def _copy(db, source, target):
+    """Replace collection target with a copy of source, with source's options and indexes; return the elapsed time"""
+    started = time.monotonic()
+    db.drop_collection(target)
+    db.create_collection(target, **db[source].options())
+    indexes = [index_model(index) for index in db[source].list_indexes() if index["name"] != "_id_"]
+    if indexes:
+        db[target].create_indexes(indexes)
+    db[source].aggregate([{"$out": target}])
+    return time.monotonic() - started
+
+
+def _copy_all(db, pairs, stats):
+    """Run _copy for every (source, target) pair at once, recording the times under the target names"""
+    if not pairs:
+        return
+    with ThreadPoolExecutor(max_workers=len(pairs)) as executor:
+        futures = {target: executor.submit(_copy, db, source, target) for source, target in pairs}
+    for target, future in futures.items():
+        stats.copy_elapsed[target] = future.result()
+
+
+def missing_baselines(db, names=None):
+    """The collections of names (default: BASELINE_COLLECTIONS) that have no baseline copy"""
+    existing = set(db.list_collection_names())
+    return [name for name in names or BASELINE_COLLECTIONS if name + BASELINE_SUFFIX not in existing]
+
+
+def prepare(db, names=None, stats=None):
+    """Build the <name>_next copies the next reset swaps in"""
+    stats = stats or BaselineStats()
+    names = names or BASELINE_COLLECTIONS
+    missing = missing_baselines(db, names)
+    if missing:
+        raise ValueError(f"No baseline of {', '.join(missing)}; capture one first")
+    started = time.monotonic()
+    _copy_all(db, [(name + BASELINE_SUFFIX, name + NEXT_SUFFIX) for name in names], stats)
+    stats.prepare_elapsed += time.monotonic() - started
+    return stats
+
+
+def capture(db, names=None, prepare_next=True):
+    """Copy the live collections names (default: BASELINE_COLLECTIONS) to their baselines"""
+    stats = BaselineStats()
+    names = names or BASELINE_COLLECTIONS
+    _copy_all(db, [(name, name + BASELINE_SUFFIX) for name in names], stats)
+    for name in names:
+        stats.counts[name] = db[name + BASELINE_SUFFIX].estimated_document_count()
+    # Copies prepared from an earlier baseline are out of date
+    for name in names:
+        db.drop_collection(name + NEXT_SUFFIX)
+    if prepare_next:
+        prepare(db, names, stats)
+    return stats
+
+
+def reset(db, names=None, prepare_next=True):
+    """Swap the prepared copies in for the live collections names, then prepare the next ones
+
+    Copies that were not prepared (prepare_next=False last time) are built
+    first, which makes that reset as slow as a copy. Without the rollups in
+    names, their watermark is cleared.
+    """
+    stats = BaselineStats()
+    names = names or BASELINE_COLLECTIONS
+    existing = set(db.list_collection_names())
+    unprepared = [name for name in names if name + NEXT_SUFFIX not in existing]
+    if unprepared:
+        prepare(db, unprepared, stats)
+
+    started = time.monotonic()
+    for name in names:
+        db[name + NEXT_SUFFIX].rename(name, dropTarget=True)
+    stats.swap_elapsed = time.monotonic() - started
+    if ROLLUP_COLLECTION not in names:
+        # The rollups still count the documents that were swapped out
+        result = db[ROLLUP_COLLECTION].delete_one({"_id": ROLLUP_WATERMARK_ID})
+        stats.watermark_cleared = result.deleted_count > 0
+
+    for name in names:
+        stats.counts[name] = db[name].estimated_document_count()
+    if prepare_next:
+        prepare(db, names, stats)
+    return stats
+
+
+def drop(db, names=None):
+    """Drop the baseline and prepared copies of names; return the collections dropped"""
+    existing = set(db.list_collection_names())
+    dropped = [name + suffix for name in names or BASELINE_COLLECTIONS for suffix in (BASELINE_SUFFIX, NEXT_SUFFIX)
+               if name + suffix in existing]
+    for name in dropped:
+        db.drop_collection(name)
+    return dropped
@@ -0,0 +1,292 @@
+"""Resumable seeding: batch checkpoints, saved preloads and dead-letter files
+
+A seeded run (--seed) generates the same document stream every time, so an
+interrupted one can be picked up where it stopped instead of starting over:
+
+- every BulkWriter records which of its batches the server acknowledged in a
+  JSON state file, HEALTHBRIDGE_CACHE_DIR/checkpoints/<tool>.json, rewritten
+  (atomically) at most once a second and whenever a write ends or fails;
+- `--resume` reads the file back and restores the interrupted run's options,
+  --now, seed run id and prompt answers. The stream is generated again so the
+  random state and ObjectIds advance exactly as before, but the batches
+  marked as written are not sent. Documents of batches that were in flight
+  come back as duplicate _id errors and count as already written;
+- what a tool loads from the collection it writes to before the first write
+  (existing emails, booked slots) goes through preserve(), which saves it
+  with the checkpoint: when the run is resumed the collection also holds the
+  interrupted run's documents, and loading it again would change the stream.
+
+Documents the server rejects for good (duplicate emails, validation errors)
+are appended, with the error, to a dead-letter file of extended-JSON lines,
+HEALTHBRIDGE_CACHE_DIR/rejected/<seed run id>/<tool>.<collection>.jsonl.
+Unseeded runs cannot be resumed but get their dead-letter files all the same.
+"""
+import glob
+import json
+import os
+import pickle
+import threading
+import time
+from datetime import datetime
+
+from bson import decode, json_util
+from bson.raw_bson import RawBSONDocument
+
+from .config import settings
+from .repro import anchored_now, parse_now
+
+# Options that do not change the generated documents; a resumed run keeps the ones it is given
+VOLATILE_OPTIONS = {"resume", "yes", "json", "dry_run", "max_in_flight", "cursor_batch_size", "hash_workers",
+                    "no_hash_cache"}
+SAVE_INTERVAL = 1.0
+
+_state = {"checkpoint": None}
+
+
+class CollectionProgress:
+    """Which batches of one BulkWriter's stream the server has acknowledged
+
+    completed counts the batches acknowledged without a gap from the start;
+    beyond holds the ones acknowledged out of order past that point.
+    """
+
+    def __init__(self, batch_size, completed=0, beyond=(), inserted=0, failed=0, finished=False):
+        self.batch_size = batch_size
+        self.completed = completed
+        self.beyond = set(beyond)
+        self.inserted = inserted
+        self.failed = failed
+        self.finished = finished
+
+    def is_written(self, index):
+        return index < self.completed or index in self.beyond
+
+    def acknowledge(self, index, inserted, failed):
+        self.beyond.add(index)
+        while self.completed in self.beyond:
+            self.beyond.remove(self.completed)
+            self.completed += 1
+        self.inserted += inserted
+        self.failed += failed
+
+    def as_dict(self):
+        return {
+            "batch_size": self.batch_size,
+            "completed": self.completed,
+            "beyond": sorted(self.beyond),
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "finished": self.finished,
+        }
+
+
+class DeadLetterFile:
+    """Rejected documents and their write errors as extended-JSON lines, created on the first one"""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = None
+
+    def write(self, errors):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        for error in errors:
+            document = error.get("op")
+            if isinstance(document, RawBSONDocument):
+                document = decode(document.raw)
+            line = {"code": error.get("code"), "errmsg": error.get("errmsg"), "document": document}
+            self._file.write(json_util.dumps(line) + "\n")
+        self._file.flush()
+        self.count += len(errors)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Checkpoint:
+    """One tool's write progress (saved for seeded runs) and its dead-letter files
+
+    suffix tells the files of a --workers shard apart from the parent's.
+    """
+
+    def __init__(self, tool, run_id, directory, rejected_dir, resumable, state=None, resumed=False, suffix=""):
+        self.tool = tool
+        self.run_id = run_id
+        self.directory = directory
+        self.rejected_dir = rejected_dir
+        self.resumable = resumable
+        self.resumed = resumed
+        self.suffix = suffix
+        state = state or {}
+        self.options = state.get("options", {})
+        self.answers = state.get("answers", {})
+        self.collections = {name: CollectionProgress(**progress)
+                            for name, progress in state.get("collections", {}).items()}
+        self._claimed = {}
+        self._saved = 0.0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f"{self.tool}{self.suffix}.json")
+
+    @classmethod
+    def start(cls, tool, args, run_id):
+        """Begin tool's checkpoint for a new run
+
+        A new seeded run discards what an earlier run of tool left behind; an
+        unseeded run saves nothing, so it leaves an interrupted seeded run's
+        checkpoint in place for a later --resume.
+        """
+        directory = os.path.abspath(os.path.join(settings.cache_dir, "checkpoints"))
+        if args.seed is not None:
+            for path in glob.glob(os.path.join(directory, f"{tool}.*")):
+                os.remove(path)
+        checkpoint = cls(tool, run_id, directory, os.path.abspath(os.path.join(settings.cache_dir, "rejected", run_id)),
+                         resumable=args.seed is not None)
+        checkpoint.options = {name: value for name, value in vars(args).items() if name not in VOLATILE_OPTIONS}
+        # An unset --now was anchored to the start of the run; the resumed run must use the same time
+        checkpoint.options["now"] = anchored_now()
+        checkpoint.save(force=True)
+        return checkpoint
+
+    @classmethod
+    def load(cls, tool):
+        """The checkpoint tool's interrupted run left, for --resume"""
+        directory = os.path.abspath(os.path.join(settings.cache_dir, "checkpoints"))
+        path = os.path.join(directory, f"{tool}.json")
+        try:
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            raise ValueError(f"No checkpoint to resume at {path}; only runs started with --seed can be resumed") from None
+        return cls(tool, state["runId"], directory, state["rejectedDir"], resumable=True, state=state, resumed=True)
+
+    def restore(self, args):
+        """Put the interrupted run's options back on args"""
+        for name, value in self.options.items():
+            setattr(args, name, parse_now(value) if name == "now" and value is not None else value)
+        args.run_id = self.run_id
+
+    def for_shard(self, index):
+        """The checkpoint --workers shard index keeps in its own file (read in the worker process)"""
+        shard = Checkpoint(self.tool, self.run_id, self.directory, self.rejected_dir, self.resumable,
+                           resumed=self.resumed, suffix=f".shard{index}")
+        if self.resumed and os.path.exists(shard.path):
+            with open(shard.path, encoding="utf-8") as f:
+                state = json.load(f)
+            shard.collections = {name: CollectionProgress(**progress)
+                                 for name, progress in state["collections"].items()}
+        return shard
+
+    def collection(self, name, batch_size):
+        """The CollectionProgress of the next BulkWriter writing collection name
+
+        A tool that writes the same collection twice gets a separate entry for
+        each write, in the order they start.
+        """
+        with self._lock:
+            occurrence = self._claimed[name] = self._claimed.get(name, 0) + 1
+            key = name if occurrence == 1 else f"{name}#{occurrence}"
+            progress = self.collections.get(key)
+            if progress is None:
+                progress = self.collections[key] = CollectionProgress(batch_size)
+            elif progress.batch_size != batch_size:
+                raise ValueError(f"The interrupted run wrote {name} in batches of {progress.batch_size}, "
+                                 f"not {batch_size}; set HEALTHBRIDGE_BATCH_SIZE as it was")
+            return progress
+
+    def dead_letters(self, name):
+        """A DeadLetterFile for the documents collection name rejects"""
+        return DeadLetterFile(os.path.join(self.rejected_dir, f"{self.tool}.{name}{self.suffix}.jsonl"))
+
+    def acknowledge(self, progress, index, inserted, failed):
+        """Record that batch index of progress was written, and save now and then"""
+        with self._lock:
+            progress.acknowledge(index, inserted, failed)
+        self.save()
+
+    def save(self, force=False):
+        """Rewrite the state file, at most once every SAVE_INTERVAL seconds unless force"""
+        if not self.resumable:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._saved < SAVE_INTERVAL:
+                return
+            self._saved = now
+            state = {
+                "tool": self.tool,
+                "runId": self.run_id,
+                "rejectedDir": self.rejected_dir,
+                "updatedAt": datetime.now(),
+                "options": self.options,
+                "answers": self.answers,
+                "collections": {name: progress.as_dict() for name, progress in self.collections.items()},
+            }
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path + ".part", "w", encoding="utf-8") as f:
+                json.dump(state, f, default=str, indent=1)
+            os.replace(self.path + ".part", self.path)
+
+    def preserve(self, name, compute):
+        """Return compute(), saved with the checkpoint; a resumed run gets the saved value back"""
+        if not self.resumable:
+            return compute()
+        path = os.path.join(self.directory, f"{self.tool}{self.suffix}.{name}.pickle")
+        if self.resumed and os.path.exists(path):
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        value = compute()
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path + ".part", "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".part", path)
+        return value
+
+    def answer(self, prompt, ask):
+        """The interrupted run's answer to prompt, or ask() for a new one and save it"""
+        if prompt not in self.answers:
+            self.answers[prompt] = ask()
+            self.save(force=True)
+        return self.answers[prompt]
+
+
+def begin(tool, args, run_id):
+    """Start tool's checkpoint for a new run and return it; dry runs get none"""
+    _state["checkpoint"] = None if args.dry_run else Checkpoint.start(tool, args, run_id)
+    return _state["checkpoint"]
+
+
+def resume(tool, args):
+    """Load the checkpoint of tool's interrupted run and restore its options on args"""
+    checkpoint = Checkpoint.load(tool)
+    checkpoint.restore(args)
+    _state["checkpoint"] = checkpoint
+    return checkpoint
+
+
+def current_checkpoint():
+    """The Checkpoint begun last in this process, or None"""
+    return _state["checkpoint"]
+
+
+def preserve(name, compute):
+    """compute(), saved with the current checkpoint so a resumed run starts from the same value"""
+    checkpoint = current_checkpoint()
+    if checkpoint is None:
+        return compute()
+    return checkpoint.preserve(name, compute)
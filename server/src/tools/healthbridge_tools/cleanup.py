@@ -0,0 +1,293 @@
+"""Batched, throttled deletes and fast truncation for cleanup_test_data
+
+delete_many({}) on a large collection is one long operation that floods the
+oplog and cannot be paused. BatchedDeleter walks the matching documents in
+_id order instead, deleting one _id range per batch. It can be held to a
+documents-per-second rate and saves its position after every batch, so an
+interrupted run can resume where it stopped.
+
+When the data does not need to go through the oplog one document at a time,
+truncate() drops the collection and recreates it with the indexes its
+Mongoose model declares, which takes about as long on a million documents as
+on ten.
+
+delete_run() removes exactly the documents one seed run wrote (see
+healthbridge_tools.seedruns), through the seedRunId index.
+"""
+import json
+import os
+import sys
+import time
+
+from bson import json_util
+from pymongo import IndexModel
+
+from .config import settings
+from .seedruns import MANIFEST_COLLECTION, ROLLUP_COLLECTION, RUN_COLLECTIONS, RUN_FIELD
+from .writer import chunked
+
+DEFAULT_DELETE_BATCH = 5000
+CHECKPOINT_FILE = "cleanup-checkpoints.json"
+
+# Collections the seeding tools and the rollup job write, in the order cleanup visits them
+COLLECTIONS = [
+    "users", "medications", "appointments", "patienthistories", "messages", "notifications",
+    "auditlogs", "userpreferences", MANIFEST_COLLECTION, ROLLUP_COLLECTION,
+]
+
+# Indexes declared in server/src/models/*.model.ts (unique fields and schema.index() calls)
+MODEL_INDEXES = {
+    "users": [IndexModel([("email", 1)], name="email_1", unique=True, background=True)],
+    "medications": [
+        IndexModel([("name", 1)], name="name_1", unique=True, background=True),
+        IndexModel([("name", "text"), ("description", "text")], name="name_text_description_text", background=True),
+    ],
+    "messages": [
+        IndexModel([("sender", 1), ("recipient", 1)], name="sender_1_recipient_1", background=True),
+        IndexModel([("appointmentId", 1)], name="appointmentId_1", background=True),
+        IndexModel([("createdAt", -1)], name="createdAt_-1", background=True),
+    ],
+    "notifications": [
+        IndexModel([("user", 1), ("read", 1)], name="user_1_read_1", background=True),
+        IndexModel([("user", 1), ("type", 1)], name="user_1_type_1", background=True),
+        IndexModel([("createdAt", -1)], name="createdAt_-1", background=True),
+    ],
+    "auditlogs": [
+        IndexModel([("action", 1), ("performedBy", 1), ("performedOn", 1)],
+                   name="action_1_performedBy_1_performedOn_1", background=True),
+        IndexModel([("createdAt", -1)], name="createdAt_-1", background=True),
+    ],
+    "userpreferences": [IndexModel([("userId", 1)], name="userId_1", unique=True, background=True)],
+}
+
+# list_indexes() fields that describe the index rather than being create options
+_INDEX_INFO_FIELDS = {"v", "key", "ns"}
+
+
+class Checkpoints:
+    """Last deleted _id per (database, collection, query), kept in a JSON file"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(settings.cache_dir, CHECKPOINT_FILE)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def _store(self, checkpoints):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(checkpoints, f, indent=2)
+        os.replace(temporary, self.path)
+
+    @staticmethod
+    def key(collection, query):
+        return f"{collection.database.name}.{collection.name} {json_util.dumps(query, sort_keys=True)}"
+
+    def get(self, key):
+        value = self._load().get(key)
+        return json_util.loads(value) if value is not None else None
+
+    def save(self, key, last_id):
+        checkpoints = self._load()
+        checkpoints[key] = json_util.dumps(last_id)
+        self._store(checkpoints)
+
+    def clear(self, key):
+        checkpoints = self._load()
+        if checkpoints.pop(key, None) is not None:
+            self._store(checkpoints)
+
+
+class DeleteStats:
+    """Running totals for one batched delete"""
+
+    def __init__(self, total=0, dry_run=False):
+        self.total = total
+        self.dry_run = dry_run
+        self.deleted = 0
+        self.batches = 0
+        self.resumed_from = None
+        self.interrupted = False
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    @property
+    def docs_per_sec(self):
+        return self.deleted / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "matched": self.total,
+            "deleted": self.deleted,
+            "batches": self.batches,
+            "elapsedSeconds": round(self.elapsed, 3),
+            "docsPerSec": round(self.docs_per_sec, 1),
+            "resumedFrom": str(self.resumed_from) if self.resumed_from is not None else None,
+            "interrupted": self.interrupted,
+            "dryRun": self.dry_run,
+        }
+
+
+def _throttle(stats, rate):
+    if rate:
+        # Sleep until the average rate is back under the cap
+        ahead = stats.deleted / rate - (time.monotonic() - stats.started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+class BatchedDeleter:
+    """Delete the documents matching query one _id range at a time
+
+    Each batch reads the next batch_size matching _ids in order and deletes
+    the range they span with a single delete_many. rate caps the documents
+    deleted per second (None for no cap). After every batch the last _id is
+    saved to checkpoints, so run(resume=True) skips what an earlier,
+    interrupted run already went through.
+    """
+
+    def __init__(self, collection, query=None, batch_size=None, rate=None, progress=True, checkpoints=None,
+                 dry_run=False, report_interval=0.5):
+        self.collection = collection
+        self.query = query or {}
+        self.batch_size = batch_size or DEFAULT_DELETE_BATCH
+        self.rate = rate
+        self.progress = progress
+        self.checkpoints = checkpoints or Checkpoints()
+        self.dry_run = dry_run
+        self.report_interval = report_interval
+        self._last_report = 0.0
+
+    def _after(self, last_id):
+        if last_id is None:
+            return dict(self.query)
+        return {**self.query, "_id": {"$gt": last_id}}
+
+    def _report(self, stats, final=False):
+        stats.elapsed = time.monotonic() - stats.started
+        if not self.progress:
+            return
+        if final or stats.elapsed - self._last_report >= self.report_interval:
+            self._last_report = stats.elapsed
+            done = min(stats.deleted / stats.total, 1.0) if stats.total else 1.0
+            bar = "#" * int(done * 30)
+            verb = "matched (dry run)" if self.dry_run else "deleted"
+            sys.stdout.write(
+                f"\r  {self.collection.name}: [{bar:<30}] {done * 100:5.1f}% "
+                f"{stats.deleted:,}/{stats.total:,} {verb} ({stats.docs_per_sec:,.0f} docs/sec)"
+            )
+            if final:
+                sys.stdout.write("\n")
+            sys.stdout.flush()
+
+    def run(self, resume=False):
+        """Delete every matching document and return the DeleteStats"""
+        key = Checkpoints.key(self.collection, self.query)
+        last_id = self.checkpoints.get(key) if resume else None
+        stats = DeleteStats(self.collection.count_documents(self._after(last_id)), self.dry_run)
+        stats.resumed_from = last_id
+        try:
+            while True:
+                ids = [
+                    document["_id"] for document in
+                    self.collection.find(self._after(last_id), {"_id": 1}).sort("_id", 1).limit(self.batch_size)
+                ]
+                if not ids:
+                    break
+                if self.dry_run:
+                    stats.deleted += len(ids)
+                else:
+                    result = self.collection.delete_many({**self.query, "_id": {"$gte": ids[0], "$lte": ids[-1]}})
+                    stats.deleted += result.deleted_count
+                stats.batches += 1
+                last_id = ids[-1]
+                if not self.dry_run:
+                    self.checkpoints.save(key, last_id)
+                self._report(stats)
+                _throttle(stats, self.rate)
+        except KeyboardInterrupt:
+            stats.interrupted = True
+        self._report(stats, final=True)
+        if stats.interrupted:
+            print(f"Interrupted after {stats.deleted:,} documents; run again with --resume to continue "
+                  f"after _id {last_id}.")
+        elif not self.dry_run:
+            self.checkpoints.clear(key)
+        return stats
+
+
+def index_model(index):
+    """An IndexModel recreating one list_indexes() entry
+
+    A text index lists its fields in weights; its key only holds the internal
+    _fts/_ftsx pair.
+    """
+    keys = []
+    for field, direction in index["key"].items():
+        if field == "_fts":
+            keys.extend((name, "text") for name in index["weights"])
+        elif field != "_ftsx":
+            keys.append((field, direction))
+    options = {field: value for field, value in index.items() if field not in _INDEX_INFO_FIELDS}
+    return IndexModel(keys, **options)
+
+
+def _recreated_indexes(name, existing):
+    """The model's indexes plus any other index the collection had"""
+    indexes = list(MODEL_INDEXES.get(name, []))
+    declared = {index.document["name"] for index in indexes}
+    indexes.extend(index_model(index) for index in existing
+                   if index["name"] != "_id_" and index["name"] not in declared)
+    return indexes
+
+
+def truncate(db, name, dry_run=False):
+    """Drop collection name and recreate it empty with its indexes; return the documents removed"""
+    collection = db[name]
+    count = collection.estimated_document_count()
+    indexes = _recreated_indexes(name, collection.list_indexes())
+    if dry_run:
+        return count
+    collection.drop()
+    db.create_collection(name)
+    if indexes:
+        collection.create_indexes(indexes)
+    return count
+
+
+def delete_run(db, run_id, resume=False, **options):
+    """Delete every document seed run run_id wrote, then its manifest entry
+
+    Collections are visited in RUN_COLLECTIONS order, so a run's appointments,
+    records, messages, notifications and audit logs go before the users they
+    reference.
+    options are passed to BatchedDeleter. Returns {collection: DeleteStats};
+    on interruption the manifest entry is kept so the run can be resumed.
+    """
+    results = {}
+    for name in RUN_COLLECTIONS:
+        stats = BatchedDeleter(db[name], {RUN_FIELD: run_id}, **options).run(resume=resume)
+        results[name] = stats
+        if stats.interrupted:
+            return results
+    if not options.get("dry_run"):
+        db[MANIFEST_COLLECTION].delete_one({"_id": run_id})
+    return results
+
+
+def delete_ids(collection, ids, batch_size=None, rate=None, dry_run=False):
+    """Delete the documents with the given _ids, one $in batch at a time, and return the DeleteStats"""
+    stats = DeleteStats(len(ids), dry_run)
+    for batch in chunked(ids, batch_size or DEFAULT_DELETE_BATCH):
+        if dry_run:
+            stats.deleted += len(batch)
+        else:
+            stats.deleted += collection.delete_many({"_id": {"$in": batch}}).deleted_count
+        stats.batches += 1
+        _throttle(stats, rate)
+    stats.elapsed = time.monotonic() - stats.started
+    return stats
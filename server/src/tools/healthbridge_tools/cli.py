@@ -0,0 +1,176 @@
+"""Shared command-line options for the seeding tools"""
+import argparse
+import contextlib
+import json
+import random
+import sys
+
+from . import checkpoints
+from .repro import anchor, parse_now
+from .seedruns import begin, current_run
+
+
+def positive_int(value):
+    """argparse type for options that must be at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def build_parser(prog, description, default_count=None, count_help=None, bulk=True, columnar=False,
+                 sharded=False, passwords=False):
+    """Build an ArgumentParser with the options every tool understands
+
+    Pass default_count=False for tools without a document count and bulk=False
+    for tools that do not generate documents. columnar=True adds --columnar for
+    seeders that can draw their fields with healthbridge_tools.columnar, and
+    sharded=True adds --workers for seeders that can split their run with
+    healthbridge_tools.shards. passwords=True adds the bcrypt options of
+    healthbridge_tools.passwords (plus --hash-passwords for seeders).
+    """
+    parser = argparse.ArgumentParser(prog=prog, description=description)
+    if default_count is not False:
+        parser.add_argument(
+            "--count", type=positive_int, default=default_count,
+            help=count_help or f"number of documents to generate (default: {default_count})"
+        )
+    if bulk:
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="documents per insert_many batch (default: HEALTHBRIDGE_BATCH_SIZE or 1000)")
+        parser.add_argument("--max-in-flight", type=int, default=None,
+                            help="insert batches allowed in flight at once (default: HEALTHBRIDGE_MAX_IN_FLIGHT or 4)")
+        parser.add_argument("--cursor-batch-size", type=int, default=None,
+                            help="documents per cursor batch when reading source collections "
+                                 "(default: HEALTHBRIDGE_CURSOR_BATCH_SIZE or 10000)")
+        parser.add_argument("--seed", type=int, default=None,
+                            help="seed the random generators and ObjectIds for repeatable data, and print a "
+                                 "fingerprint of the generated dataset")
+        parser.add_argument("--now", type=parse_now, default=None,
+                            help="ISO date or datetime to use as the current time for generated timestamps "
+                                 "(with --seed, makes runs byte-identical)")
+        parser.add_argument("--run-id", default=None,
+                            help="seed run to tag the written documents with (default: the run of this "
+                                 "process, or a new one); cleanup_test_data --run-id deletes a run")
+        parser.add_argument("--resume", action="store_true",
+                            help="continue this tool's interrupted --seed run from its checkpoint, with the "
+                                 "options it was started with")
+    if columnar:
+        parser.add_argument("--columnar", action="store_true",
+                            help="draw fields a column at a time with NumPy and insert pre-encoded BSON "
+                                 "(faster for large --count; same distribution as the default mode)")
+    if sharded:
+        parser.add_argument("--workers", type=positive_int, default=1,
+                            help="split --count across this many worker processes, each with its own "
+                                 "connection and random stream (default: 1)")
+    if passwords:
+        if bulk:
+            parser.add_argument("--hash-passwords", action="store_true",
+                                help="write bcrypt hashes instead of plain-text passwords")
+        parser.add_argument("--bcrypt-cost", type=int, default=10, help="bcrypt cost factor (default: 10)")
+        parser.add_argument("--hash-workers", type=positive_int, default=None,
+                            help="processes hashing distinct passwords in parallel (default: CPU count)")
+        parser.add_argument("--no-hash-cache", action="store_true",
+                            help="do not read or write the on-disk bcrypt hash cache")
+    parser.add_argument("-y", "--yes", action="store_true", help="answer yes to confirmation prompts")
+    parser.add_argument("--dry-run", action="store_true", help="generate documents without writing to the database")
+    parser.add_argument("--json", action="store_true",
+                        help="print a JSON summary on stdout (progress output goes to stderr)")
+    return parser
+
+
+def apply_seed(args, tool):
+    """Seed the module-level random generator, anchor ObjectIds and the clock, and begin the seed run
+
+    The tool name keeps ObjectIds from different tools run with the same seed
+    apart. With --resume the interrupted run's options are restored on args
+    first (see healthbridge_tools.checkpoints).
+    """
+    resuming = getattr(args, "resume", False)
+    if resuming:
+        if args.dry_run:
+            print("Error: --resume continues writing to the database; it cannot be combined with --dry-run.")
+            sys.exit(1)
+        try:
+            checkpoint = checkpoints.resume(tool, args)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        print(f"Resuming seed run {checkpoint.run_id} from {checkpoint.path}.")
+    if args.seed is not None:
+        random.seed(args.seed)
+    anchor(args.seed, getattr(args, "now", None), stream=tool)
+    run = begin(tool, getattr(args, "run_id", None), seed=args.seed, now=getattr(args, "now", None))
+    if not resuming and hasattr(args, "resume"):
+        checkpoints.begin(tool, args, run.run_id)
+
+
+def confirm(args, prompt):
+    """Ask a y/n question unless --yes was given"""
+    if args.yes:
+        return True
+    return input(prompt).lower() == 'y'
+
+
+def prompt_int(args, prompt, default):
+    """Read a number interactively, or use the default when running with --yes
+
+    A resumed run gets the answer its interrupted run was given.
+    """
+    def ask():
+        if args.yes:
+            return default
+        try:
+            return int(input(prompt) or str(default))
+        except ValueError:
+            print(f"Invalid input. Defaulting to {default}.")
+            return default
+
+    checkpoint = checkpoints.current_checkpoint()
+    if checkpoint is None:
+        return ask()
+    return checkpoint.answer(prompt, ask)
+
+
+def writer_options(args):
+    """Keyword arguments for bulk_insert taken from the parsed options"""
+    return {
+        "batch_size": args.batch_size,
+        "max_in_flight": args.max_in_flight,
+        "dry_run": args.dry_run,
+        "progress": not args.json,
+        "fingerprint": args.seed is not None,
+        "run": current_run(),
+        "checkpoint": checkpoints.current_checkpoint(),
+    }
+
+
+def hasher_options(args):
+    """Keyword arguments for PasswordHasher taken from the parsed options"""
+    return {
+        "cost": args.bcrypt_cost,
+        "workers": args.hash_workers,
+        "use_cache": not args.no_hash_cache,
+    }
+
+
+@contextlib.contextmanager
+def json_summary(args, tool):
+    """Collect a run summary and print it as JSON on exit when --json is set
+
+    While --json is active, regular output is redirected to stderr so stdout
+    carries only the JSON document.
+    """
+    run = current_run()
+    summary = {"tool": tool, "dryRun": args.dry_run, "seed": getattr(args, "seed", None),
+               "now": getattr(args, "now", None), "seedRunId": run.run_id if run else None}
+    if not args.json:
+        yield summary
+        return
+    stdout = sys.stdout
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            yield summary
+    finally:
+        stdout.write(json.dumps(summary, default=str, indent=2) + "\n")
+        stdout.flush()
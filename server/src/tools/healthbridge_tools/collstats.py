@@ -0,0 +1,107 @@
+"""Collection statistics from metadata, fetched for all collections at once
+
+count_documents({}) scans the whole collection, which is slow on the
+collections the seeders fill. The $collStats storage statistics read the
+document count, data size and index sizes from the storage engine's
+metadata instead, and every collection is asked concurrently. Exact counts
+remain available with exact=True.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo.errors import OperationFailure
+
+# Collections shown by the cleanup tool, with their display names
+DISPLAY_NAMES = {
+    "users": "Users",
+    "medications": "Medications",
+    "appointments": "Appointments",
+    "patienthistories": "Patient Histories",
+    "messages": "Messages",
+    "notifications": "Notifications",
+    "auditlogs": "Audit Logs",
+    "userpreferences": "User Preferences",
+    "seedruns": "Seed Runs",
+    "dailystats": "Daily Stats",
+}
+
+
+class CollectionStats:
+    """Size figures for one collection; sizes are in bytes"""
+
+    def __init__(self, name, count=0, exact=False, size=0, storage_size=0, index_size=0, indexes=0):
+        self.name = name
+        self.count = count
+        self.exact = exact
+        self.size = size
+        self.storage_size = storage_size
+        self.index_size = index_size
+        self.indexes = indexes
+
+    @property
+    def avg_document_size(self):
+        return self.size / self.count if self.count else 0
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "exactCount": self.exact,
+            "size": self.size,
+            "storageSize": self.storage_size,
+            "totalIndexSize": self.index_size,
+            "avgObjSize": round(self.avg_document_size, 1),
+            "indexes": self.indexes,
+        }
+
+
+def _collection_stats(db, name, exact):
+    stats = CollectionStats(name, exact=exact)
+    try:
+        # One document per shard on a sharded cluster
+        for shard in db[name].aggregate([{"$collStats": {"storageStats": {}}}]):
+            storage = shard.get("storageStats", {})
+            stats.count += storage.get("count", 0)
+            stats.size += storage.get("size", 0)
+            stats.storage_size += storage.get("storageSize", 0)
+            stats.index_size += storage.get("totalIndexSize", 0)
+            stats.indexes = max(stats.indexes, storage.get("nindexes", 0))
+    except OperationFailure:
+        # The collection does not exist (yet)
+        pass
+    if exact:
+        stats.count = db[name].count_documents({})
+    return stats
+
+
+def collection_stats(db, names=None, exact=False):
+    """Return {name: CollectionStats} for names, querying every collection concurrently
+
+    Counts come from collection metadata, which can be slightly off after an
+    unclean shutdown; exact=True counts the documents instead.
+    """
+    names = list(names or DISPLAY_NAMES)
+    with ThreadPoolExecutor(max_workers=len(names)) as pool:
+        futures = [pool.submit(_collection_stats, db, name, exact) for name in names]
+        return {name: future.result() for name, future in zip(names, futures)}
+
+
+def _format_bytes(value):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if value < 1024:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TiB"
+
+
+def format_table(stats):
+    """Render {name: CollectionStats} as a fixed-width text table"""
+    header = f"{'Collection':<20}{'Documents':>14}{'Data':>12}{'Storage':>12}{'Indexes':>12}{'Avg doc':>10}"
+    lines = [header, "-" * len(header)]
+    for name, entry in stats.items():
+        count = f"{entry.count:,}" if entry.exact else f"~{entry.count:,}"
+        lines.append(
+            f"{DISPLAY_NAMES.get(name, name):<20}{count:>14}{_format_bytes(entry.size):>12}"
+            f"{_format_bytes(entry.storage_size):>12}{_format_bytes(entry.index_size):>12}"
+            f"{_format_bytes(entry.avg_document_size):>10}"
+        )
+    return "\n".join(lines)
+
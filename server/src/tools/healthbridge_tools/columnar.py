@@ -0,0 +1,142 @@
+"""Column-at-a-time random draws for the user seeders
+
+The scalar generators call random.choice()/random.randint() once per field per
+document. In columnar mode a seeder asks a Columns object for whole columns
+(one NumPy call per field per chunk) and only zips the finished columns into
+documents in Python. Every helper mirrors the distribution of the random-module
+call it replaces, so both modes produce statistically identical data.
+"""
+import numpy as np
+from bson import encode
+from bson.raw_bson import RawBSONDocument
+
+from .repro import new_object_id, new_object_ids
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def make_rng(seed=None):
+    """Return a NumPy Generator, seeded when --seed was given"""
+    return np.random.default_rng(seed)
+
+
+def objects(values):
+    """Pack values into a 1-D object array (tuples stay whole)"""
+    array = np.empty(len(values), dtype=object)
+    array[:] = list(values)
+    return array
+
+
+class Columns:
+    """Draw columns of size values from a NumPy Generator
+
+    Columns come back as plain Python lists so the per-document assembly loop
+    never touches NumPy scalars.
+    """
+
+    def __init__(self, rng, size):
+        self.rng = rng
+        self.size = size
+
+    def index(self, count):
+        """Uniform positions in range(count), like random.randrange(count)"""
+        return self.rng.integers(0, count, self.size)
+
+    def pick(self, options):
+        """Uniform choices from options, like random.choice(options)"""
+        return objects(options)[self.index(len(options))].tolist()
+
+    def pick_each(self, option_lists):
+        """Per-row random.choice(option_lists[row]) when the options differ by row"""
+        return [options[int(u * len(options))] for u, options in zip(self.rng.random(self.size).tolist(), option_lists)]
+
+    def integers(self, low, high):
+        """Uniform integers in [low, high], like random.randint(low, high)"""
+        return self.rng.integers(low, high + 1, self.size).tolist()
+
+    def uniform(self, low, high):
+        """Uniform floats in [low, high), like random.uniform(low, high)"""
+        return self.rng.uniform(low, high, self.size).tolist()
+
+    def chance(self, probability):
+        """Booleans that are True with the given probability, like random.random() < p"""
+        return (self.rng.random(self.size) < probability).tolist()
+
+    def positions(self, count, length):
+        """Per-row random.sample(range(count), length), as an array of shape (size, length)
+
+        Draw j picks the r-th position not taken by draws 0..j-1, which keeps
+        every ordered sample equally likely without shuffling all count positions.
+        """
+        picked = np.empty((self.size, length), dtype=np.int64)
+        for j in range(length):
+            draw = self.rng.integers(0, count - j, self.size)
+            for taken in np.sort(picked[:, :j], axis=1).T:
+                draw += draw >= taken
+            picked[:, j] = draw
+        return picked
+
+    def samples(self, options, low, high):
+        """Per-row random.sample(options, random.randint(low, high)), as a list of lists"""
+        lengths = self.integers(low, high)
+        picked = objects(options)[self.positions(len(options), high)].tolist()
+        return [row[:length] for row, length in zip(picked, lengths)]
+
+    def subsets(self, options, low, high):
+        """Per-row random.sample(options, random.randint(low, high)) put back in list order
+
+        Each subset is a bitmask over options; the distinct masks are decoded once
+        per chunk, which is cheap because options is short (e.g. week days).
+        """
+        lengths = self.integers(low, high)
+        bits = np.left_shift(1, self.positions(len(options), high))
+        masks = np.where(np.arange(high) < np.asarray(lengths)[:, None], bits, 0).sum(axis=1)
+        decoded = {mask: [option for i, option in enumerate(options) if mask >> i & 1] for mask in set(masks.tolist())}
+        return [decoded[mask][:] for mask in masks.tolist()]
+
+    def birth_dates(self, min_age, max_age, year):
+        """Birth dates built like the scalar seeders: age in [min_age, max_age], day 1-28"""
+        years = self.rng.integers(year - max_age, year - min_age + 1, self.size) - 1970
+        months = self.rng.integers(0, 12, self.size)
+        days = self.rng.integers(0, 28, self.size)
+        dates = (years.astype("datetime64[Y]") + months.astype("timedelta64[M]")).astype("datetime64[D]")
+        # datetime64[us] converts to datetime.datetime objects in C
+        return (dates + days.astype("timedelta64[D]")).astype("datetime64[us]").tolist()
+
+    def object_ids(self):
+        """A fresh ObjectId per row"""
+        return new_object_ids(self.size)
+
+    def us_phones(self):
+        """US-formatted phone numbers: (NNN) NNN-NNNN"""
+        return [
+            f"({a}) {b}-{c}"
+            for a, b, c in zip(self.integers(100, 999), self.integers(100, 999), self.integers(1000, 9999))
+        ]
+
+
+def generate_columnar(count, build_chunk, rng, chunk_size=None):
+    """Yield count documents from build_chunk(columns), one chunk of columns at a time
+
+    Only chunk_size rows of columns are alive at once, so memory stays flat for
+    million-document runs.
+    """
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    remaining = count
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        yield from build_chunk(Columns(rng, size))
+        remaining -= size
+
+
+def encode_raw(documents):
+    """Yield each document pre-encoded as a RawBSONDocument
+
+    insert_many sends RawBSONDocuments as-is instead of encoding them inside
+    the insert call. The driver cannot add an _id to a raw document, so one
+    is added here when the generator did not set it (see Columns.object_ids).
+    """
+    for document in documents:
+        if "_id" not in document:
+            document["_id"] = new_object_id()
+        yield RawBSONDocument(encode(document))
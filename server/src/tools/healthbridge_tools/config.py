@@ -0,0 +1,114 @@
+"""Lazily resolved settings shared by the HealthBridge seeding tools"""
+import os
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+
+# server/.env, relative to server/src/tools/healthbridge_tools/config.py
+DEFAULT_ENV_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))),
+    '.env'
+)
+DEFAULT_DB_NAME = "test"
+DEFAULT_MAX_POOL_SIZE = 50
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_MAX_IN_FLIGHT = 4
+DEFAULT_CURSOR_BATCH_SIZE = 10000
+DEFAULT_WRITE_RETRIES = 5
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'healthbridge')
+
+
+class Settings:
+    """Connection settings resolved on first access instead of at import time"""
+
+    def __init__(self, env_path=None):
+        self._env_path = env_path
+        self._env_loaded = False
+        self._mongo_uri = None
+        self._db_name = None
+
+    @property
+    def env_path(self):
+        if self._env_path is None:
+            self._env_path = os.getenv('HEALTHBRIDGE_ENV_PATH') or DEFAULT_ENV_PATH
+        return self._env_path
+
+    def configure(self, mongo_uri=None, db_name=None):
+        """Use already-resolved connection settings instead of reading .env
+
+        Worker processes get the parent's settings this way, so they never
+        prompt for a connection string.
+        """
+        if mongo_uri is not None:
+            self._mongo_uri = mongo_uri
+        if db_name is not None:
+            self._db_name = db_name
+        self._env_loaded = True
+
+    def load_env(self):
+        """Load the .env file once, creating it interactively if it is missing"""
+        if self._env_loaded:
+            return
+        if not os.path.exists(self.env_path) and not os.getenv('MONGODB_URI'):
+            print(f"Warning: .env file not found at {self.env_path}")
+            mongo_uri = input("Please enter your MongoDB connection string: ")
+            with open(self.env_path, 'w') as f:
+                f.write(f"MONGODB_URI={mongo_uri}\n")
+            print(f"Created .env file at {self.env_path}")
+        load_dotenv(self.env_path)
+        self._env_loaded = True
+
+    @property
+    def mongo_uri(self):
+        if self._mongo_uri is None:
+            self.load_env()
+            mongo_uri = os.getenv('MONGODB_URI')
+            if not mongo_uri:
+                print("Error: MONGODB_URI environment variable not found.")
+                mongo_uri = input("Please enter your MongoDB connection string: ")
+                with open(self.env_path, 'a') as f:
+                    f.write(f"MONGODB_URI={mongo_uri}\n")
+                print("Updated .env file with MongoDB URI")
+            self._mongo_uri = mongo_uri
+        return self._mongo_uri
+
+    @property
+    def db_name(self):
+        if self._db_name is None:
+            # The database is the URI path component, e.g. mongodb://host:27017/healthbridge?retryWrites=true
+            path = urlsplit(self.mongo_uri).path.strip('/')
+            self._db_name = path or DEFAULT_DB_NAME
+        return self._db_name
+
+    @property
+    def max_pool_size(self):
+        self.load_env()
+        return int(os.getenv('HEALTHBRIDGE_MAX_POOL_SIZE', DEFAULT_MAX_POOL_SIZE))
+
+    @property
+    def batch_size(self):
+        self.load_env()
+        return int(os.getenv('HEALTHBRIDGE_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+
+    @property
+    def max_in_flight(self):
+        self.load_env()
+        return int(os.getenv('HEALTHBRIDGE_MAX_IN_FLIGHT', DEFAULT_MAX_IN_FLIGHT))
+
+    @property
+    def write_retries(self):
+        self.load_env()
+        return int(os.getenv('HEALTHBRIDGE_WRITE_RETRIES', DEFAULT_WRITE_RETRIES))
+
+    @property
+    def cursor_batch_size(self):
+        self.load_env()
+        return int(os.getenv('HEALTHBRIDGE_CURSOR_BATCH_SIZE', DEFAULT_CURSOR_BATCH_SIZE))
+
+    @property
+    def cache_dir(self):
+        self.load_env()
+        return os.getenv('HEALTHBRIDGE_CACHE_DIR', DEFAULT_CACHE_DIR)
+
+
+settings = Settings()
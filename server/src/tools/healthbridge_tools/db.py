@@ -0,0 +1,109 @@
+"""Shared, pooled MongoDB client for the HealthBridge seeding tools"""
+import sys
+import threading
+
+import pymongo
+
+from .checkpoints import preserve
+from .config import settings
+from .repro import anchored_now, new_object_id
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide MongoClient, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                try:
+                    _client = pymongo.MongoClient(
+                        settings.mongo_uri,
+                        maxPoolSize=settings.max_pool_size,
+                        appname="healthbridge-tools"
+                    )
+                except Exception as e:
+                    print(f"Error connecting to MongoDB: {e}")
+                    sys.exit(1)
+                print(f"Connected to MongoDB database '{settings.db_name}' successfully!")
+    return _client
+
+
+def get_db():
+    """Return the HealthBridge database on the shared client"""
+    return get_client()[settings.db_name]
+
+
+def close_client():
+    """Close the shared client so the next get_client() opens a fresh pool"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def resolve_admin_id(db, assume_yes=False, dry_run=False):
+    """Find an admin user (or any user) to set as createdBy, creating a placeholder if needed
+
+    A resumed run (see healthbridge_tools.checkpoints) gets the id its
+    interrupted run used.
+    """
+    computed = []
+
+    def resolve():
+        computed.append(True)
+        return _find_or_create_admin(db, assume_yes, dry_run)
+
+    admin_id, created = preserve("admin_id", resolve)
+    if created and not computed:
+        # The interrupted run took the placeholder's ObjectId; take it again so later ids stay in step
+        new_object_id()
+    return admin_id
+
+
+def _find_or_create_admin(db, assume_yes, dry_run):
+    """Return (admin id, whether a placeholder admin was created for it)"""
+    users_collection = db.users
+    try:
+        admin_user = users_collection.find_one({"role": "admin"}, {"_id": 1})
+        if admin_user:
+            admin_id = admin_user["_id"]
+            print(f"Using admin user ID: {admin_id} as creator")
+            return admin_id, False
+
+        print("No admin user found. Looking for any user...")
+        any_user = users_collection.find_one({}, {"_id": 1})
+        if any_user:
+            admin_id = any_user["_id"]
+            print(f"Using user ID: {admin_id} as creator")
+            return admin_id, False
+
+        print("No users found in the database.")
+        if not assume_yes:
+            create_user = input("Would you like to create a placeholder admin user? (y/n): ")
+            if create_user.lower() != 'y':
+                print("Cannot proceed without a user. Exiting.")
+                sys.exit(1)
+
+        admin_id = new_object_id()
+        if dry_run:
+            print(f"Dry run: using unsaved placeholder admin ID: {admin_id}")
+            return admin_id, True
+        users_collection.insert_one({
+            "_id": admin_id,
+            "email": "admin@healthbridge.com",
+            "password": "placeholder",  # This would be hashed in a real scenario
+            "firstName": "Admin",
+            "lastName": "User",
+            "role": "admin",
+            "createdAt": anchored_now(),
+            "updatedAt": anchored_now()
+        })
+        print(f"Created placeholder admin user with ID: {admin_id}")
+        return admin_id, True
+    except Exception as e:
+        print(f"Error finding or creating admin user: {e}")
+        sys.exit(1)
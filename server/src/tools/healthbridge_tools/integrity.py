@@ -0,0 +1,317 @@
+"""Orphan sweeping: documents that reference users (or appointments) that no longer exist
+
+Deleting users leaves appointments, patient records, messages, notifications,
+audit logs and preferences pointing at ObjectIds that are gone, and the
+server's populate() calls pay for every one of them. OrphanSweeper finds them
+with hash joins instead of per-document lookups:
+
+- the _ids of every users document are streamed into an IdHashSet, an
+  open-addressing table in NumPy arrays (about 26 bytes per id);
+- each referencing collection is streamed once, on its own cursor and thread,
+  projected to its reference fields, and checked a chunk at a time against
+  the set; a document is an orphan when any reference is dangling.
+
+Building the set and probing it take expected constant time per id, so a
+sweep is linear in the size of the collections. References cascade: messages
+are checked against the appointments that survive the sweep, so a message
+about an orphaned appointment is an orphan too.
+
+The sets are snapshots, so a document written during the sweep for a user
+created after the snapshot looks orphaned. delete() therefore re-reads each
+batch of candidates and looks their references up with $in before deleting,
+and keeps the ones that are no longer dangling.
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .cleanup import DEFAULT_DELETE_BATCH, delete_ids
+from .config import settings
+from .loaders import OBJECT_ID_DTYPE, IdArray
+from .writer import chunked
+
+# Collection -> {reference field: referenced collection}, from server/src/models
+REFERENCES = {
+    "appointments": {"patient": "users", "doctor": "users"},
+    "patienthistories": {"patient": "users", "doctor": "users"},
+    "notifications": {"user": "users"},
+    "auditlogs": {"performedBy": "users"},
+    "userpreferences": {"userId": "users"},
+    "messages": {"sender": "users", "recipient": "users", "appointmentId": "appointments"},
+}
+
+DEFAULT_SCAN_CHUNK = 100_000
+# Rebuild the table larger once it is this full
+_MAX_LOAD = 0.5
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX = np.uint64(0xC2B2AE3D27D4EB4F)
+
+
+def _split(raw):
+    """Split 12-byte ObjectId values into (uint64 of bytes 0-7, uint32 of bytes 8-11)"""
+    octets = np.ascontiguousarray(raw).view(np.uint8).reshape(-1, 12)
+    high = np.ascontiguousarray(octets[:, :8]).view(">u8").ravel().astype(np.uint64)
+    low = np.ascontiguousarray(octets[:, 8:]).view(">u4").ravel().astype(np.uint32)
+    return high, low
+
+
+class IdHashSet:
+    """Set of ObjectIds in an open-addressing (linear probing) table of NumPy arrays
+
+    add() and contains() work on whole arrays of 12-byte ids at once: each
+    round probes one slot for every key still pending, so the Python-level
+    loop runs once per probe step, not once per id.
+    """
+
+    def __init__(self, capacity=0):
+        self._allocate(1 << max(4, int(capacity / _MAX_LOAD).bit_length()))
+        self.count = 0
+
+    def _allocate(self, size):
+        self.mask = np.uint64(size - 1)
+        self.high = np.zeros(size, dtype=np.uint64)
+        self.low = np.zeros(size, dtype=np.uint32)
+        self.used = np.zeros(size, dtype=bool)
+
+    def _slots(self, high, low):
+        mixed = high * _GOLDEN ^ low.astype(np.uint64) * _MIX
+        return (mixed ^ (mixed >> np.uint64(29))) & self.mask
+
+    def _insert(self, high, low):
+        slots = self._slots(high, low)
+        claims = np.empty(len(self.used), dtype=np.intp)
+        pending = np.arange(len(high))
+        while pending.size:
+            at = slots[pending]
+            occupied = self.used[at]
+            present = occupied & (self.high[at] == high[pending]) & (self.low[at] == low[pending])
+            # Keys racing for the same free slot: the last write to claims wins it
+            free = ~occupied
+            contenders, free_at = pending[free], at[free]
+            claims[free_at] = contenders
+            won = np.zeros(len(pending), dtype=bool)
+            won[free] = claims[free_at] == contenders
+            winners = pending[won]
+            self.used[at[won]] = True
+            self.high[at[won]] = high[winners]
+            self.low[at[won]] = low[winners]
+            self.count += len(winners)
+            # Losers retry the same (now taken) slot and compare against the winner
+            advance = occupied & ~present
+            slots[pending[advance]] = (at[advance] + np.uint64(1)) & self.mask
+            pending = pending[advance | (free & ~won)]
+
+    def add(self, raw):
+        """Add an array of 12-byte ObjectId values"""
+        if len(raw) == 0:
+            return
+        if self.count + len(raw) > len(self.used) * _MAX_LOAD:
+            self._grow(self.count + len(raw))
+        self._insert(*_split(raw))
+
+    def _grow(self, capacity):
+        high, low = self.high[self.used], self.low[self.used]
+        self._allocate(1 << int(capacity / _MAX_LOAD).bit_length())
+        self.count = 0
+        self._insert(high, low)
+
+    def contains(self, raw):
+        """Boolean array: which of the 12-byte ObjectId values are in the set"""
+        high, low = _split(raw)
+        found = np.zeros(len(high), dtype=bool)
+        slots = self._slots(high, low)
+        pending = np.arange(len(high))
+        while pending.size:
+            at = slots[pending]
+            occupied = self.used[at]
+            present = occupied & (self.high[at] == high[pending]) & (self.low[at] == low[pending])
+            found[pending[present]] = True
+            advance = occupied & ~present
+            slots[pending[advance]] = (at[advance] + np.uint64(1)) & self.mask
+            pending = pending[advance]
+        return found
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return self.high.nbytes + self.low.nbytes + self.used.nbytes
+
+    @classmethod
+    def load(cls, collection, query=None, batch_size=None, chunk_size=DEFAULT_SCAN_CHUNK):
+        """Stream the _id of every matching document into a new IdHashSet"""
+        ids = cls(collection.estimated_document_count())
+        cursor = collection.find(query or {}, {"_id": 1}, batch_size=batch_size or settings.cursor_batch_size)
+        buffer = bytearray()
+        for document in cursor:
+            buffer += document["_id"].binary
+            if len(buffer) >= chunk_size * 12:
+                ids.add(np.frombuffer(bytes(buffer), dtype=OBJECT_ID_DTYPE))
+                buffer = bytearray()
+        ids.add(np.frombuffer(bytes(buffer), dtype=OBJECT_ID_DTYPE))
+        return ids
+
+
+class OrphanReport:
+    """What one collection's scan found"""
+
+    def __init__(self, collection, fields):
+        self.collection = collection
+        self.fields = fields
+        self.scanned = 0
+        self.by_field = {field: 0 for field in fields}
+        self.orphans = IdArray(np.empty(0, dtype=OBJECT_ID_DTYPE))
+        self.kept = 0
+        self.deleted = 0
+        self.elapsed = 0.0
+
+    def as_dict(self):
+        return {
+            "scanned": self.scanned,
+            "orphans": len(self.orphans),
+            "byField": self.by_field,
+            "kept": self.kept,
+            "deleted": self.deleted,
+            "elapsedSeconds": round(self.elapsed, 3),
+        }
+
+
+def scan_references(collection, fields, targets, keep_survivors=False, batch_size=None,
+                    chunk_size=DEFAULT_SCAN_CHUNK):
+    """Check every document's reference fields against targets ({collection name: IdHashSet})
+
+    fields maps reference fields to the collection they point into. Missing
+    references (optional fields) are not orphans. Returns the OrphanReport and,
+    with keep_survivors, an IdHashSet of the _ids that are not orphans.
+    """
+    started = time.monotonic()
+    report = OrphanReport(collection.name, fields)
+    survivors = IdHashSet(collection.estimated_document_count()) if keep_survivors else None
+    orphans = []
+    projection = {"_id": 1, **{field: 1 for field in fields}}
+    cursor = collection.find({}, projection, batch_size=batch_size or settings.cursor_batch_size)
+
+    def check(buffers):
+        ids = np.frombuffer(bytes(buffers["_id"]), dtype=OBJECT_ID_DTYPE)
+        orphaned = np.zeros(len(ids), dtype=bool)
+        for field, target in fields.items():
+            references = np.frombuffer(bytes(buffers[field]), dtype=OBJECT_ID_DTYPE)
+            present = references.view(np.uint8).reshape(-1, 12).any(axis=1)
+            dangling = present & ~targets[target].contains(references)
+            report.by_field[field] += int(dangling.sum())
+            orphaned |= dangling
+        orphans.append(ids[orphaned])
+        if survivors is not None:
+            survivors.add(ids[~orphaned])
+        report.scanned += len(ids)
+
+    buffers = {name: bytearray() for name in projection}
+    for document in cursor:
+        for name in projection:
+            value = document.get(name)
+            buffers[name] += value.binary if value is not None else bytes(12)
+        if len(buffers["_id"]) >= chunk_size * 12:
+            check(buffers)
+            buffers = {name: bytearray() for name in projection}
+    check(buffers)
+    report.orphans = IdArray(np.concatenate(orphans))
+    report.elapsed = time.monotonic() - started
+    return report, survivors
+
+
+class OrphanSweeper:
+    """Find (and optionally delete) the orphans of every collection in references
+
+    Collections whose referenced sets are known are scanned together, one
+    thread and cursor each; a collection that others reference (appointments)
+    contributes its surviving _ids to the next round.
+    """
+
+    def __init__(self, db, references=None, batch_size=None, progress=True):
+        self.db = db
+        self.references = references or REFERENCES
+        self.batch_size = batch_size
+        self.progress = progress
+
+    def _log(self, message):
+        if self.progress:
+            sys.stdout.write(message + "\n")
+            sys.stdout.flush()
+
+    def find(self):
+        """Scan every referencing collection and return {collection: OrphanReport}"""
+        referenced = {target for fields in self.references.values() for target in fields.values()}
+        roots = referenced - set(self.references)
+        targets = {}
+        for name in sorted(roots):
+            targets[name] = IdHashSet.load(self.db[name], batch_size=self.batch_size)
+            self._log(f"  Loaded {len(targets[name]):,} _ids from {name} ({targets[name].nbytes / 2 ** 20:.1f} MiB).")
+
+        reports = {}
+        remaining = dict(self.references)
+        while remaining:
+            ready = [name for name, fields in remaining.items() if set(fields.values()) <= set(targets)]
+            if not ready:
+                raise ValueError(f"Circular references between {', '.join(remaining)}")
+            with ThreadPoolExecutor(max_workers=len(ready)) as pool:
+                futures = {
+                    name: pool.submit(scan_references, self.db[name], remaining[name], targets,
+                                      keep_survivors=name in referenced, batch_size=self.batch_size)
+                    for name in ready
+                }
+                for name, future in futures.items():
+                    reports[name], survivors = future.result()
+                    if survivors is not None:
+                        targets[name] = survivors
+                    report = reports[name]
+                    self._log(f"  {name}: {len(report.orphans):,} orphans in {report.scanned:,} documents "
+                              f"({report.elapsed:.1f}s)")
+            for name in ready:
+                del remaining[name]
+        return reports
+
+    def confirm(self, name, ids, doomed, batch_size=None):
+        """The ids of collection name whose references still dangle when looked up again
+
+        Each batch of candidates is re-read, and its references are looked up
+        with $in; references into doomed ({collection: _ids being deleted})
+        count as dangling. Candidates deleted meanwhile are dropped.
+        """
+        fields = self.references[name]
+        confirmed = []
+        for batch in chunked(ids, batch_size or DEFAULT_DELETE_BATCH):
+            documents = list(self.db[name].find({"_id": {"$in": batch}}, {field: 1 for field in fields}))
+            wanted = {target: set() for target in fields.values()}
+            for document in documents:
+                for field, target in fields.items():
+                    if document.get(field) is not None:
+                        wanted[target].add(document[field])
+            existing = {
+                target: {doc["_id"] for doc in self.db[target].find({"_id": {"$in": list(references)}}, {"_id": 1})}
+                - doomed.get(target, set())
+                for target, references in wanted.items()
+            }
+            confirmed.extend(document["_id"] for document in documents
+                             if any(document.get(field) is not None and document[field] not in existing[target]
+                                    for field, target in fields.items()))
+        return confirmed
+
+    def delete(self, reports, batch_size=None, rate=None, dry_run=False):
+        """Batch-delete the orphans found by find() that are still orphans, recording the counts on the reports"""
+        referenced = {target for fields in self.references.values() for target in fields.values()}
+        doomed = {}
+        for name, report in reports.items():
+            if len(report.orphans):
+                # Reports come in scan order, so the orphans of appointments are settled before messages
+                ids = self.confirm(name, list(report.orphans), doomed, batch_size)
+                report.kept = len(report.orphans) - len(ids)
+                if name in referenced:
+                    doomed[name] = set(ids)
+                report.deleted = delete_ids(self.db[name], ids, batch_size=batch_size, rate=rate,
+                                            dry_run=dry_run).deleted
+                kept = f", kept {report.kept:,} referenced again" if report.kept else ""
+                self._log(f"  {name}: {'would delete' if dry_run else 'deleted'} {report.deleted:,} orphans{kept}")
+        return reports
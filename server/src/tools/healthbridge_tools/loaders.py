@@ -0,0 +1,146 @@
+"""Projection-aware loaders that stream source collections into compact arrays"""
+from array import array
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+
+import numpy as np
+from bson import ObjectId
+
+from .config import settings
+from .repro import is_seeded
+
+EPOCH = datetime(1970, 1, 1)
+OBJECT_ID_DTYPE = np.dtype('V12')
+# Stored for missing dates; matches NumPy's NaT for datetime64 values
+MISSING_MS = np.iinfo(np.int64).min
+
+
+def _to_ms(value):
+    if value is None:
+        return MISSING_MS
+    return (value.replace(tzinfo=None) - EPOCH) // timedelta(milliseconds=1)
+
+
+def _from_ms(value):
+    if value == MISSING_MS:
+        return None
+    return EPOCH + timedelta(milliseconds=int(value))
+
+
+class IdArray(Sequence):
+    """Read-only sequence of ObjectIds packed as 12-byte values
+
+    Supports len(), indexing and iteration, so random.choice() and
+    random.sample() work on it directly.
+    """
+
+    def __init__(self, raw):
+        self.raw = np.asarray(raw, dtype=OBJECT_ID_DTYPE)
+
+    @classmethod
+    def from_ids(cls, ids):
+        buffer = bytearray()
+        for _id in ids:
+            buffer += _id.binary
+        return cls(np.frombuffer(bytes(buffer), dtype=OBJECT_ID_DTYPE))
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __getitem__(self, index):
+        return ObjectId(self.raw[index].tobytes())
+
+    def __iter__(self):
+        for value in self.raw:
+            yield ObjectId(value.tobytes())
+
+    def take(self, indices):
+        """Return a new IdArray holding only the given positions"""
+        return IdArray(self.raw[np.asarray(indices, dtype=np.intp)])
+
+    def unique(self):
+        """Return a new IdArray with duplicate ids removed"""
+        return IdArray(np.unique(self.raw))
+
+    @property
+    def nbytes(self):
+        return self.raw.nbytes
+
+
+class ColumnTable:
+    """Column-oriented rows loaded from a collection (ObjectId and date columns)"""
+
+    def __init__(self, columns, kinds):
+        self.columns = columns
+        self.kinds = kinds
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def row(self, index):
+        """Decode one row back into a dict of Python values"""
+        row = {}
+        for name, column in self.columns.items():
+            if self.kinds[name] == "objectid":
+                row[name] = ObjectId(column[index].tobytes())
+            else:
+                value = _from_ms(column[index])
+                if value is not None:
+                    row[name] = value
+        return row
+
+    def rows(self, indices=None):
+        """Yield rows for the given indices (all rows by default)"""
+        for index in (range(len(self)) if indices is None else indices):
+            yield self.row(index)
+
+    def column(self, name):
+        if self.kinds[name] == "objectid":
+            return IdArray(self.columns[name])
+        return self.columns[name].astype('datetime64[ms]')
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+
+def _find(collection, query, projection, batch_size):
+    cursor = collection.find(query, projection, batch_size=batch_size or settings.cursor_batch_size)
+    if is_seeded():
+        # Natural order can change between runs; seeded runs read sources in _id order
+        cursor = cursor.sort("_id", 1)
+    return cursor
+
+
+def load_ids(collection, query, batch_size=None):
+    """Stream the _id of every matching document into an IdArray"""
+    cursor = _find(collection, query, {"_id": 1}, batch_size)
+    return IdArray.from_ids(doc["_id"] for doc in cursor)
+
+
+def load_columns(collection, query, schema, batch_size=None):
+    """Stream the projected fields of every matching document into a ColumnTable
+
+    schema maps field names to "objectid" or "date"; no other fields are
+    fetched from the server.
+    """
+    buffers = {name: bytearray() if kind == "objectid" else array('q') for name, kind in schema.items()}
+    projection = {name: 1 for name in schema}
+    if "_id" not in schema:
+        projection["_id"] = 0
+    cursor = _find(collection, query, projection, batch_size)
+    for doc in cursor:
+        for name, kind in schema.items():
+            if kind == "objectid":
+                # Documents missing a reference keep a zeroed id rather than shifting the column
+                value = doc.get(name)
+                buffers[name] += value.binary if value is not None else bytes(12)
+            else:
+                buffers[name].append(_to_ms(doc.get(name)))
+    columns = {}
+    for name, kind in schema.items():
+        if kind == "objectid":
+            columns[name] = np.frombuffer(bytes(buffers[name]), dtype=OBJECT_ID_DTYPE)
+        else:
+            columns[name] = np.frombuffer(buffers[name], dtype=np.int64)
+    return ColumnTable(columns, dict(schema))
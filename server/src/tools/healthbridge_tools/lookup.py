@@ -0,0 +1,70 @@
+"""Bounded, prefetching lookup cache for referenced documents"""
+from collections import OrderedDict
+
+from .writer import chunked
+
+# Cached marker for ids that do not exist, so repeated misses stay local
+_MISSING = object()
+
+
+class DocumentCache:
+    """LRU cache of projected documents keyed by _id
+
+    prefetch() loads many ids with one projected $in query per chunk, and get()
+    falls back to a single find_one only for ids that were never prefetched or
+    have been evicted.
+    """
+
+    def __init__(self, collection, projection, max_size=100_000):
+        self.collection = collection
+        self.projection = projection
+        self.max_size = max_size
+        self._documents = OrderedDict()
+        self.lookups = 0
+        self.hits = 0
+        self.round_trips = 0
+
+    def _store(self, _id, document):
+        self._documents[_id] = document
+        self._documents.move_to_end(_id)
+        if len(self._documents) > self.max_size:
+            self._documents.popitem(last=False)
+
+    def prefetch(self, ids, chunk_size=10_000):
+        """Load the given ids in as few round trips as possible"""
+        wanted = [_id for _id in dict.fromkeys(ids) if _id not in self._documents]
+        for chunk in chunked(wanted[:self.max_size], chunk_size):
+            self.round_trips += 1
+            found = {doc["_id"]: doc for doc in self.collection.find({"_id": {"$in": chunk}}, self.projection)}
+            for _id in chunk:
+                self._store(_id, found.get(_id, _MISSING))
+
+    def get(self, _id):
+        """Return the cached document for _id, or None if it does not exist"""
+        self.lookups += 1
+        document = self._documents.get(_id)
+        if document is not None:
+            self.hits += 1
+            self._documents.move_to_end(_id)
+        else:
+            self.round_trips += 1
+            document = self.collection.find_one({"_id": _id}, self.projection) or _MISSING
+            self._store(_id, document)
+        return None if document is _MISSING else document
+
+    @property
+    def hit_ratio(self):
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    @property
+    def round_trips_saved(self):
+        return max(self.lookups - self.round_trips, 0)
+
+    def as_dict(self):
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hitRatio": round(self.hit_ratio, 4),
+            "roundTrips": self.round_trips,
+            "roundTripsSaved": self.round_trips_saved,
+        }
@@ -0,0 +1,177 @@
+"""bcrypt password materialization with an on-disk hash cache
+
+The seeders write plain-text passwords and the server only accepts bcrypt
+hashes. Hashing one password at cost 10 takes tens of milliseconds, so
+PasswordHasher avoids doing it more than once per distinct password:
+
+- hashes are kept in a content-addressed SQLite cache keyed by
+  sha256(cost, password), shared by every tool and every run, so the
+  plain-text passwords themselves are never written to disk;
+- distinct passwords missing from the cache are hashed in a process pool.
+
+Every user with the same password gets the same cached hash (and salt), which
+is what fix_passwords always did and is fine for test data.
+"""
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+from .config import settings
+
+DEFAULT_COST = 10
+BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+CACHE_FILE = "bcrypt-cache.sqlite3"
+DEFAULT_CHUNK_SIZE = 10000
+# Keys per SELECT ... IN (...), below SQLite's bound-parameter limit
+_LOOKUP_BATCH = 500
+
+
+def is_hashed(password):
+    """True when password already looks like a bcrypt hash"""
+    return isinstance(password, str) and password.startswith(BCRYPT_PREFIXES)
+
+
+def hash_password(password, cost=DEFAULT_COST):
+    """Hash one password with a fresh salt"""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(cost)).decode('utf-8')
+
+
+def _hash_item(item):
+    password, cost = item
+    return hash_password(password, cost)
+
+
+def cache_key(password, cost):
+    """Content address of a (password, cost) pair in the hash cache"""
+    return hashlib.sha256(f"{cost}\0{password}".encode('utf-8')).digest()
+
+
+class HashCache:
+    """SQLite table mapping cache_key(password, cost) to a bcrypt hash
+
+    Several processes (e.g. --workers shards) may share one cache file; SQLite
+    serialises their writes.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(settings.cache_dir, CACHE_FILE)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._connection = sqlite3.connect(self.path, timeout=60)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS hashes (key BLOB PRIMARY KEY, hash TEXT NOT NULL)")
+
+    def get_many(self, keys):
+        """Return {key: hash} for the keys present in the cache"""
+        found = {}
+        for start in range(0, len(keys), _LOOKUP_BATCH):
+            batch = keys[start:start + _LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            found.update(self._connection.execute(
+                f"SELECT key, hash FROM hashes WHERE key IN ({placeholders})", batch
+            ))
+        return found
+
+    def put_many(self, items):
+        """Store (key, hash) pairs, keeping any hash already cached for a key"""
+        with self._connection:
+            self._connection.executemany("INSERT OR IGNORE INTO hashes (key, hash) VALUES (?, ?)", items)
+
+    def close(self):
+        self._connection.close()
+
+
+class PasswordHasher:
+    """Turn plain-text passwords into bcrypt hashes through the cache and a process pool
+
+    workers=0 hashes in the calling process, which is what --workers shards use
+    since they already run one per core.
+    """
+
+    def __init__(self, cost=DEFAULT_COST, workers=None, cache_path=None, use_cache=True):
+        self.cost = cost
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.cache = HashCache(cache_path) if use_cache else None
+        self.cache_hits = 0
+        self.hashed = 0
+        self._pool = None
+
+    def _hash_missing(self, passwords):
+        items = [(password, self.cost) for password in passwords]
+        if self.workers <= 1 or len(items) < 2:
+            return [_hash_item(item) for item in items]
+        if self._pool is None:
+            # spawn, not fork: the calling process has driver and writer threads running
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        chunksize = max(1, min(256, len(items) // (self.workers * 4)))
+        return list(self._pool.map(_hash_item, items, chunksize=chunksize))
+
+    def hash_many(self, passwords):
+        """Return {password: hash} for every distinct password in passwords"""
+        distinct = list(dict.fromkeys(passwords))
+        keys = [cache_key(password, self.cost) for password in distinct]
+        cached = self.cache.get_many(keys) if self.cache else {}
+        result = {}
+        missing = []
+        for password, key in zip(distinct, keys):
+            if key in cached:
+                result[password] = cached[key]
+            else:
+                missing.append((password, key))
+        self.cache_hits += len(cached)
+        if missing:
+            hashes = self._hash_missing([password for password, _ in missing])
+            self.hashed += len(hashes)
+            result.update(zip((password for password, _ in missing), hashes))
+            if self.cache:
+                self.cache.put_many([(key, hashed) for (_, key), hashed in zip(missing, hashes)])
+        return result
+
+    def materialize(self, documents, field="password", chunk_size=None):
+        """Yield documents with their plain-text field replaced by its bcrypt hash
+
+        Documents are handled a chunk at a time so each chunk's distinct
+        passwords are looked up and hashed together.
+        """
+        chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+        chunk = []
+        for document in documents:
+            chunk.append(document)
+            if len(chunk) >= chunk_size:
+                yield from self._materialize_chunk(chunk, field)
+                chunk = []
+        if chunk:
+            yield from self._materialize_chunk(chunk, field)
+
+    def _materialize_chunk(self, chunk, field):
+        plain = [document[field] for document in chunk if field in document and not is_hashed(document[field])]
+        hashes = self.hash_many(plain) if plain else {}
+        for document in chunk:
+            if document.get(field) in hashes:
+                document[field] = hashes[document[field]]
+        return chunk
+
+    def as_dict(self):
+        return {"cost": self.cost, "hashed": self.hashed, "cacheHits": self.cache_hits}
+
+    def absorb(self, counts):
+        """Add another hasher's as_dict() counts (e.g. from a --workers shard)"""
+        if counts:
+            self.hashed += counts["hashed"]
+            self.cache_hits += counts["cacheHits"]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
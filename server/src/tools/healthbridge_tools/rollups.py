@@ -0,0 +1,312 @@
+"""Incremental daily rollups of the admin dashboard statistics in the dailystats collection
+
+statistics.controller.ts counts users, appointments, diagnoses and
+prescriptions in the raw collections on every request. DailyRollup keeps
+those counts per day in dailystats instead, so the dashboard reads a few
+small documents per day whatever the size of the data. There is one document
+per
+
+- day x role (metric "users"),
+- day x status x doctor (metric "appointments", with the doctor's department),
+- day x diagnosis (metric "diagnoses"),
+- day x prescribed medication (metric "prescriptions"),
+
+where day is the UTC day of the source document's createdAt. createdAt
+never changes, so a status change only touches the day the appointment was
+created on. A day is always rebuilt whole, by an aggregation over its source
+documents, so rebuilding a day twice is harmless:
+
+- update() finds the source documents written since the watermark (by
+  updatedAt, or by createdAt where there is no updatedAt), rebuilds the days
+  they were created on and moves the watermark on. The watermark stays lag
+  seconds behind the clock so writes still in flight are picked up next time;
+- backfill() rebuilds every day in a date range, in chunks of chunk_days
+  rebuilt in parallel. The seeders backdate createdAt and updatedAt, so
+  seeded data needs a backfill.
+
+update() does not see deleted source documents; a backfill of their days
+removes them. Appointment rows carry the department the doctor had when
+their day was last rebuilt. Only one rollup job should run at a time.
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import IndexModel, ReplaceOne
+
+from .analytics import ROLES, STATUSES
+from .config import settings
+from .seedruns import ROLLUP_COLLECTION, ROLLUP_WATERMARK_ID
+from .writer import chunked
+
+DAY_MS = 24 * 60 * 60 * 1000
+DEFAULT_LAG = 60
+DEFAULT_CHUNK_DAYS = 30
+
+# Each metric's source collection, the fields it is counted by, and the array it unwinds first
+METRICS = {
+    "users": {"source": "users", "keys": {"role": "$role"}, "unwind": None},
+    "appointments": {"source": "appointments", "keys": {"status": "$status", "doctor": "$doctor"}, "unwind": None},
+    "diagnoses": {"source": "patienthistories", "keys": {"diagnosis": "$diagnosis"}, "unwind": None},
+    "prescriptions": {"source": "patienthistories", "keys": {"medication": "$prescriptions.medication"},
+                      "unwind": "$prescriptions"},
+}
+SOURCES = sorted({metric["source"] for metric in METRICS.values()})
+
+ROLLUP_INDEX = IndexModel([("metric", 1), ("day", 1)], name="metric_1_day_1")
+# update() finds changed documents by these; without them every run scans the source collections
+SOURCE_INDEXES = [IndexModel([("updatedAt", 1)], name="updatedAt_1"),
+                  IndexModel([("createdAt", 1)], name="createdAt_1")]
+
+# The UTC day a document was created on, as a date at midnight
+_DAY = {"$subtract": ["$createdAt", {"$mod": [{"$toLong": "$createdAt"}, DAY_MS]}]}
+
+
+def day_of(value):
+    """Midnight (UTC) of the day value falls on"""
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _ranges(days):
+    """[start, end) ranges covering the sorted days, one per run of consecutive days"""
+    ranges = []
+    for day in days:
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + timedelta(days=1)
+        else:
+            ranges.append([day, day + timedelta(days=1)])
+    return [tuple(bounds) for bounds in ranges]
+
+
+class RollupStats:
+    """What one rollup run rebuilt"""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.days = 0
+        self.first_day = None
+        self.last_day = None
+        self.rows = 0
+        self.removed = 0
+        self.watermark = None
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    def as_dict(self):
+        return {
+            "days": self.days,
+            "firstDay": self.first_day,
+            "lastDay": self.last_day,
+            "rows": self.rows,
+            "removed": self.removed,
+            "watermark": self.watermark,
+            "elapsedSeconds": round(self.elapsed, 3),
+        }
+
+
+class DailyRollup:
+    """Rebuild the dailystats rows of db, incrementally or over a date range
+
+    workers day ranges are rebuilt at once. dry_run works out what would
+    be rebuilt without writing.
+    """
+
+    def __init__(self, db, workers=4, lag=DEFAULT_LAG, chunk_days=DEFAULT_CHUNK_DAYS, progress=True, dry_run=False):
+        self.db = db
+        self.rollups = db[ROLLUP_COLLECTION]
+        self.workers = workers
+        self.lag = timedelta(seconds=lag)
+        self.chunk_days = chunk_days
+        self.progress = progress
+        self.dry_run = dry_run
+        self._departments = None
+
+    def ensure_indexes(self):
+        """Create the dailystats index and the source indexes update() queries by"""
+        self.rollups.create_indexes([ROLLUP_INDEX])
+        for source in SOURCES:
+            self.db[source].create_indexes(SOURCE_INDEXES)
+
+    def watermark(self):
+        """The time the last update() or full backfill covered writes up to, or None"""
+        state = self.rollups.find_one({"_id": ROLLUP_WATERMARK_ID})
+        return state["at"] if state else None
+
+    def _set_watermark(self, at):
+        self.rollups.replace_one({"_id": ROLLUP_WATERMARK_ID},
+                                 {**ROLLUP_WATERMARK_ID, "at": at, "rolledUpAt": datetime.utcnow()}, upsert=True)
+
+    def departments(self):
+        """{doctor _id: department} for every doctor with a department, loaded once per run"""
+        if self._departments is None:
+            cursor = self.db.users.find({"role": "doctor", "department": {"$exists": True, "$ne": ""}},
+                                        {"department": 1}, batch_size=settings.cursor_batch_size)
+            self._departments = {doctor["_id"]: doctor["department"] for doctor in cursor}
+        return self._departments
+
+    def _pipeline(self, metric, start, end):
+        spec = METRICS[metric]
+        pipeline = [{"$match": {"createdAt": {"$gte": start, "$lt": end}}}]
+        if spec["unwind"]:
+            pipeline.append({"$unwind": spec["unwind"]})
+        pipeline.append({"$group": {"_id": {"day": _DAY, **spec["keys"]}, "count": {"$sum": 1}}})
+        return pipeline
+
+    def _row(self, metric, group, count, rollup_id, now):
+        keys = {name: group.get(name) for name in METRICS[metric]["keys"]}
+        row = {"_id": {"metric": metric, "day": group["day"], **keys}, "metric": metric, "day": group["day"], **keys,
+               "count": count, "rollupId": rollup_id, "rolledUpAt": now}
+        if metric == "appointments":
+            row["department"] = self.departments().get(keys["doctor"])
+        return row
+
+    def rebuild(self, metric, start, end, rollup_id):
+        """Replace metric's rows for the days in [start, end) with fresh counts; return (rows, removed)"""
+        source = self.db[METRICS[metric]["source"]]
+        now = datetime.utcnow()
+        groups = source.aggregate(self._pipeline(metric, start, end), allowDiskUse=True)
+        rows = (self._row(metric, group["_id"], group["count"], rollup_id, now) for group in groups)
+        written = 0
+        for batch in chunked(rows, settings.batch_size):
+            self.rollups.bulk_write([ReplaceOne({"_id": row["_id"]}, row, upsert=True) for row in batch],
+                                    ordered=False)
+            written += len(batch)
+        # Rows of these days this rebuild did not write count documents that are gone
+        removed = self.rollups.delete_many({"metric": metric, "day": {"$gte": start, "$lt": end},
+                                            "rollupId": {"$ne": rollup_id}}).deleted_count
+        return written, removed
+
+    def _rebuild_all(self, tasks, stats):
+        """Rebuild every (metric, start, end) task, workers at a time"""
+        if self.dry_run or not tasks:
+            return
+        rollup_id = ObjectId()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.rebuild, metric, start, end, rollup_id) for metric, start, end in tasks]
+            for done, future in enumerate(futures, 1):
+                written, removed = future.result()
+                stats.rows += written
+                stats.removed += removed
+                if self.progress:
+                    sys.stdout.write(f"\r  Rebuilt {done} of {len(tasks)} day ranges ({stats.rows:,} rows)")
+                    sys.stdout.flush()
+        if self.progress:
+            sys.stdout.write("\n")
+
+    def changed_days(self, source, since, until):
+        """The days on which the documents of source written in (since, until] were created"""
+        written = {"$gt": since, "$lte": until}
+        pipeline = [
+            {"$match": {"$or": [{"updatedAt": written}, {"updatedAt": {"$exists": False}, "createdAt": written}]}},
+            {"$group": {"_id": _DAY}},
+        ]
+        return sorted(group["_id"] for group in self.db[source].aggregate(pipeline) if group["_id"] is not None)
+
+    def update(self):
+        """Rebuild the days of the documents written since the watermark and move it on"""
+        stats = RollupStats(self.dry_run)
+        since = self.watermark()
+        if since is None:
+            raise ValueError(f"{ROLLUP_COLLECTION} has no watermark yet; run a full backfill first")
+        until = datetime.utcnow() - self.lag
+        if not self.dry_run:
+            self.ensure_indexes()
+        tasks, days = [], set()
+        for source in SOURCES:
+            changed = self.changed_days(source, since, until)
+            days.update(changed)
+            tasks.extend((metric, start, end) for start, end in _ranges(changed)
+                         for metric, spec in METRICS.items() if spec["source"] == source)
+        stats.days = len(days)
+        stats.first_day = min(days, default=None)
+        stats.last_day = max(days, default=None)
+        self._rebuild_all(tasks, stats)
+        stats.watermark = max(since, until)
+        if not self.dry_run:
+            self._set_watermark(stats.watermark)
+        stats.elapsed = time.monotonic() - stats.started
+        return stats
+
+    def first_day(self):
+        """The earliest createdAt day in the source collections, or None when they are empty"""
+        firsts = [document["createdAt"] for source in SOURCES
+                  for document in self.db[source].find({"createdAt": {"$type": "date"}}, {"createdAt": 1})
+                  .sort("createdAt", 1).limit(1)]
+        return day_of(min(firsts)) if firsts else None
+
+    def backfill(self, start=None, end=None):
+        """Rebuild every day from start to end (default: all of them) in parallel chunks
+
+        A full backfill also sets the watermark to when it started, less the lag.
+        """
+        stats = RollupStats(self.dry_run)
+        until = datetime.utcnow() - self.lag
+        full = start is None and end is None
+        if not self.dry_run:
+            self.ensure_indexes()
+        start = day_of(start) if start is not None else self.first_day()
+        end = day_of(end) + timedelta(days=1) if end is not None else day_of(datetime.utcnow()) + timedelta(days=1)
+        if start is not None and start < end:
+            stats.days = (end - start).days
+            stats.first_day, stats.last_day = start, end - timedelta(days=1)
+        tasks = []
+        while start is not None and start < end:
+            chunk_end = min(start + timedelta(days=self.chunk_days), end)
+            tasks.extend((metric, start, chunk_end) for metric in METRICS)
+            start = chunk_end
+        self._rebuild_all(tasks, stats)
+        if full:
+            stats.watermark = until
+            if not self.dry_run:
+                self._set_watermark(until)
+        stats.elapsed = time.monotonic() - stats.started
+        return stats
+
+
+def rollup_summary(db, start=None, end=None, now=None, limit=10):
+    """The dashboard's summary counts and top lists read from dailystats
+
+    start and end select createdAt days like the controller's startDate and
+    endDate. recentRegistrations counts whole days, from the day a week
+    before now.
+    """
+    now = now or datetime.utcnow()
+    days = {}
+    if start is not None:
+        days["$gte"] = day_of(start)
+    if end is not None:
+        days["$lte"] = day_of(end)
+    match = {"metric": {"$in": list(METRICS)}}
+    if days:
+        match["day"] = days
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": {"metric": "$metric", "role": "$role", "status": "$status", "diagnosis": "$diagnosis",
+                            "medication": "$medication"}, "count": {"$sum": "$count"}}},
+    ]
+    totals = {metric: {} for metric in METRICS}
+    for group in db[ROLLUP_COLLECTION].aggregate(pipeline):
+        key = group["_id"]
+        field = {"users": "role", "appointments": "status", "diagnoses": "diagnosis",
+                 "prescriptions": "medication"}[key["metric"]]
+        totals[key["metric"]][key.get(field)] = group["count"]
+    recent = db[ROLLUP_COLLECTION].aggregate([
+        {"$match": {"metric": "users", "day": {"$gte": day_of(now - timedelta(days=7))}}},
+        {"$group": {"_id": None, "count": {"$sum": "$count"}}},
+    ])
+
+    def top(counts):
+        return sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))[:limit]
+
+    return {
+        "totalUsers": sum(totals["users"].values()),
+        "usersByRole": {role: totals["users"].get(role, 0) for role in ROLES},
+        "totalAppointments": sum(totals["appointments"].values()),
+        "appointmentsByStatus": {status: totals["appointments"].get(status, 0) for status in STATUSES},
+        "recentRegistrations": next((group["count"] for group in recent), 0),
+        "commonDiagnoses": [{"_id": diagnosis, "count": count} for diagnosis, count in top(totals["diagnoses"])],
+        "commonMedications": [{"medication": medication, "count": count}
+                              for medication, count in top(totals["prescriptions"])],
+    }
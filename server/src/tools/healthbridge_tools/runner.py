@@ -0,0 +1,69 @@
+"""Run several tools in one process so they share the pooled client"""
+import importlib
+import os
+import sys
+
+from .db import close_client
+
+TOOLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tool module names in the order they are normally run
+TOOLS = [
+    "add_medications",
+    "add_patients",
+    "add_international_patients",
+    "add_nurses",
+    "add_international_doctors",
+    "add_appointments",
+    "add_patient_records",
+    "add_messages",
+    "add_notifications",
+    "add_audit_logs",
+    "simulate_hospital",
+    "fix_passwords",
+    "archive_audit_logs",
+    "snapshot_database",
+    "reset_database",
+    "export_statistics",
+    "rollup_daily_stats",
+    "cleanup_test_data",
+]
+
+
+def load_tool(name):
+    """Import a tool module by name without running it"""
+    if name.endswith(".py"):
+        name = name[:-3]
+    if name not in TOOLS:
+        raise ValueError(f"Unknown tool '{name}'. Available tools: {', '.join(TOOLS)}")
+    if TOOLS_DIR not in sys.path:
+        sys.path.insert(0, TOOLS_DIR)
+    return importlib.import_module(name)
+
+
+def split_invocations(argv):
+    """Split a command line into (tool, options) pairs at each tool name
+
+    For example `add_patients --count 100 --yes add_appointments --count 500`
+    runs add_patients with `--count 100 --yes`, then add_appointments with
+    `--count 500`.
+    """
+    invocations = []
+    for arg in argv:
+        if arg.removesuffix(".py") in TOOLS:
+            invocations.append((arg.removesuffix(".py"), []))
+        elif not invocations:
+            raise ValueError(f"Expected a tool name before '{arg}'. Available tools: {', '.join(TOOLS)}")
+        else:
+            invocations[-1][1].append(arg)
+    return invocations
+
+
+def run_tools(invocations):
+    """Run each (tool, options) pair's main() in order, reusing one MongoClient"""
+    try:
+        for name, options in invocations:
+            print(f"\n=== Running {name} ===", file=sys.stderr)
+            load_tool(name).main(options)
+    finally:
+        close_client()
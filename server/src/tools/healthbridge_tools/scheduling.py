@@ -0,0 +1,130 @@
+"""Per-doctor, per-day slot bitmaps for overlap-free appointment scheduling"""
+import random
+
+from .checkpoints import preserve
+from .config import settings
+
+# Business hours: appointments start on a quarter hour from 8:00 to 16:45
+# and last 30, 45 or 60 minutes, so the last one can end at 17:45
+SLOT_MINUTES = 15
+DAY_START_MINUTES = 8 * 60
+START_SLOTS = 36
+SLOTS_PER_DAY = 39
+DURATION_SLOTS = (2, 3, 4)
+FULL_DAY = (1 << SLOTS_PER_DAY) - 1
+
+
+def slot_to_time(slot):
+    """Convert a slot index to an HH:MM string"""
+    minutes = DAY_START_MINUTES + slot * SLOT_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _minutes_into_day(value):
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes) - DAY_START_MINUTES
+
+
+def time_to_slot(value):
+    """Convert an HH:MM string to the slot index containing it"""
+    return _minutes_into_day(value) // SLOT_MINUTES
+
+
+class DoctorSchedule:
+    """Tracks booked quarter-hour slots as one bitmap per doctor per day
+
+    A day is a 39-bit integer, so checking and claiming a slot are a handful
+    of bit operations regardless of how busy the doctor already is, and
+    bookings can never overlap.
+    """
+
+    def __init__(self):
+        self._days = {}
+        self.booked = 0
+
+    def _key(self, doctor_id, day):
+        return doctor_id, day.toordinal()
+
+    def free_starts(self, doctor_id, day, length):
+        """Bitmask of slots where an appointment of length slots fits"""
+        occupied = self._days.get(self._key(doctor_id, day), 0)
+        blocked = 0
+        for offset in range(length):
+            blocked |= occupied >> offset
+        # A start is only valid if the whole appointment ends within business hours
+        valid = (1 << min(START_SLOTS, SLOTS_PER_DAY - length + 1)) - 1
+        return ~blocked & valid
+
+    def reserve(self, doctor_id, day, start_slot, length):
+        """Mark slots as booked, returning False if any of them is taken"""
+        key = self._key(doctor_id, day)
+        mask = ((1 << length) - 1) << start_slot
+        occupied = self._days.get(key, 0)
+        if occupied & mask:
+            return False
+        self._days[key] = occupied | mask
+        self.booked += 1
+        return True
+
+    def mark_existing(self, doctor_id, day, start_time, end_time):
+        """Block the slots covered by an appointment that is already in the database"""
+        start = max(time_to_slot(start_time), 0)
+        # Round the end up so a partly covered slot counts as booked
+        end = min(-(-_minutes_into_day(end_time) // SLOT_MINUTES), SLOTS_PER_DAY)
+        if end <= start:
+            return
+        key = self._key(doctor_id, day)
+        self._days[key] = self._days.get(key, 0) | (((1 << (end - start)) - 1) << start)
+
+    def allocate(self, doctor_id, day, length, rng=random):
+        """Book a random free start for the requested length, trying shorter lengths if it does not fit
+
+        Returns (start_slot, length) or None when the day is full.
+        """
+        for candidate in [length] + [d for d in sorted(DURATION_SLOTS, reverse=True) if d < length]:
+            starts = self.free_starts(doctor_id, day, candidate)
+            if starts:
+                start_slot = _nth_set_bit(starts, rng.randrange(bin(starts).count("1")))
+                self.reserve(doctor_id, day, start_slot, candidate)
+                return start_slot, candidate
+        return None
+
+    def is_full(self, doctor_id, day):
+        return self.free_starts(doctor_id, day, min(DURATION_SLOTS)) == 0
+
+
+def _nth_set_bit(mask, n):
+    """Index of the n-th (0-based) set bit of mask"""
+    for _ in range(n):
+        mask &= mask - 1
+    return (mask & -mask).bit_length() - 1
+
+
+def preload_schedule(schedule, appointments_collection, start, end, batch_size=None):
+    """Block slots already booked in the database between start and end
+
+    A resumed run blocks the slots its interrupted run found booked, not the
+    ones that run booked itself.
+    """
+    def load():
+        existing = DoctorSchedule()
+        cursor = appointments_collection.find(
+            {"date": {"$gte": start, "$lte": end}, "status": {"$ne": "cancelled"}},
+            {"_id": 0, "doctor": 1, "date": 1, "startTime": 1, "endTime": 1},
+            batch_size=batch_size or settings.cursor_batch_size
+        )
+        count = 0
+        for appointment in cursor:
+            try:
+                existing.mark_existing(appointment["doctor"], appointment["date"],
+                                       appointment["startTime"], appointment["endTime"])
+                count += 1
+            except (KeyError, ValueError, AttributeError):
+                # Skip malformed legacy appointments rather than failing the whole run
+                continue
+        return existing._days, count
+
+    days, count = preserve("bookings", load)
+    for key, occupied in days.items():
+        schedule._days[key] = schedule._days.get(key, 0) | occupied
+    return count
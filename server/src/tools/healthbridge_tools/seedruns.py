@@ -0,0 +1,115 @@
+"""Seed-run tagging: which run wrote which document
+
+Every document a seeder writes carries a seedRunId field naming the run, and
+the seedruns collection keeps one manifest document per run (tools, seed,
+clock, documents written per collection). Each tagged collection gets a
+partial { seedRunId: 1, _id: 1 } index, so the documents of one run can be
+found, and deleted in _id batches, without touching real data or other runs.
+
+All tools invoked in one process share a run unless --run-id names another,
+so `python -m healthbridge_tools add_patients ... add_appointments ...` is
+one run. A seeded run gets an id derived from --seed and --now, which keeps
+its fingerprint reproducible.
+"""
+import os
+import struct
+from datetime import datetime
+
+from bson import encode
+from bson.raw_bson import RawBSONDocument
+from pymongo import IndexModel
+
+from .repro import anchored_now
+
+RUN_FIELD = "seedRunId"
+MANIFEST_COLLECTION = "seedruns"
+# Written by the rollup job in healthbridge_tools.rollups, with its watermark under this _id
+ROLLUP_COLLECTION = "dailystats"
+ROLLUP_WATERMARK_ID = {"metric": "watermark"}
+
+# Collections a seed run writes, in the order a run is deleted: documents that
+# reference users go before the users
+RUN_COLLECTIONS = ["notifications", "messages", "patienthistories", "appointments", "medications", "auditlogs",
+                   "users"]
+
+RUN_INDEX = IndexModel([(RUN_FIELD, 1), ("_id", 1)], name="seedRunId_1__id_1",
+                       partialFilterExpression={RUN_FIELD: {"$exists": True}})
+
+_state = {"run": None}
+
+
+def new_run_id(seed=None):
+    """A fresh run id; with a seed it depends only on the seed and the anchored clock"""
+    now = anchored_now()
+    if seed is not None:
+        return f"seed{seed}-{now:%Y%m%dT%H%M%S}"
+    return f"{now:%Y%m%dT%H%M%S}-{os.urandom(3).hex()}"
+
+
+class SeedRun:
+    """One tool's share of a seed run: tags documents and keeps the manifest up to date"""
+
+    def __init__(self, run_id, tool, seed=None, now=None):
+        self.run_id = run_id
+        self.tool = tool
+        self.seed = seed
+        self.now = now
+        # The tag as BSON elements, appended to pre-encoded documents as-is
+        self._element = encode({RUN_FIELD: run_id})[4:-1]
+
+    def tag(self, document):
+        """Add seedRunId to a dict or RawBSONDocument and return it"""
+        if isinstance(document, RawBSONDocument):
+            body = document.raw[4:-1] + self._element
+            return RawBSONDocument(struct.pack("<i", len(body) + 5) + body + b"\x00")
+        document[RUN_FIELD] = self.run_id
+        return document
+
+    def open(self, collection):
+        """Index collection for run lookups and register the run before anything is written"""
+        collection.create_indexes([RUN_INDEX])
+        now = datetime.now()
+        collection.database[MANIFEST_COLLECTION].update_one(
+            {"_id": self.run_id},
+            {
+                "$setOnInsert": {"createdAt": now, "seed": self.seed, "now": self.now},
+                "$set": {"updatedAt": now},
+                "$addToSet": {"tools": self.tool, "collections": collection.name},
+            },
+            upsert=True,
+        )
+
+    def record(self, collection, stats):
+        """Add a finished write's document count to the manifest
+
+        A resumed write also counts what its interrupted run wrote, which never
+        got this far.
+        """
+        collection.database[MANIFEST_COLLECTION].update_one(
+            {"_id": self.run_id},
+            {"$set": {"updatedAt": datetime.now()},
+             "$inc": {f"counts.{collection.name}": stats.inserted + stats.resumed}},
+        )
+
+
+def begin(tool, run_id=None, seed=None, now=None):
+    """Start tool's part of the process's seed run and return its SeedRun
+
+    run_id names the run explicitly; otherwise the process's current run is
+    continued, or a new one is started.
+    """
+    if run_id is None:
+        current = _state["run"]
+        run_id = current.run_id if current is not None else new_run_id(seed)
+    _state["run"] = SeedRun(run_id, tool, seed=seed, now=now)
+    return _state["run"]
+
+
+def current_run():
+    """The SeedRun begun last in this process, or None"""
+    return _state["run"]
+
+
+def list_runs(db):
+    """Manifest documents of every recorded run, newest first"""
+    return list(db[MANIFEST_COLLECTION].find().sort("createdAt", -1))
@@ -0,0 +1,257 @@
+"""Process-pool sharding for the seeders
+
+With --workers N a seeder splits --count into N shards and runs each one in
+its own spawned process with its own MongoClient and its own random seed,
+derived from the master --seed. The parent only resolves shared state (the
+admin id, source arrays), hands every shard a plain Shard description, and
+merges the WriteStats that come back.
+
+Unique keys stay unique across shards because every shard owns a disjoint
+slice of the key space (see KeySpace): no two shards can produce the same
+email or medical record number, whatever their random draws.
+"""
+import multiprocessing
+import random
+import sys
+import time
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import accumulate
+
+import numpy as np
+
+from .checkpoints import current_checkpoint
+from .config import settings
+from .db import close_client
+from .passwords import PasswordHasher
+from .repro import Fingerprint, anchor, anchor_options
+from .seedruns import current_run
+from .writer import WriteStats
+
+
+class KeySpace:
+    """The (last name, email domain) pairs and MRN range one shard may use
+
+    Every generated email ends in `<last name>[digits]@<domain>`, so two
+    emails with different pairs can only be equal if one last name is a
+    suffix of another. partition_keys() keeps such names in the same shard,
+    which makes the shards' email sets disjoint. MRNs come from a contiguous
+    block of the MRN range, so those are disjoint too.
+    """
+
+    def __init__(self, pairs, weights, mrn_range):
+        self.pairs = pairs
+        self.cum_weights = list(accumulate(weights))
+        self.mass = self.cum_weights[-1] if self.cum_weights else 0.0
+        self.mrn_range = mrn_range
+
+    def draw(self, rng=random):
+        """Return one (last name, domain) pair, weighted like the unsharded draw"""
+        return self.pairs[bisect_right(self.cum_weights, rng.random() * self.mass)]
+
+    def draw_column(self, columns):
+        """Return (last names, domains) lists for one chunk of columnar draws"""
+        positions = np.searchsorted(self.cum_weights, columns.rng.random(columns.size) * self.mass, side="right")
+        pairs = [self.pairs[i] for i in positions.tolist()]
+        return [last for last, _ in pairs], [domain for _, domain in pairs]
+
+
+def _suffix_families(last_names):
+    """Group last names so that no name is a suffix of a name in another group"""
+    lowered = sorted({name.lower() for name in last_names}, key=len)
+    family = {name: name for name in lowered}
+    for i, short in enumerate(lowered):
+        for long in lowered[i + 1:]:
+            if long.endswith(short):
+                # Merge the two families under one root
+                root_long, root_short = family[long], family[short]
+                for name, root in family.items():
+                    if root == root_long:
+                        family[name] = root_short
+    return {name: family[name.lower()] for name in last_names}
+
+
+def partition_keys(last_names, domains, shards, last_name_weights=None, mrn_range=None):
+    """Split the (last name, domain) space and the MRN range into shards disjoint key spaces
+
+    last_name_weights gives each name's probability when names are not drawn
+    uniformly (e.g. the 70/30 Turkish split for doctors). Pairs are handed out
+    largest-first to the lightest shard, so shards carry nearly equal weight;
+    run_sharded() then sizes each shard's count by its weight, which keeps the
+    overall distribution the same as an unsharded run.
+    """
+    if last_name_weights is None:
+        last_name_weights = {}
+        for name in last_names:
+            last_name_weights[name] = last_name_weights.get(name, 0) + 1 / len(last_names)
+    families = _suffix_families(last_name_weights)
+
+    # Each (family, domain) cell must stay in one shard
+    cells = {}
+    for name, weight in last_name_weights.items():
+        for domain in domains:
+            cells.setdefault((families[name], domain), []).append(((name, domain), weight / len(domains)))
+    loads = [0.0] * shards
+    owned = [[] for _ in range(shards)]
+    for cell in sorted(cells.values(), key=lambda pairs: -sum(weight for _, weight in pairs)):
+        lightest = loads.index(min(loads))
+        owned[lightest].extend(cell)
+        loads[lightest] += sum(weight for _, weight in cell)
+    if not all(owned):
+        raise ValueError(f"Cannot split {len(cells)} email key cells across {shards} workers; use fewer workers")
+
+    # MRN blocks proportional to each shard's share of the documents
+    low, high = mrn_range or (0, 0)
+    bounds = [low + round((high - low + 1) * share) for share in accumulate([0.0] + [load / sum(loads) for load in loads])]
+    return [
+        KeySpace([pair for pair, _ in pairs], [weight for _, weight in pairs], (bounds[i], bounds[i + 1] - 1))
+        for i, pairs in enumerate(owned)
+    ]
+
+
+def split_count(count, weights):
+    """Split count into integers proportional to weights (largest remainder)"""
+    total = sum(weights)
+    exact = [count * weight / total for weight in weights]
+    counts = [int(value) for value in exact]
+    by_remainder = sorted(range(len(weights)), key=lambda i: counts[i] - exact[i])
+    for i in by_remainder[:count - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def shard_seeds(seed, shards):
+    """Independent per-shard seeds derived from the master seed (fresh entropy when seed is None)"""
+    children = np.random.SeedSequence(seed).spawn(shards)
+    return [int(child.generate_state(1, dtype=np.uint64)[0]) for child in children]
+
+
+class Shard:
+    """Everything a worker process needs to generate and insert its part of a run"""
+
+    def __init__(self, index, shards, count, seed, keys=None, sample=0, seeded=False, anchor=None, **options):
+        self.index = index
+        self.shards = shards
+        self.count = count
+        self.seed = seed
+        self.seeded = seeded
+        self.anchor = anchor or {}
+        self.keys = keys
+        self.sample = sample
+        self.options = options
+
+    def seed_random(self):
+        """Seed the random module for this shard and return a matching NumPy Generator
+
+        When the run has a master --seed, ObjectIds and the clock are anchored
+        too, with the shard's own seed so its ObjectIds differ from other shards'.
+        """
+        random.seed(self.seed)
+        anchor(self.seed if self.seeded else None, **self.anchor)
+        return np.random.default_rng(self.seed)
+
+    def writer_options(self):
+        """bulk_insert keyword arguments; progress lines come from the parent instead"""
+        checkpoint = self.options.get("checkpoint")
+        return {
+            "batch_size": self.options.get("batch_size"),
+            "max_in_flight": self.options.get("max_in_flight"),
+            "dry_run": self.options.get("dry_run", False),
+            "progress": False,
+            "fingerprint": self.seeded,
+            "run": self.options.get("run"),
+            "checkpoint": checkpoint.for_shard(self.index) if checkpoint else None,
+        }
+
+    def password_hasher(self):
+        """A PasswordHasher for --hash-passwords, hashing in this process, or None
+
+        Shards already run one per core, so they do not start a hashing pool.
+        """
+        options = self.options.get("passwords")
+        if options is None:
+            return None
+        return PasswordHasher(**dict(options, workers=0))
+
+    def result(self, stats, sample=(), hasher=None, **extra):
+        """Picklable summary of this shard's WriteStats for run_sharded()"""
+        # Write errors carry the rejected document; only the message is needed
+        errors = [{"index": e.get("index"), "code": e.get("code"), "errmsg": e.get("errmsg")} for e in stats.errors]
+        if hasher is not None:
+            extra["passwords"] = hasher.as_dict()
+            hasher.close()
+        return dict(stats.as_dict(), errors=errors, sample=list(sample), **extra)
+
+
+def _init_worker(mongo_uri, db_name, quiet):
+    settings.configure(mongo_uri=mongo_uri, db_name=db_name)
+    if quiet:
+        # --json: keep the parent's stdout clean for the summary document
+        sys.stdout = sys.stderr
+
+
+def _run_shard(worker, shard):
+    try:
+        return worker(shard)
+    finally:
+        close_client()
+
+
+def merge_stats(results, dry_run, elapsed):
+    """Combine the per-shard WriteStats dicts into one WriteStats for the whole run
+
+    results must be in shard order: the run's fingerprint hashes the shard
+    fingerprints in that order.
+    """
+    stats = WriteStats(dry_run=dry_run)
+    for result in results:
+        stats.inserted += result["inserted"]
+        stats.failed += result["failed"]
+        stats.batches += result["batches"]
+        stats.write_wait += result.get("writeWaitSeconds", 0.0)
+        stats.resumed += result.get("resumed", 0)
+        stats.retries += result.get("retries", 0)
+        stats.rejected_files.extend(result.get("rejectedFiles", []))
+        stats.errors.extend(result.get("errors", [])[:10 - len(stats.errors)])
+    stats.elapsed = elapsed
+    if results and all(result.get("fingerprint") for result in results):
+        stats.fingerprint = Fingerprint.combine(result["fingerprint"] for result in results)
+    return stats
+
+
+def run_sharded(args, worker, keys=None, weights=None, **options):
+    """Run worker(shard) for args.workers shards of args.count in a process pool
+
+    worker must be a module-level function returning a dict with the WriteStats
+    fields plus optional "errors" and "sample" (documents to preview). Returns
+    (merged WriteStats, preview sample from the first shards, per-shard results).
+    """
+    workers = args.workers
+    if keys is not None:
+        weights = [space.mass for space in keys]
+    counts = split_count(args.count, weights or [1] * workers)
+    seeds = shard_seeds(args.seed, workers)
+    shards = [
+        Shard(i, workers, counts[i], seeds[i], keys=keys[i] if keys else None, sample=20 if i == 0 else 0,
+              seeded=args.seed is not None, anchor=anchor_options(), batch_size=args.batch_size,
+              max_in_flight=args.max_in_flight, dry_run=args.dry_run, run=current_run(),
+              checkpoint=current_checkpoint(), **options)
+        for i in range(workers)
+    ]
+
+    print(f"Splitting {args.count:,} documents across {workers} worker processes...")
+    started = time.monotonic()
+    results = [None] * workers
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(settings.mongo_uri, settings.db_name, args.json)) as pool:
+        futures = {pool.submit(_run_shard, worker, shard): shard for shard in shards}
+        for future in as_completed(futures):
+            shard = futures[future]
+            result = results[shard.index] = future.result()
+            print(f"  shard {shard.index + 1}/{workers}: {result['inserted']:,} of {shard.count:,} "
+                  f"{'generated' if args.dry_run else 'inserted'}, {result['failed']:,} failed "
+                  f"({result['docsPerSec']:,.0f} docs/sec)")
+    stats = merge_stats(results, args.dry_run, time.monotonic() - started)
+    sample = [document for result in results for document in result.get("sample", [])][:20]
+    return stats, sample, results
@@ -0,0 +1,339 @@
+"""Database snapshots: framed, compressed raw BSON files plus collection and index definitions
+
+Re-running every seeder to get a benchmark dataset back takes far longer
+than the benchmark. save_snapshot() copies the collections to a directory
+once, and restore_snapshot() puts them back:
+
+- every collection goes to <name>.bsonz, a sequence of frames. A frame is up
+  to frame_documents documents (at most FRAME_BYTES of BSON) exactly as the
+  server sent them, zlib-compressed, behind a 12-byte header: stored size,
+  BSON size and document count as little-endian uint32s;
+- manifest.json, written last, lists every collection with its document
+  count, frame count, creation options and list_indexes() output;
+- restore memory-maps each file and walks its frame headers. A pool of
+  threads decompresses frames and inserts them as RawBSONDocument batches
+  (zlib and the socket both release the GIL), so documents are never decoded
+  or re-encoded. Frames of different collections are interleaved so every
+  collection loads at once. Each collection is dropped and recreated with its
+  options first, and its indexes are built after the data is in, which is
+  faster than keeping them up to date during the load.
+
+A snapshot is only consistent if nothing writes to the database while it is
+taken.
+"""
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from itertools import chain, zip_longest
+
+from bson import json_util
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+from .baseline import is_copy
+from .cleanup import index_model
+from .config import settings
+
+MANIFEST_FILE = "manifest.json"
+EXTENSION = ".bsonz"
+FORMAT_VERSION = 1
+FRAME_HEADER = struct.Struct("<III")
+FRAME_DOCUMENTS = 1000
+FRAME_BYTES = 8 * 2 ** 20
+DEFAULT_LEVEL = 1
+DEFAULT_WORKERS = 8
+
+_LENGTH = struct.Struct("<i")
+_RAW = CodecOptions(document_class=RawBSONDocument)
+
+
+class CollectionSnapshot:
+    """One collection's snapshot file and how long it took to write or restore"""
+
+    def __init__(self, name, count=0, frames=0, size=0, stored_size=0, compression="zlib", options=None,
+                 indexes=None):
+        self.name = name
+        self.count = count
+        self.frames = frames
+        self.size = size
+        self.stored_size = stored_size
+        self.compression = compression
+        self.options = options or {}
+        self.indexes = indexes or []
+        self.elapsed = 0.0
+
+    @property
+    def file(self):
+        return self.name + EXTENSION
+
+    @property
+    def docs_per_sec(self):
+        return self.count / self.elapsed if self.elapsed > 0 else 0.0
+
+    def manifest_entry(self):
+        return {
+            "name": self.name,
+            "file": self.file,
+            "count": self.count,
+            "frames": self.frames,
+            "size": self.size,
+            "storedSize": self.stored_size,
+            "compression": self.compression,
+            "options": self.options,
+            "indexes": self.indexes,
+        }
+
+    @classmethod
+    def from_manifest(cls, entry):
+        return cls(entry["name"], entry["count"], entry["frames"], entry["size"], entry["storedSize"],
+                   entry["compression"], entry["options"], entry["indexes"])
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "frames": self.frames,
+            "size": self.size,
+            "storedSize": self.stored_size,
+            "indexes": len(self.indexes),
+            "elapsedSeconds": round(self.elapsed, 3),
+            "docsPerSec": round(self.docs_per_sec, 1),
+        }
+
+
+def snapshot_collections(db):
+    """Every collection of db a snapshot covers by default: all but system collections, views and baseline copies"""
+    return sorted(info["name"] for info in db.list_collections()
+                  if info.get("type", "collection") == "collection" and not info["name"].startswith("system.")
+                  and not is_copy(info["name"]))
+
+
+def _write_frame(f, documents, level, entry):
+    data = b"".join(documents)
+    stored = zlib.compress(data, level) if level else data
+    f.write(FRAME_HEADER.pack(len(stored), len(data), len(documents)))
+    f.write(stored)
+    entry.frames += 1
+    entry.count += len(documents)
+    entry.size += len(data)
+    entry.stored_size += FRAME_HEADER.size + len(stored)
+
+
+def _dump_collection(db, name, directory, level, frame_documents, batch_size):
+    """Write collection name to its .bsonz file in natural order and return its CollectionSnapshot"""
+    started = time.monotonic()
+    collection = db[name]
+    entry = CollectionSnapshot(name, compression="zlib" if level else "none", options=collection.options(),
+                               indexes=list(collection.list_indexes()))
+    path = os.path.join(directory, entry.file)
+    raw = collection.with_options(codec_options=_RAW)
+    with open(path + ".part", "wb") as f:
+        documents, size = [], 0
+        for document in raw.find({}, batch_size=batch_size or settings.cursor_batch_size):
+            documents.append(document.raw)
+            size += len(document.raw)
+            if len(documents) >= frame_documents or size >= FRAME_BYTES:
+                _write_frame(f, documents, level, entry)
+                documents, size = [], 0
+        if documents:
+            _write_frame(f, documents, level, entry)
+    os.replace(path + ".part", path)
+    entry.elapsed = time.monotonic() - started
+    return entry
+
+
+def save_snapshot(db, directory, names=None, level=DEFAULT_LEVEL, frame_documents=FRAME_DOCUMENTS, batch_size=None,
+                  workers=None, progress=True):
+    """Dump the collections names (default: all) of db into directory; return {name: CollectionSnapshot}
+
+    Collections are read concurrently, each by its own thread.
+    """
+    names = names or snapshot_collections(db)
+    os.makedirs(directory, exist_ok=True)
+    entries = {}
+    with ThreadPoolExecutor(max_workers=min(workers or DEFAULT_WORKERS, len(names) or 1)) as executor:
+        futures = {executor.submit(_dump_collection, db, name, directory, level, frame_documents, batch_size): name
+                   for name in names}
+        for future in futures:
+            entry = entries[futures[future]] = future.result()
+            if progress:
+                print(f"  {entry.name}: {entry.count:,} documents, {entry.stored_size / 2 ** 20:,.1f} MiB "
+                      f"({entry.docs_per_sec:,.0f} docs/sec)")
+    manifest = {
+        "formatVersion": FORMAT_VERSION,
+        "database": db.name,
+        "createdAt": datetime.now(timezone.utc),
+        "collections": [entries[name].manifest_entry() for name in names],
+    }
+    with open(os.path.join(directory, MANIFEST_FILE + ".part"), "w", encoding="utf-8") as f:
+        f.write(json_util.dumps(manifest, indent=2))
+    os.replace(os.path.join(directory, MANIFEST_FILE + ".part"), os.path.join(directory, MANIFEST_FILE))
+    return entries
+
+
+def read_manifest(directory):
+    """The manifest of the snapshot in directory"""
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise ValueError(f"No snapshot in {directory} ({MANIFEST_FILE} is missing)")
+    with open(path, encoding="utf-8") as f:
+        manifest = json_util.loads(f.read())
+    if manifest.get("formatVersion") != FORMAT_VERSION:
+        raise ValueError(f"Snapshot format {manifest.get('formatVersion')} is not supported")
+    return manifest
+
+
+def _frames(view):
+    """Yield (offset, stored size, document count) for every frame in a mapped file"""
+    offset = 0
+    while offset < len(view):
+        stored, _, count = FRAME_HEADER.unpack_from(view, offset)
+        yield offset + FRAME_HEADER.size, stored, count
+        offset += FRAME_HEADER.size + stored
+
+
+def _split(data):
+    """RawBSONDocuments for the concatenated BSON documents in data"""
+    documents = []
+    offset = 0
+    while offset < len(data):
+        (length,) = _LENGTH.unpack_from(data, offset)
+        documents.append(RawBSONDocument(data[offset:offset + length]))
+        offset += length
+    return documents
+
+
+class SnapshotRestorer:
+    """Load a snapshot directory into db, replacing the collections it holds
+
+    workers threads decompress and insert frames. dry_run reads and checks
+    every frame without touching the database.
+    """
+
+    def __init__(self, db, directory, names=None, workers=None, progress=True, report_interval=1.0, dry_run=False):
+        self.db = db
+        self.directory = directory
+        self.manifest = read_manifest(directory)
+        entries = [CollectionSnapshot.from_manifest(entry) for entry in self.manifest["collections"]]
+        if names:
+            missing = set(names) - {entry.name for entry in entries}
+            if missing:
+                raise ValueError(f"Not in the snapshot: {', '.join(sorted(missing))}")
+            entries = [entry for entry in entries if entry.name in names]
+        self.entries = entries
+        self.workers = workers or DEFAULT_WORKERS
+        self.progress = progress
+        self.report_interval = report_interval
+        self.dry_run = dry_run
+        self.elapsed = 0.0
+        self._restored = 0
+        self._last_report = 0.0
+
+    @property
+    def count(self):
+        return sum(entry.count for entry in self.entries)
+
+    def _recreate(self, entry):
+        self.db.drop_collection(entry.name)
+        self.db.create_collection(entry.name, **entry.options)
+
+    def _load_frame(self, entry, view, offset, stored):
+        data = view[offset:offset + stored]
+        data = zlib.decompress(data) if entry.compression == "zlib" else bytes(data)
+        documents = _split(data)
+        if not self.dry_run:
+            self.db[entry.name].insert_many(documents, ordered=False)
+        return entry, len(documents)
+
+    def _tasks(self, views):
+        """(entry, view, offset, stored size) for every frame, taking one frame from each collection in turn"""
+        per_collection = [[(entry, view, offset, stored) for offset, stored, _ in _frames(view)]
+                          for entry, view in views]
+        return (task for task in chain.from_iterable(zip_longest(*per_collection)) if task is not None)
+
+    def _report(self, started, final=False):
+        if not self.progress:
+            return
+        elapsed = time.monotonic() - started
+        if final or elapsed - self._last_report >= self.report_interval:
+            self._last_report = elapsed
+            rate = self._restored / elapsed if elapsed > 0 else 0.0
+            sys.stdout.write(f"\r  {self._restored:,} of {self.count:,} documents restored ({rate:,.0f} docs/sec)")
+            if final:
+                sys.stdout.write("\n")
+            sys.stdout.flush()
+
+    def _open(self, entry):
+        path = os.path.join(self.directory, entry.file)
+        if os.path.getsize(path) == 0:
+            return None, b""
+        f = open(path, "rb")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return (f, mapped), memoryview(mapped)
+
+    def run(self):
+        """Restore every collection and return {name: CollectionSnapshot} with the restore timings"""
+        started = time.monotonic()
+        opened, views = [], []
+        counts = {entry.name: 0 for entry in self.entries}
+        try:
+            for entry in self.entries:
+                handles, view = self._open(entry)
+                if handles:
+                    opened.append((handles, view))
+                views.append((entry, view))
+                if not self.dry_run:
+                    self._recreate(entry)
+            in_flight = set()
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                try:
+                    for task in self._tasks(views):
+                        # Keep a bounded number of decompressed frames in memory
+                        if len(in_flight) >= 2 * self.workers:
+                            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                self._collect(future, counts, started)
+                        in_flight.add(executor.submit(self._load_frame, *task))
+                finally:
+                    for future in in_flight:
+                        self._collect(future, counts, started)
+            self._report(started, final=True)
+            self._build_indexes()
+            self.elapsed = time.monotonic() - started
+        finally:
+            for (f, mapped), view in opened:
+                view.release()
+                mapped.close()
+                f.close()
+        for entry in self.entries:
+            if counts[entry.name] != entry.count:
+                raise ValueError(f"{entry.file} holds {counts[entry.name]} documents; the manifest says {entry.count}")
+        return {entry.name: entry for entry in self.entries}
+
+    def _collect(self, future, counts, started):
+        entry, count = future.result()
+        counts[entry.name] += count
+        self._restored += count
+        entry.elapsed = time.monotonic() - started
+        self._report(started)
+
+    def _build_indexes(self):
+        """Create every collection's secondary indexes, the collections in parallel"""
+        if self.dry_run:
+            return
+
+        def build(entry):
+            indexes = [index_model(index) for index in entry.indexes if index["name"] != "_id_"]
+            if indexes:
+                self.db[entry.name].create_indexes(indexes)
+            return entry, len(indexes)
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(self.entries) or 1)) as executor:
+            built = sum(count for _, count in executor.map(build, self.entries))
+        if self.progress:
+            print(f"  Built {built} indexes in {time.monotonic() - started:.1f}s.")
@@ -0,0 +1,154 @@
+"""Collision-free emails and medical record numbers for large user seeds
+
+users.email has a unique index, and MRNs are meant to be unique too, but the
+seeders draw both from small spaces (a few hundred name pairs, 900,000 MRNs).
+UserKeys fixes each generated document up before it is written:
+
+- every email and MRN already in the collection is streamed once into a Bloom
+  filter (a few bytes per key, no round trip per candidate later);
+- a drawn key that the filter has not seen is kept and added to it;
+- a drawn key that the filter may have seen is replaced by one built from a
+  sequence number: `local+<n>@domain` for emails, `MRN<n>` above the random
+  range for MRNs.
+
+A Bloom filter can report a free key as taken, never the reverse, so a false
+positive only costs one sequence number. --workers shards each get a disjoint
+block of sequence numbers (see for_shard), so their replacements cannot
+collide either.
+"""
+import hashlib
+import math
+
+from .checkpoints import preserve
+from .config import settings
+
+DEFAULT_ERROR_RATE = 0.001
+# Sequence numbers each --workers shard may hand out
+SEQUENCE_BLOCK = 10 ** 9
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, sized for capacity keys at error_rate"""
+
+    def __init__(self, capacity, error_rate=DEFAULT_ERROR_RATE):
+        capacity = max(capacity, 1000)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: position i is h1 + i*h2 (mod size)
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little") % self.size
+        h2 = int.from_bytes(digest[8:], "little") % self.size or 1
+        return range(h1, h1 + self.hashes * h2, h2)
+
+    def add(self, key):
+        """Add key, returning False if it may already have been present"""
+        bits, size = self.bits, self.size
+        added = False
+        for position in self._positions(key):
+            position %= size
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                added = True
+        self.count += added
+        return added
+
+    def __contains__(self, key):
+        bits, size = self.bits, self.size
+        for position in self._positions(key):
+            position %= size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+
+class UserKeys:
+    """Keeps the emails and MRNs of generated users unique against the database and each other
+
+    mrn_prefix is the text before the number ("MRN", "INT-MRN") and mrn_start
+    the first sequence MRN, just above the tool's random MRN range.
+    """
+
+    def __init__(self, capacity, mrn_prefix="MRN", mrn_start=1000000, error_rate=DEFAULT_ERROR_RATE):
+        self.emails = BloomFilter(capacity, error_rate)
+        self.mrns = BloomFilter(capacity, error_rate)
+        self.mrn_prefix = mrn_prefix
+        self.mrn_start = mrn_start
+        self.sequence = 0
+        self.sequence_end = SEQUENCE_BLOCK
+        self.replaced = 0
+
+    @classmethod
+    def preload(cls, collection, count, batch_size=None, **options):
+        """Stream every existing email and MRN in collection into a new UserKeys
+
+        count is the number of users about to be generated; the filters are
+        sized for them plus the existing users. A resumed run gets the filters
+        its interrupted run started with, without the users that run added.
+        """
+        def load():
+            keys = cls(collection.estimated_document_count() + count, **options)
+            cursor = collection.find({}, {"email": 1, "medicalRecordNumber": 1, "_id": 0},
+                                     batch_size=batch_size or settings.cursor_batch_size)
+            for user in cursor:
+                if user.get("email"):
+                    keys.emails.add(user["email"].lower())
+                if user.get("medicalRecordNumber"):
+                    keys.mrns.add(user["medicalRecordNumber"])
+            return keys
+
+        return preserve("user_keys", load)
+
+    def for_shard(self, index):
+        """Restrict this (unpickled, per-process) copy to shard index's sequence block"""
+        self.sequence = index * SEQUENCE_BLOCK
+        self.sequence_end = self.sequence + SEQUENCE_BLOCK
+        return self
+
+    def _next_sequence(self):
+        if self.sequence >= self.sequence_end:
+            raise ValueError("Sequence block exhausted; cannot allocate more unique keys")
+        self.sequence += 1
+        return self.sequence
+
+    def email(self, email):
+        """Return email if it is unused, else an unused `local+<n>@domain` variant"""
+        candidate = email.lower()
+        while not self.emails.add(candidate):
+            local, _, domain = email.lower().partition("@")
+            candidate = f"{local}+{self._next_sequence()}@{domain}"
+        if candidate != email.lower():
+            self.replaced += 1
+        return candidate
+
+    def mrn(self, mrn):
+        """Return mrn if it is unused, else an unused sequence MRN"""
+        candidate = mrn
+        while not self.mrns.add(candidate):
+            candidate = f"{self.mrn_prefix}{self.mrn_start + self._next_sequence()}"
+        if candidate != mrn:
+            self.replaced += 1
+        return candidate
+
+    def assign(self, documents):
+        """Yield documents with their email and MRN made unique"""
+        for document in documents:
+            document["email"] = self.email(document["email"])
+            if "medicalRecordNumber" in document:
+                document["medicalRecordNumber"] = self.mrn(document["medicalRecordNumber"])
+            yield document
+
+    def as_dict(self):
+        return {
+            "replaced": self.replaced,
+            "emailFilterBytes": self.emails.nbytes,
+            "mrnFilterBytes": self.mrns.nbytes,
+        }
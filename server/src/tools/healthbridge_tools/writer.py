@@ -0,0 +1,335 @@
+"""Streaming, chunked bulk-insert writer shared by the seeders"""
+import os
+import queue
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+from pymongo.errors import BulkWriteError, ConnectionFailure, PyMongoError
+
+from .config import settings
+from .repro import Fingerprint, new_object_id
+
+# Backoff between retries of a batch after a transient error: 0.5s, 1s, 2s, ... up to 30s, with jitter
+RETRY_BACKOFF = 0.5
+MAX_RETRY_BACKOFF = 30.0
+# Not the module-level generator: retries must not shift a seeded run's random stream
+_jitter = random.Random()
+
+
+class WriteStats:
+    """Running totals for one bulk write"""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.inserted = 0
+        self.failed = 0
+        self.batches = 0
+        self.errors = []
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+        # Time the generator spent blocked because max_in_flight batches were being written
+        self.write_wait = 0.0
+        # Documents a resumed run found already written by the run it continues
+        self.resumed = 0
+        self.retries = 0
+        self.rejected_files = []
+        self.fingerprint = None
+
+    @property
+    def docs_per_sec(self):
+        return self.inserted / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "batches": self.batches,
+            "elapsedSeconds": round(self.elapsed, 3),
+            "docsPerSec": round(self.docs_per_sec, 1),
+            "writeWaitSeconds": round(self.write_wait, 3),
+            "resumed": self.resumed,
+            "retries": self.retries,
+            "rejectedFiles": self.rejected_files,
+            "dryRun": self.dry_run,
+            "fingerprint": self.fingerprint,
+        }
+
+
+def chunked(documents, size):
+    """Yield lists of at most size documents from any iterable"""
+    iterator = iter(documents)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def observe(documents, callback):
+    """Yield documents unchanged after passing each one to callback"""
+    for document in documents:
+        callback(document)
+        yield document
+
+
+def keep_first(documents, sample, limit=20):
+    """Yield documents unchanged, copying the first limit of them into sample"""
+    for document in documents:
+        if len(sample) < limit:
+            sample.append(document)
+        yield document
+
+
+def report_result(stats, noun="documents"):
+    """Print how many documents were written and a short summary of any rejected by the server"""
+    if stats.dry_run:
+        print(f"Dry run: generated {stats.inserted} {noun} ({stats.docs_per_sec:.0f} docs/sec); nothing was written.")
+        if stats.fingerprint:
+            print(f"Dataset fingerprint: {stats.fingerprint}")
+        return
+    print(f"Successfully added {stats.inserted} {noun} to the database ({stats.docs_per_sec:.0f} docs/sec).")
+    if stats.resumed:
+        print(f"Resumed: {stats.resumed} {noun} had already been added by the interrupted run.")
+    if stats.failed:
+        print(f"Warning: {stats.failed} {noun} could not be inserted.")
+        for error in stats.errors[:3]:
+            print(f"  - {error.get('errmsg', error)}")
+        for path in stats.rejected_files:
+            print(f"  Rejected {noun} were saved to {path}")
+    if stats.fingerprint:
+        print(f"Dataset fingerprint: {stats.fingerprint}")
+
+
+class BulkWriter:
+    """Insert a document stream in unordered batches with a bounded number in flight
+
+    Only the batch being built plus max_in_flight batches being written are held
+    in memory, so peak memory does not grow with the size of the run. The next
+    batch is generated while earlier ones are written, and generation resumes
+    as soon as any batch in flight finishes, so a run goes about as fast as the
+    slower of generation and the database. WriteStats.write_wait tells which
+    one that was.
+
+    With fingerprint=True every document gets its _id before it is written
+    (reproducible under --seed, see healthbridge_tools.repro) and is hashed in
+    stream order; the digest ends up in WriteStats.fingerprint.
+
+    With a SeedRun (see healthbridge_tools.seedruns) every document is tagged
+    with its seedRunId, and the run's manifest records what was written.
+
+    Lost connections and primary elections are retried up to retries times
+    with exponential backoff. With a Checkpoint (see
+    healthbridge_tools.checkpoints) acknowledged batches are recorded so that
+    --resume can skip them, and documents the server rejects are appended to a
+    dead-letter file.
+    """
+
+    def __init__(self, collection, batch_size=None, max_in_flight=None, progress=True, report_interval=1.0,
+                 dry_run=False, fingerprint=False, run=None, checkpoint=None, retries=None):
+        self.collection = collection
+        self.batch_size = batch_size or settings.batch_size
+        self.max_in_flight = max_in_flight or settings.max_in_flight
+        self.progress = progress
+        self.dry_run = dry_run
+        self.report_interval = report_interval
+        self.fingerprint = Fingerprint() if fingerprint else None
+        self.run = run
+        self.checkpoint = None if dry_run else checkpoint
+        self.retries = settings.write_retries if retries is None else retries
+        self._last_report = 0.0
+        self._progress = None
+        self._dead_letters = None
+
+    def _insert_batch(self, batch, index):
+        """Insert one batch, returning (index, inserted, already written, write errors, retries)
+
+        A retry, or a resumed run, may find some of the documents already there
+        from an earlier attempt; their duplicate _id errors are not failures.
+        """
+        if self.dry_run:
+            return index, len(batch), 0, [], 0
+        resuming = self.checkpoint is not None and self.checkpoint.resumed
+        attempt = 0
+        while True:
+            try:
+                # inserted_ids skips RawBSONDocuments, so count the batch instead
+                self.collection.insert_many(batch, ordered=False)
+                return index, len(batch), 0, [], attempt
+            except BulkWriteError as e:
+                # Unordered inserts keep going past bad documents; count what made it in
+                inserted = e.details.get("nInserted", 0)
+                errors = e.details.get("writeErrors", [])
+                if not (attempt or resuming):
+                    return index, inserted, 0, errors, attempt
+                written = sum(1 for error in errors if _already_written(error))
+                errors = [error for error in errors if not _already_written(error)]
+                if attempt:
+                    # This process wrote them before the connection dropped
+                    return index, inserted + written, 0, errors, attempt
+                return index, inserted, written, errors, attempt
+            except PyMongoError as e:
+                if attempt >= self.retries or not _is_transient(e):
+                    raise
+                attempt += 1
+                delay = min(MAX_RETRY_BACKOFF, RETRY_BACKOFF * 2 ** (attempt - 1))
+                time.sleep(delay * (0.5 + _jitter.random()))
+
+    def _stamp(self, batch):
+        """Give each document its _id and hash it, returning the batch pre-encoded"""
+        for i, document in enumerate(batch):
+            if "_id" not in document:
+                document["_id"] = new_object_id()
+            # The encoding made for the hash is the one sent to the server
+            batch[i] = self.fingerprint.update(document)
+        return batch
+
+    def _collect(self, future, stats):
+        index, inserted, written, errors, retries = future.result()
+        stats.inserted += inserted
+        stats.resumed += written
+        stats.failed += len(errors)
+        stats.batches += 1
+        stats.retries += retries
+        if errors and len(stats.errors) < 10:
+            stats.errors.extend(errors[:10 - len(stats.errors)])
+        if errors and self._dead_letters is not None:
+            self._dead_letters.write(errors)
+        if self._progress is not None:
+            self.checkpoint.acknowledge(self._progress, index, inserted + written, len(errors))
+        self._report(stats)
+
+    def _report(self, stats, final=False):
+        stats.elapsed = time.monotonic() - stats.started
+        if not self.progress:
+            return
+        if final or stats.elapsed - self._last_report >= self.report_interval:
+            self._last_report = stats.elapsed
+            verb = "generated (dry run)" if self.dry_run else "inserted"
+            sys.stdout.write(
+                f"\r  {self.collection.name}: {stats.inserted:,} {verb}, {stats.failed:,} failed "
+                f"({stats.docs_per_sec:,.0f} docs/sec)"
+            )
+            if final:
+                sys.stdout.write("\n")
+            sys.stdout.flush()
+
+    def write(self, documents):
+        """Consume the document iterable and return its WriteStats"""
+        stats = WriteStats(dry_run=self.dry_run)
+        finished_before = False
+        if self.checkpoint is not None:
+            self._progress = self.checkpoint.collection(self.collection.name, self.batch_size)
+            self._dead_letters = self.checkpoint.dead_letters(self.collection.name)
+            finished_before = self._progress.finished
+            # What the interrupted run wrote, and failed to write, before it stopped
+            stats.resumed = self._progress.inserted
+            stats.failed = self._progress.failed
+        if self.run and not self.dry_run:
+            self.run.open(self.collection)
+        in_flight = set()
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+                try:
+                    for index, batch in enumerate(chunked(documents, self.batch_size)):
+                        # Backpressure: wait for any batch to finish before generating more; waiting for
+                        # the oldest would stall behind one slow batch while other slots sit idle
+                        if len(in_flight) >= self.max_in_flight:
+                            waiting_since = time.monotonic()
+                            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                            stats.write_wait += time.monotonic() - waiting_since
+                            for future in done:
+                                self._collect(future, stats)
+                        if self.run:
+                            batch = [self.run.tag(document) for document in batch]
+                        if self.fingerprint:
+                            batch = self._stamp(batch)
+                        # Batches the interrupted run wrote are generated again only to keep the stream in step
+                        if self._progress is not None and self._progress.is_written(index):
+                            continue
+                        in_flight.add(executor.submit(self._insert_batch, batch, index))
+                finally:
+                    for future in in_flight:
+                        self._collect(future, stats)
+            if self._progress is not None:
+                self._progress.finished = True
+        except BaseException:
+            if self.checkpoint is not None and self.checkpoint.resumable:
+                print(f"\nProgress was saved to {self.checkpoint.path}; "
+                      "run the same command with --resume to continue.")
+            raise
+        finally:
+            if self.checkpoint is not None:
+                self.checkpoint.save(force=True)
+                self._dead_letters.close()
+                if os.path.exists(self._dead_letters.path):
+                    stats.rejected_files.append(self._dead_letters.path)
+        if self.fingerprint:
+            stats.fingerprint = self.fingerprint.hexdigest()
+        if self.run and not self.dry_run and not finished_before:
+            self.run.record(self.collection, stats)
+        self._report(stats, final=True)
+        return stats
+
+
+def _already_written(error):
+    """True for a duplicate key error on _id: an earlier attempt inserted this very document"""
+    if error.get("code") != 11000:
+        return False
+    return list(error.get("keyPattern") or {}) == ["_id"] or " index: _id_ " in error.get("errmsg", "")
+
+
+def _is_transient(error):
+    return isinstance(error, ConnectionFailure) or error.has_error_label("RetryableWriteError")
+
+
+def bulk_insert(collection, documents, **kwargs):
+    """Stream documents into collection with a BulkWriter"""
+    return BulkWriter(collection, **kwargs).write(documents)
+
+
+_END = object()
+
+
+def _drain(documents):
+    while True:
+        document = documents.get()
+        if document is _END:
+            return
+        yield document
+
+
+def _put(documents, document, future):
+    # Give up instead of blocking forever when the writer reading this queue has failed
+    while True:
+        try:
+            documents.put(document, timeout=0.5)
+            return
+        except queue.Full:
+            if future.done():
+                future.result()
+                raise RuntimeError("A collection writer stopped before its input was consumed")
+
+
+def bulk_insert_routed(db, routed, names, queue_size=None, **kwargs):
+    """Stream (collection name, document) pairs into one BulkWriter per collection in names
+
+    For generators that produce several collections in one pass. Each
+    collection is written on its own thread and fed through a queue of at most
+    queue_size documents, so memory stays bounded however long the stream is.
+    kwargs go to every BulkWriter. Returns {name: WriteStats}.
+    """
+    queues = {name: queue.Queue(maxsize=queue_size or settings.batch_size) for name in names}
+    with ThreadPoolExecutor(max_workers=len(names)) as executor:
+        futures = {name: executor.submit(BulkWriter(db[name], **kwargs).write, _drain(queues[name]))
+                   for name in names}
+        try:
+            for name, document in routed:
+                _put(queues[name], document, futures[name])
+        finally:
+            for name in names:
+                if not futures[name].done():
+                    _put(queues[name], _END, futures[name])
+        return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+import sys
+
+from healthbridge_tools import baseline, get_db
+from healthbridge_tools.cli import build_parser, confirm, json_summary
+
+def collection_list(value):
+    """argparse type for --collections: comma-separated names"""
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+def print_status(db, names):
+    """Print the live, baseline and prepared document counts of each collection"""
+    existing = set(db.list_collection_names())
+    
+    def count(name):
+        return f"{db[name].estimated_document_count():,}" if name in existing else "-"
+    
+    print(f"\n{'Collection':<20}{'Live':>14}{'Baseline':>14}{'Prepared':>14}")
+    for name in names:
+        print(f"{name:<20}{count(name):>14}{count(name + baseline.BASELINE_SUFFIX):>14}"
+              f"{count(name + baseline.NEXT_SUFFIX):>14}")
+    print()
+
+def run(args, summary):
+    """Capture, prepare, reset or drop the baseline copies"""
+    db = get_db()
+    names = args.collections
+    summary["command"] = args.command
+    summary["collections"] = names
+    print_status(db, names)
+    if args.command == "status":
+        return
+    
+    prompts = {
+        "capture": f"Replace the baselines of {', '.join(names)} with their current contents? (y/n): ",
+        "reset": f"Replace {', '.join(names)} with their baselines? This cannot be undone. (y/n): ",
+        "drop": f"Drop the baseline copies of {', '.join(names)}? (y/n): ",
+    }
+    if args.command in prompts:
+        if args.dry_run:
+            print(f"Would {args.command} {', '.join(names)} (dry run).")
+            return
+        if not confirm(args, prompts[args.command]):
+            print("Operation cancelled by user.")
+            return
+    elif args.dry_run:
+        print(f"Would prepare {', '.join(names)} (dry run).")
+        return
+    
+    if args.command == "drop":
+        dropped = baseline.drop(db, names)
+        summary["dropped"] = dropped
+        print(f"Dropped {len(dropped)} collections.")
+        return
+    
+    try:
+        if args.command == "capture":
+            stats = baseline.capture(db, names, prepare_next=not args.no_prepare)
+        elif args.command == "prepare":
+            stats = baseline.prepare(db, names)
+        else:
+            stats = baseline.reset(db, names, prepare_next=not args.no_prepare)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    summary.update(stats.as_dict())
+    
+    if args.command == "capture":
+        print(f"Captured the baselines of {sum(stats.counts.values())} documents.")
+    elif args.command == "reset":
+        print(f"Swapped in {sum(stats.counts.values())} documents in {stats.swap_elapsed * 1000:.0f} ms.")
+        if stats.watermark_cleared:
+            print(f"{baseline.ROLLUP_COLLECTION} was not reset, so its watermark was cleared; "
+                  "run rollup_daily_stats.py --backfill to rebuild it.")
+    if stats.prepare_elapsed:
+        print(f"Prepared the copies for the next reset in {stats.prepare_elapsed:.1f}s.")
+    print_status(db, names)
+
+def main(argv=None):
+    """Parse command-line options and run the baseline command"""
+    parser = build_parser(
+        "reset_database.py",
+        "Keep baseline copies of the collections on the server and reset the live collections to them "
+        "with an atomic rename.",
+        default_count=False, bulk=False
+    )
+    parser.add_argument("command", choices=["capture", "prepare", "reset", "status", "drop"],
+                        help="'capture' copies the live collections to their baselines, 'reset' swaps prepared "
+                             "copies of the baselines in, 'prepare' builds those copies, 'status' shows the counts, "
+                             "'drop' removes the baselines")
+    parser.add_argument("--collections", type=collection_list, default=list(baseline.BASELINE_COLLECTIONS),
+                        help=f"comma-separated collections (default: {','.join(baseline.BASELINE_COLLECTIONS)})")
+    parser.add_argument("--no-prepare", action="store_true",
+                        help="do not build the copies for the next reset after capture or reset; "
+                             "that reset then copies before swapping")
+    args = parser.parse_args(argv)
+    with json_summary(args, "reset_database") as summary:
+        run(args, summary)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+import sys
+
+from healthbridge_tools import get_db
+from healthbridge_tools.cli import build_parser, json_summary, positive_int
+from healthbridge_tools.repro import parse_now
+from healthbridge_tools.rollups import (DEFAULT_CHUNK_DAYS, DEFAULT_LAG, ROLLUP_COLLECTION, DailyRollup,
+                                        rollup_summary)
+
+def print_rollup_summary(db):
+    """Print the dashboard summary as read from the rollups"""
+    summary = rollup_summary(db)
+    print(f"\nUsers: {summary['totalUsers']} "
+          f"({', '.join(f'{role}: {count}' for role, count in summary['usersByRole'].items())})")
+    print(f"Appointments: {summary['totalAppointments']} "
+          f"({', '.join(f'{status}: {count}' for status, count in summary['appointmentsByStatus'].items())})")
+    print(f"Registrations in the last 7 days: {summary['recentRegistrations']}")
+    print("Common diagnoses: " + ", ".join(f"{entry['_id']} ({entry['count']})"
+                                           for entry in summary["commonDiagnoses"]))
+    print("Common medications: " + ", ".join(f"{entry['medication']} ({entry['count']})"
+                                             for entry in summary["commonMedications"]))
+    return summary
+
+def run(args, summary):
+    """Bring the daily rollups up to date, or rebuild a range of days"""
+    db = get_db()
+    rollup = DailyRollup(db, workers=args.workers, lag=args.lag, chunk_days=args.chunk_days,
+                         progress=not args.json, dry_run=args.dry_run)
+    backfill = args.backfill or args.start_date is not None or args.end_date is not None
+    summary["mode"] = "backfill" if backfill else "update"
+    
+    try:
+        if backfill:
+            print("Rebuilding the daily rollups" + (f" from {args.start_date:%Y-%m-%d}" if args.start_date else "")
+                  + (f" to {args.end_date:%Y-%m-%d}" if args.end_date else "") + "...")
+            stats = rollup.backfill(args.start_date, args.end_date)
+        else:
+            print(f"Rolling up the changes since {rollup.watermark() or 'the beginning'}...")
+            stats = rollup.update()
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    summary.update(stats.as_dict())
+    
+    verb = "Would rebuild" if args.dry_run else "Rebuilt"
+    span = f" ({stats.first_day:%Y-%m-%d} to {stats.last_day:%Y-%m-%d})" if stats.days else ""
+    print(f"{verb} {stats.days} days{span} in {stats.elapsed:.1f}s: {stats.rows} rows written, "
+          f"{stats.removed} removed.")
+    if stats.watermark is not None and not args.dry_run:
+        print(f"Changes up to {stats.watermark:%Y-%m-%d %H:%M:%S} (UTC) are rolled up.")
+    if args.show:
+        summary["rollups"] = print_rollup_summary(db)
+
+def main(argv=None):
+    """Parse command-line options and run the rollup job"""
+    parser = build_parser(
+        "rollup_daily_stats.py",
+        f"Keep the {ROLLUP_COLLECTION} collection of per-day dashboard counts up to date.",
+        default_count=False, bulk=False
+    )
+    parser.add_argument("--backfill", action="store_true",
+                        help="rebuild every day instead of the days changed since the last run; "
+                             "a backfill of all days also sets the watermark")
+    parser.add_argument("--from", dest="start_date", type=parse_now, default=None,
+                        help="rebuild the days from this date (UTC) on; implies --backfill")
+    parser.add_argument("--to", dest="end_date", type=parse_now, default=None,
+                        help="rebuild the days up to and including this date (UTC); implies --backfill")
+    parser.add_argument("--workers", type=positive_int, default=4,
+                        help="day ranges rebuilt at once (default: 4)")
+    parser.add_argument("--chunk-days", type=positive_int, default=DEFAULT_CHUNK_DAYS,
+                        help=f"days per range in a backfill (default: {DEFAULT_CHUNK_DAYS})")
+    parser.add_argument("--lag", type=int, default=DEFAULT_LAG,
+                        help=f"seconds the watermark stays behind the clock, for writes still in flight "
+                             f"(default: {DEFAULT_LAG})")
+    parser.add_argument("--show", action="store_true",
+                        help="print the dashboard summary read from the rollups afterwards")
+    args = parser.parse_args(argv)
+    with json_summary(args, "rollup_daily_stats") as summary:
+        run(args, summary)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+import heapq
+import sys
+from array import array
+from collections import Counter
+from datetime import timedelta
+import random
+
+from healthbridge_tools import bulk_insert_routed, get_db, report_result, resolve_admin_id, settings
+from healthbridge_tools.cli import apply_seed, build_parser, confirm, json_summary, prompt_int, writer_options
+from healthbridge_tools.repro import anchored_now, object_id_at
+from healthbridge_tools.scheduling import DAY_START_MINUTES, SLOT_MINUTES, DoctorSchedule, preload_schedule
+from healthbridge_tools.unique import UserKeys
+
+# Document contents come from the single-collection seeders
+from add_appointments import appointment_reasons, generate_duration_slots
+from add_appointments import generate_notes as generate_appointment_notes
+from add_messages import MEAN_REPLY_MINUTES, doctor_replies, generate_attachments, generate_thread_length
+from add_messages import generate_status as generate_message_status, patient_openers, patient_replies
+from add_notifications import notification_texts
+from add_patient_records import choose_diagnosis, choose_symptoms, generate_followup_date, generate_prescriptions
+from add_patient_records import generate_notes as generate_record_notes, generate_vitals, load_medications
+from add_patients import generate_patient, mrn_range
+
+# Collections the simulation writes
+SIMULATED_COLLECTIONS = ["users", "appointments", "patienthistories", "messages", "notifications"]
+
+# Share of patients who registered before the simulated period (within the 3 years before it);
+# the others sign up during it
+ESTABLISHED_SHARE = 0.7
+ESTABLISHED_YEARS = 3
+
+# Share of routine visits booked with the patient's own doctor rather than any doctor
+PRIMARY_DOCTOR_SHARE = 0.7
+
+# Routine visits are booked this many days ahead
+BOOKING_LEAD_DAYS = (1, 21)
+# Weekdays tried after the preferred day when the doctor is fully booked
+MAX_BOOKING_DAYS = 14
+
+# Average hours until the doctor confirms a booking
+MEAN_CONFIRM_HOURS = 6
+# Share of cancelled routine appointments the patient books again, on average this many days later
+REBOOK_SHARE = 0.5
+MEAN_REBOOK_DAYS = 3
+
+# Share of visits followed by lab results, 1 to 5 days later
+LAB_RESULTS_SHARE = 0.25
+# Follow-up visits lead to another follow-up this much less often than routine visits
+FOLLOW_UP_REPEAT_SHARE = 0.3
+
+# Notifications older than this are mostly read
+READ_WITHIN_DAYS = 2
+
+def load_doctors(users_collection, batch_size=None):
+    """Get every doctor's _id, specialization and department, in _id order"""
+    try:
+        doctors = list(users_collection.find({"role": "doctor"}, {"specialization": 1, "department": 1},
+                                             batch_size=batch_size or settings.cursor_batch_size).sort("_id", 1))
+        if not doctors:
+            print("No doctors found in the database. Cannot simulate visits.")
+            sys.exit(1)
+        print(f"Found {len(doctors)} doctors in the database.")
+    except Exception as e:
+        print(f"Error finding doctors: {e}")
+        sys.exit(1)
+    return doctors
+
+
+class HospitalSimulation:
+    """Discrete-event simulation of patient journeys between start and end
+
+    Events wait in a heap ordered by time and handling one can schedule more:
+    a registration schedules the patient's first booking, a booking its
+    confirmation, reminder and visit, and a visit its lab results, follow-up
+    appointment and the patient's next booking. Every _id is allocated in
+    memory when its document is created, so nothing is read back from the
+    database while the simulation runs.
+
+    Appointments stay in memory while they are open and are yielded once their
+    final state is known; everything else is yielded when it is created. run()
+    yields (collection name, document) pairs.
+    """
+
+    def __init__(self, patient_count, doctors, medications, admin_id, user_keys, schedule, start, end,
+                 visits_per_year=4, cancel_rate=0.1, message_rate=0.4, progress=True):
+        self.patient_count = patient_count
+        self.doctors = doctors
+        self.medications = medications
+        self.admin_id = admin_id
+        self.user_keys = user_keys
+        self.schedule = schedule
+        self.start = start
+        self.end = end
+        self.mean_visit_gap_days = 365 / visits_per_year
+        self.cancel_rate = cancel_rate
+        self.message_rate = message_rate
+        self.progress = progress
+        self.clock = start
+        self.events = []
+        self._sequence = 0
+        # The ID registry: every patient's _id and own doctor, by registration order
+        self.patients = []
+        self.primary_doctors = array("i")
+        self.open_appointments = {}
+        self.counts = Counter()
+
+    def at(self, moment, handler, *args):
+        """Schedule handler(*args) to run when the clock reaches moment"""
+        if moment < self.end:
+            heapq.heappush(self.events, (moment, self._sequence, handler, args))
+            self._sequence += 1
+
+    def _registration_times(self):
+        established = round(self.patient_count * ESTABLISHED_SHARE)
+        before = (self.start - timedelta(days=365 * ESTABLISHED_YEARS), self.start)
+        spans = [before] * established + [(self.start, self.end)] * (self.patient_count - established)
+        return sorted(low + (high - low) * random.random() for low, high in spans)
+
+    def run(self):
+        """Yield (collection name, document) pairs for the whole simulated period"""
+        registrations = self._registration_times()
+        if registrations:
+            self.at(registrations[0], self.register, registrations, 0)
+        next_report = self.start
+        while self.events:
+            moment, _, handler, args = heapq.heappop(self.events)
+            self.clock = moment
+            if self.progress and moment >= next_report:
+                sys.stdout.write(f"\r  Simulated up to {moment:%Y-%m-%d}: {sum(self.counts.values()):,} documents")
+                sys.stdout.flush()
+                next_report = moment + timedelta(days=7)
+            for collection, document in handler(*args):
+                self.counts[collection] += 1
+                yield collection, document
+        # Appointments still ahead at the end keep their current state
+        for appointment in self.open_appointments.values():
+            self.counts["appointments"] += 1
+            yield "appointments", appointment
+        if self.progress:
+            sys.stdout.write(f"\r  Simulated up to {self.end:%Y-%m-%d}: {sum(self.counts.values()):,} documents\n")
+
+    def notify(self, user_id, notification_type, moment):
+        """Yield a notification of notification_type sent to user_id at moment"""
+        if moment >= self.end:
+            return
+        title, message = random.choice(notification_texts[notification_type])
+        age = self.end - moment
+        read = random.random() < (0.9 if age > timedelta(days=READ_WITHIN_DAYS) else 0.3)
+        read_at = moment + min(age, timedelta(days=READ_WITHIN_DAYS)) * random.random()
+        yield "notifications", {
+            "_id": object_id_at(moment),
+            "user": user_id,
+            "title": title,
+            "message": message,
+            "type": notification_type,
+            "read": read,
+            "createdAt": moment,
+            "updatedAt": read_at if read else moment
+        }
+
+    def notify_later(self, user_id, notification_type):
+        yield from self.notify(user_id, notification_type, self.clock)
+
+    def next_routine_visit(self, patient, after):
+        """Schedule the patient's next routine booking"""
+        self.at(max(after, self.start) + timedelta(days=random.expovariate(1 / self.mean_visit_gap_days)),
+                self.book, patient)
+
+    def register(self, registrations, patient):
+        """A patient signs up; the next registration is scheduled from here to keep the heap small"""
+        if patient + 1 < len(registrations):
+            self.at(registrations[patient + 1], self.register, registrations, patient + 1)
+        moment = self.clock
+        document = generate_patient(self.admin_id)
+        document["email"] = self.user_keys.email(document["email"])
+        document["medicalRecordNumber"] = self.user_keys.mrn(document["medicalRecordNumber"])
+        document["_id"] = object_id_at(moment)
+        document["createdAt"] = document["updatedAt"] = moment
+        self.patients.append(document["_id"])
+        self.primary_doctors.append(random.randrange(len(self.doctors)))
+        yield "users", document
+        if moment >= self.start:
+            yield from self.notify(document["_id"], "system", moment)
+        self.next_routine_visit(patient, moment)
+
+    def _allocate(self, doctor_id, day):
+        """Book the first weekday from day on with room, returning (day, start slot, slots) or None"""
+        for offset in range(MAX_BOOKING_DAYS + 1):
+            candidate = day + timedelta(days=offset)
+            if candidate.weekday() >= 5:
+                continue
+            booking = self.schedule.allocate(doctor_id, candidate, generate_duration_slots())
+            if booking:
+                return (candidate, *booking)
+        return None
+
+    def book(self, patient, doctor=None, day=None, routine=True, moment=None):
+        """Book an appointment: a routine visit chosen by the patient, or a follow-up set by the doctor
+
+        Returns the appointment, or None when no day within MAX_BOOKING_DAYS had room.
+        """
+        moment = moment or self.clock
+        if doctor is None:
+            own = random.random() < PRIMARY_DOCTOR_SHARE
+            doctor = self.primary_doctors[patient] if own else random.randrange(len(self.doctors))
+        if day is None:
+            day = moment.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(
+                days=random.randint(*BOOKING_LEAD_DAYS))
+        patient_id = self.patients[patient]
+        doctor_id = self.doctors[doctor]["_id"]
+        booking = self._allocate(doctor_id, day)
+        if booking is None:
+            if routine:
+                self.next_routine_visit(patient, moment)
+            return None
+        day, start_slot, length = booking
+        visit_at = day + timedelta(minutes=DAY_START_MINUTES + start_slot * SLOT_MINUTES)
+        visit_end = visit_at + timedelta(minutes=length * SLOT_MINUTES)
+        appointment = {
+            "_id": object_id_at(moment),
+            "patient": patient_id,
+            "doctor": doctor_id,
+            "date": day,
+            "startTime": f"{visit_at:%H:%M}",
+            "endTime": f"{visit_end:%H:%M}",
+            "status": "pending",
+            "reason": random.choice(appointment_reasons) if routine else "Follow-up appointment",
+            "isVirtual": random.random() < 0.3,
+            "createdBy": patient_id if routine else doctor_id,
+            "createdAt": moment,
+            "updatedAt": moment
+        }
+        self.open_appointments[appointment["_id"]] = appointment
+        yield from self.notify(patient_id, "appointment_created", moment)
+
+        if random.random() < self.cancel_rate:
+            self.at(moment + (visit_at - moment) * random.random(), self.cancel, appointment, patient, routine)
+        confirm_at = moment + timedelta(hours=random.expovariate(1 / MEAN_CONFIRM_HOURS))
+        if confirm_at < visit_at:
+            self.at(confirm_at, self.confirm, appointment)
+        if visit_at - timedelta(days=1) > moment:
+            self.at(visit_at - timedelta(days=1), self.remind, appointment)
+        self.at(visit_at, self.visit, appointment, patient, doctor, visit_end, routine)
+        if random.random() < self.message_rate:
+            yield from self.conversation(appointment, moment, visit_at)
+        return appointment
+
+    def confirm(self, appointment):
+        if appointment["status"] != "pending":
+            return
+        appointment["status"] = "confirmed"
+        appointment["updatedBy"] = appointment["doctor"]
+        appointment["updatedAt"] = self.clock
+        if appointment["isVirtual"]:
+            appointment["meetingLink"] = f"https://healthbridge-meet.com/{random.randint(1000000, 9999999)}"
+        yield from self.notify(appointment["patient"], "appointment_confirmed", self.clock)
+
+    def remind(self, appointment):
+        if appointment["status"] in ("pending", "confirmed"):
+            yield from self.notify(appointment["patient"], "appointment_reminder", self.clock)
+
+    def cancel(self, appointment, patient, routine):
+        """The patient cancels; some book again a few days later"""
+        if appointment["status"] not in ("pending", "confirmed"):
+            return
+        appointment["status"] = "cancelled"
+        appointment["updatedBy"] = appointment["patient"]
+        appointment["updatedAt"] = self.clock
+        appointment.pop("meetingLink", None)
+        del self.open_appointments[appointment["_id"]]
+        yield "appointments", appointment
+        yield from self.notify(appointment["patient"], "appointment_cancelled", self.clock)
+        if not routine:
+            return
+        if random.random() < REBOOK_SHARE:
+            self.at(self.clock + timedelta(days=random.expovariate(1 / MEAN_REBOOK_DAYS)), self.book, patient)
+        else:
+            self.next_routine_visit(patient, self.clock)
+
+    def visit(self, appointment, patient, doctor, visit_end, routine):
+        """The visit takes place: the appointment completes and the doctor writes the patient record"""
+        if appointment["status"] == "cancelled" or visit_end >= self.end:
+            # Visits still in progress at the end keep their current state
+            return
+        patient_id, doctor_id = appointment["patient"], appointment["doctor"]
+        appointment["status"] = "completed"
+        appointment["notes"] = generate_appointment_notes("completed")
+        appointment["updatedBy"] = doctor_id
+        appointment["updatedAt"] = visit_end
+        del self.open_appointments[appointment["_id"]]
+        yield "appointments", appointment
+
+        diagnosis = choose_diagnosis(self.doctors[doctor])
+        symptoms = choose_symptoms(diagnosis)
+        record = {
+            "_id": object_id_at(visit_end),
+            "patient": patient_id,
+            "doctor": doctor_id,
+            "visitDate": appointment["date"],
+            "diagnosis": diagnosis,
+            "symptoms": symptoms,
+            "notes": generate_record_notes(diagnosis, symptoms),
+            "vitals": generate_vitals(),
+            "prescriptions": generate_prescriptions(diagnosis, self.medications),
+            "createdBy": doctor_id,
+            "createdAt": visit_end,
+            "updatedAt": visit_end
+        }
+        # Every follow-up date is booked with the same doctor; the record keeps the day that had room
+        followup_date = None
+        if routine or random.random() < FOLLOW_UP_REPEAT_SHARE:
+            followup_date = generate_followup_date(appointment["date"])
+        if followup_date:
+            followup = yield from self.book(patient, doctor, followup_date, routine=False, moment=visit_end)
+            if followup:
+                record["followUpDate"] = followup["date"]
+        yield "patienthistories", record
+
+        if record["prescriptions"]:
+            yield from self.notify(patient_id, "prescription", visit_end)
+        if random.random() < LAB_RESULTS_SHARE:
+            self.at(visit_end + timedelta(days=random.uniform(1, 5)), self.notify_later, patient_id, "lab_results")
+        if routine:
+            self.next_routine_visit(patient, visit_end)
+
+    def conversation(self, appointment, booked_at, visit_at):
+        """Yield a doctor-patient thread about the appointment, from booking until two weeks after the visit"""
+        patient_id, doctor_id = appointment["patient"], appointment["doctor"]
+        length = generate_thread_length()
+        moment = booked_at + (visit_at + timedelta(days=14) - booked_at) * random.random()
+        # Patients start most conversations
+        patient_turn = random.random() < 0.8
+        for position in range(length):
+            if moment >= self.end:
+                return
+            if patient_turn:
+                sender, recipient = patient_id, doctor_id
+                content = random.choice(patient_openers if position == 0 else patient_replies)
+            else:
+                sender, recipient = doctor_id, patient_id
+                content = random.choice(doctor_replies)
+            status = generate_message_status(position == length - 1)
+            # Read messages were last updated when the recipient read them
+            updated_at = moment
+            if status == "read":
+                updated_at = min(self.end, moment + timedelta(minutes=random.randint(1, 120)))
+            yield "messages", {
+                "_id": object_id_at(moment),
+                "sender": sender,
+                "recipient": recipient,
+                "content": content,
+                "status": status,
+                "appointmentId": appointment["_id"],
+                "attachments": generate_attachments(),
+                "createdAt": moment,
+                "updatedAt": updated_at
+            }
+            yield from self.notify(recipient, "message_received", moment)
+            if random.random() < 0.85:
+                patient_turn = not patient_turn
+            moment += timedelta(minutes=random.expovariate(1 / MEAN_REPLY_MINUTES))
+
+
+def run(args, summary):
+    """Simulate a period of hospital activity for new patients and existing doctors"""
+    db = get_db()
+    users_collection = db.users
+    admin_id = resolve_admin_id(db, assume_yes=args.yes, dry_run=args.dry_run)
+    doctors = load_doctors(users_collection, args.cursor_batch_size)
+    medications = load_medications(db.medications, admin_id, args)
+    
+    # Ask how many patients to simulate unless --count was given
+    num_patients = args.count
+    if num_patients is None:
+        num_patients = prompt_int(args, "How many patients would you like to simulate? (recommended: 100-1000): ", 500)
+    summary["count"] = num_patients
+    summary["days"] = args.days
+    
+    if not confirm(args, f"Simulate {args.days} days of activity for {num_patients} new patients "
+                         f"and {len(doctors)} doctors? (y/n): "):
+        print("Operation cancelled by user.")
+        return
+    
+    end = anchored_now()
+    start = end - timedelta(days=args.days)
+    # Keep emails and MRNs unique against the existing users and each other
+    user_keys = UserKeys.preload(users_collection, num_patients, args.cursor_batch_size, mrn_start=mrn_range[1] + 1)
+    # Slots already booked are never double-booked; follow-ups can land up to six months past the end
+    schedule = DoctorSchedule()
+    preloaded = preload_schedule(schedule, db.appointments, start, end + timedelta(days=200), args.cursor_batch_size)
+    if preloaded:
+        print(f"Loaded {preloaded} existing bookings into the doctors' schedules.")
+    
+    simulation = HospitalSimulation(num_patients, doctors, medications, admin_id, user_keys, schedule, start, end,
+                                    visits_per_year=args.visits_per_year, cancel_rate=args.cancel_rate,
+                                    message_rate=args.message_rate, progress=not args.json)
+    print(f"Simulating {start:%Y-%m-%d} to {end:%Y-%m-%d}...")
+    
+    try:
+        # One writer per collection; their progress lines would overwrite each other
+        results = bulk_insert_routed(db, simulation.run(), SIMULATED_COLLECTIONS,
+                                     **{**writer_options(args), "progress": False})
+    except Exception as e:
+        print(f"Error running the simulation: {e}")
+        sys.exit(1)
+    
+    summary["collections"] = {name: stats.as_dict() for name, stats in results.items()}
+    summary["uniqueKeys"] = user_keys.as_dict()
+    for name, stats in results.items():
+        report_result(stats, name)
+    print("\nDone!")
+
+def main(argv=None):
+    """Parse command-line options and run the simulation"""
+    parser = build_parser(
+        "simulate_hospital.py",
+        "Simulate patient journeys (registrations, appointments, visits, records, messages and "
+        "notifications) over a period, writing every collection in one pass.",
+        count_help="number of patients to simulate (prompted for if omitted, 500 with --yes)"
+    )
+    parser.add_argument("--days", type=int, default=365,
+                        help="length of the simulated period, ending now (default: 365)")
+    parser.add_argument("--visits-per-year", type=float, default=4,
+                        help="average routine visits per patient per year, besides follow-ups (default: 4)")
+    parser.add_argument("--cancel-rate", type=float, default=0.1,
+                        help="share of appointments the patient cancels (default: 0.1)")
+    parser.add_argument("--message-rate", type=float, default=0.4,
+                        help="share of appointments with a doctor-patient conversation (default: 0.4)")
+    args = parser.parse_args(argv)
+    if args.days < 1 or args.visits_per_year <= 0:
+        parser.error("--days and --visits-per-year must be positive")
+    apply_seed(args, "simulate_hospital")
+    with json_summary(args, "simulate_hospital") as summary:
+        run(args, summary)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+import os
+import sys
+
+from healthbridge_tools import get_db
+from healthbridge_tools.cli import build_parser, confirm, json_summary, positive_int
+from healthbridge_tools.snapshot import (DEFAULT_LEVEL, DEFAULT_WORKERS, FRAME_DOCUMENTS, MANIFEST_FILE,
+                                         SnapshotRestorer, save_snapshot, snapshot_collections)
+
+def collection_list(value):
+    """argparse type for --collections: comma-separated names"""
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+def save(args, summary):
+    """Write the database's collections to a snapshot directory"""
+    db = get_db()
+    names = args.collections or snapshot_collections(db)
+    summary["directory"] = os.path.abspath(args.directory)
+    
+    if os.path.exists(os.path.join(args.directory, MANIFEST_FILE)):
+        if not confirm(args, f"Replace the snapshot in {args.directory}? (y/n): "):
+            print("Operation cancelled by user.")
+            return
+    if args.dry_run:
+        print(f"Would save {', '.join(names)} to {args.directory} (dry run).")
+        return
+    
+    print(f"Saving {len(names)} collections to {args.directory}...")
+    entries = save_snapshot(db, args.directory, names, level=args.level, frame_documents=args.frame_size,
+                            batch_size=args.batch_size, workers=args.workers, progress=not args.json)
+    summary["collections"] = {name: entry.as_dict() for name, entry in entries.items()}
+    
+    count = sum(entry.count for entry in entries.values())
+    stored = sum(entry.stored_size for entry in entries.values())
+    elapsed = max((entry.elapsed for entry in entries.values()), default=0.0)
+    print(f"\nSaved {count} documents ({stored / 2 ** 20:.1f} MiB) in {elapsed:.1f}s.")
+
+def restore(args, summary):
+    """Replace the snapshot's collections in the database with its contents"""
+    db = get_db()
+    try:
+        restorer = SnapshotRestorer(db, args.directory, args.collections, workers=args.workers,
+                                    progress=not args.json, dry_run=args.dry_run)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    names = [entry.name for entry in restorer.entries]
+    summary["directory"] = os.path.abspath(args.directory)
+    summary["source"] = restorer.manifest["database"]
+    summary["takenAt"] = restorer.manifest["createdAt"]
+    
+    print(f"Snapshot of {restorer.manifest['database']} taken {restorer.manifest['createdAt']:%Y-%m-%d %H:%M}: "
+          f"{restorer.count} documents in {len(names)} collections.")
+    if not args.dry_run and not confirm(args, f"Drop and restore {', '.join(names)} in {db.name}? "
+                                              "This cannot be undone. (y/n): "):
+        print("Operation cancelled by user.")
+        return
+    
+    try:
+        entries = restorer.run()
+    except ValueError as e:
+        print(f"\nError: {e}")
+        sys.exit(1)
+    summary["collections"] = {name: entry.as_dict() for name, entry in entries.items()}
+    
+    summary["elapsedSeconds"] = round(restorer.elapsed, 3)
+    verb = "Checked" if args.dry_run else "Restored"
+    print(f"{verb} {restorer.count} documents in {restorer.elapsed:.1f}s.")
+
+def main(argv=None):
+    """Parse command-line options and save or restore a snapshot"""
+    parser = build_parser(
+        "snapshot_database.py",
+        "Save the database's collections to a snapshot directory, or restore them from one.",
+        default_count=False, bulk=False
+    )
+    parser.add_argument("command", choices=["save", "restore"], help="what to do with the snapshot")
+    parser.add_argument("directory", help="the snapshot directory")
+    parser.add_argument("--collections", type=collection_list, default=None,
+                        help="comma-separated collections to save or restore (default: all of them)")
+    parser.add_argument("--workers", type=positive_int, default=None,
+                        help=f"threads reading collections or loading frames (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--level", type=int, choices=range(10), default=DEFAULT_LEVEL,
+                        help=f"zlib compression level when saving, 0 to store frames uncompressed "
+                             f"(default: {DEFAULT_LEVEL})")
+    parser.add_argument("--frame-size", type=positive_int, default=FRAME_DOCUMENTS,
+                        help=f"documents per frame when saving; restore inserts one frame per batch "
+                             f"(default: {FRAME_DOCUMENTS})")
+    parser.add_argument("--batch-size", type=positive_int, default=None,
+                        help="documents per cursor batch when saving (default: HEALTHBRIDGE_CURSOR_BATCH_SIZE)")
+    args = parser.parse_args(argv)
+    with json_summary(args, "snapshot_database") as summary:
+        summary["command"] = args.command
+        if args.command == "save":
+            save(args, summary)
+        else:
+            restore(args, summary)
+
+if __name__ == "__main__":
+    main()